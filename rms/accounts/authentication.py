@@ -0,0 +1,186 @@
+"""
+JWT authentication without per-request user queries.
+
+simplejwt's JWTAuthentication loads the user with a SELECT on every
+request. CachedJWTAuthentication keeps the user's id, username and
+flags (plus the password digest tokens are checked against, never the
+password hash) in the Django cache for at most JWT_USER_CACHE['TIMEOUT']
+seconds, and builds a User from them with every other field deferred.
+accounts.signals drops the entry whenever the user is saved or deleted.
+That only reaches other worker processes through a shared cache, so a
+process-local backend (LocMemCache, DummyCache) disables the user cache
+unless REQUIRE_SHARED_CACHE is turned off (single-process deployments,
+tests); the short TIMEOUT bounds any other staleness.
+
+Tokens whose jti has been blacklisted are rejected from an in-memory set
+of the unexpired blacklist entries. It is filled from BlacklistedToken
+saves in this process and reloaded from the database at most every
+BLACKLIST_RELOAD seconds to pick up blacklistings made elsewhere, so a
+typical authenticated request makes no auth-related queries at all. When
+there are more unexpired entries than BLACKLIST_MAX_SIZE the set is
+incomplete, and a jti missing from it is looked up in the database.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+    'REQUIRE_SHARED_CACHE': True,
+    'BLACKLIST_MAX_SIZE': 10000,
+    'BLACKLIST_RELOAD': 60,
+}
+
+
+def jwt_user_cache_setting(name):
+    return getattr(settings, 'JWT_USER_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def user_cache_key(user_id):
+    return f"jwt-user:{user_id}"
+
+
+# Cached per user; everything else is loaded on first access.
+CACHED_USER_FIELDS = ['id', 'username', 'is_active', 'is_staff', 'is_superuser']
+
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def user_cache():
+    """The cache holding users, or None when the user cache is disabled"""
+    cache = caches[jwt_user_cache_setting('ALIAS')]
+    if jwt_user_cache_setting('REQUIRE_SHARED_CACHE') and isinstance(cache, PROCESS_LOCAL_CACHES):
+        return None
+    return cache
+
+
+def forget_user(user_id):
+    cache = user_cache()
+    if cache is not None:
+        cache.delete(user_cache_key(user_id))
+
+
+class BlacklistedJTIs:
+    """Bounded, thread-safe set of blacklisted token ids that have not expired"""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # jti -> expiry timestamp
+        self.lock = threading.Lock()
+        self.loaded_at = None
+        # Set when entries had to be dropped to stay within
+        # BLACKLIST_MAX_SIZE; a miss then proves nothing.
+        self.truncated = False
+
+    def __contains__(self, jti):
+        self.reload_if_stale()
+        with self.lock:
+            expires = self.entries.get(jti)
+            truncated = self.truncated
+        if expires is not None:
+            return expires > time.time()
+        return truncated and self.in_database(jti)
+
+    def in_database(self, jti):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def add(self, jti, expires_at):
+        with self.lock:
+            self.entries[jti] = expires_at.timestamp()
+            self.entries.move_to_end(jti)
+            self.trim()
+
+    def reload_if_stale(self):
+        now = time.monotonic()
+        if self.loaded_at is not None and now - self.loaded_at < jwt_user_cache_setting('BLACKLIST_RELOAD'):
+            return
+        # Claimed before the query so concurrent requests do not all reload.
+        self.loaded_at = now
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        max_size = jwt_user_cache_setting('BLACKLIST_MAX_SIZE')
+        # One row more than fits tells whether the set is complete.
+        rows = list(BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).order_by(
+            '-blacklisted_at'
+        ).values_list('token__jti', 'token__expires_at')[:max_size + 1])
+        with self.lock:
+            self.truncated = len(rows) > max_size
+            for jti, expires_at in reversed(rows[:max_size]):
+                self.entries[jti] = expires_at.timestamp()
+            self.trim()
+
+    def trim(self):
+        cutoff = time.time()
+        for jti in [jti for jti, expires in self.entries.items() if expires <= cutoff]:
+            del self.entries[jti]
+        while len(self.entries) > jwt_user_cache_setting('BLACKLIST_MAX_SIZE'):
+            self.entries.popitem(last=False)
+            self.truncated = True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.loaded_at = None
+            self.truncated = False
+
+
+blacklisted_jtis = BlacklistedJTIs()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication resolving users from the cache described above"""
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti is not None and jti in blacklisted_jtis:
+            raise InvalidToken(_("Token is blacklisted"))
+        return validated_token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        cache = user_cache()
+        if user_id is None or cache is None:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        cached = cache.get(key)
+        if cached is None:
+            user = super().get_user(validated_token)
+            cache.set(key, self.cache_entry(user), self.cache_timeout(validated_token))
+            return user
+
+        values, password_digest = cached
+        User = get_user_model()
+        # from_db() takes the values in the model's field order.
+        field_names = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+        user = User.from_db(router.db_for_read(User), field_names, [values[name] for name in field_names])
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != password_digest:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+    def cache_entry(self, user):
+        password_digest = get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else None
+        return {field: getattr(user, field) for field in CACHED_USER_FIELDS}, password_digest
+
+    def cache_timeout(self, validated_token):
+        remaining = max(1, int(validated_token['exp'] - time.time()))
+        return min(remaining, jwt_user_cache_setting('TIMEOUT'))
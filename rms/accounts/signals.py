@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import blacklisted_jtis, forget_user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Deactivations and password changes must reach the next request"""
+    forget_user(instance.pk)
+    # A request reading the old row before the commit may have cached it
+    # again in between.
+    transaction.on_commit(lambda: forget_user(instance.pk))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def remember_blacklisted_token(sender, instance, **kwargs):
+    blacklisted_jtis.add(instance.token.jti, instance.token.expires_at)
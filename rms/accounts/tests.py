@@ -1,3 +1,110 @@
-from django.test import TestCase
+from datetime import datetime, timezone
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import CachedJWTAuthentication, blacklisted_jtis, user_cache_key
+from .models import User
+
+
+# The test cache is locmem; a single test process can safely use it.
+LOCAL_USER_CACHE = {'REQUIRE_SHARED_CACHE': False}
+
+
+@override_settings(JWT_USER_CACHE=LOCAL_USER_CACHE)
+class CachedJWTAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='secret')
+
+    def setUp(self):
+        cache.clear()
+        blacklisted_jtis.clear()
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return CachedJWTAuthentication().authenticate(request)
+
+    def test_warm_request_makes_no_queries(self):
+        token = AccessToken.for_user(self.user)
+        self.authenticate(token)
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(token)
+        self.assertEqual(user, self.user)
+
+    def test_deactivation_invalidates_cached_user(self):
+        token = AccessToken.for_user(self.user)
+        self.authenticate(token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_password_change_invalidates_cached_user(self):
+        token = AccessToken.for_user(self.user)
+        self.authenticate(token)
+        self.user.set_password('changed')
+        self.user.save()
+        user, _ = self.authenticate(token)
+        self.assertTrue(user.check_password('changed'))
+
+    def blacklist(self, token):
+        outstanding = OutstandingToken.objects.create(
+            user=self.user, jti=token['jti'], token=str(token),
+            expires_at=datetime.fromtimestamp(token['exp'], tz=timezone.utc)
+        )
+        BlacklistedToken.objects.create(token=outstanding)
+
+    def test_blacklisted_jti_is_rejected_without_queries(self):
+        token = AccessToken.for_user(self.user)
+        self.authenticate(token)
+        self.blacklist(token)
+        with self.assertNumQueries(0), self.assertRaises(InvalidToken):
+            self.authenticate(token)
+
+    def test_blacklist_is_loaded_from_database(self):
+        token = AccessToken.for_user(self.user)
+        self.blacklist(token)
+        blacklisted_jtis.clear()
+        with self.assertRaises(InvalidToken):
+            self.authenticate(token)
+
+    def test_cache_holds_no_password_hash(self):
+        token = AccessToken.for_user(self.user)
+        self.authenticate(token)
+        cached = cache.get(user_cache_key(self.user.pk))
+        self.assertNotIn(self.user.password, repr(cached))
+        user, _ = self.authenticate(token)
+        self.assertEqual((user.pk, user.username, user.is_active), (self.user.pk, 'owner', True))
+
+    def test_entries_expire_quickly(self):
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(CachedJWTAuthentication().cache_timeout(token), 60)
+
+    @override_settings(JWT_USER_CACHE={})
+    def test_process_local_cache_is_not_used_by_default(self):
+        token = AccessToken.for_user(self.user)
+        self.authenticate(token)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        with self.assertNumQueries(1):
+            self.authenticate(token)
+
+    @override_settings(JWT_USER_CACHE={**LOCAL_USER_CACHE, 'BLACKLIST_MAX_SIZE': 1})
+    def test_blacklisted_jti_beyond_max_size_is_rejected(self):
+        evicted, kept = AccessToken.for_user(self.user), AccessToken.for_user(self.user)
+        self.blacklist(evicted)
+        self.blacklist(kept)
+        self.assertNotIn(evicted['jti'], blacklisted_jtis.entries)
+        for token in (evicted, kept):
+            with self.assertRaises(InvalidToken):
+                self.authenticate(token)
+
+        blacklisted_jtis.clear()
+        for token in (evicted, kept):
+            with self.assertRaises(InvalidToken):
+                self.authenticate(token)
+        self.authenticate(AccessToken.for_user(self.user))
@@ -1,7 +1,11 @@
 from django.contrib import admin
-from .models import Property, Room
+from .models import Property, Room, Notification
 from import_export.admin import ImportExportModelAdmin
-from import_export import resources
+from import_export import resources, fields
+from accounts.models import User
+from rms.imports import BulkImportMixin, BulkImportMeta, CachedForeignKeyWidget
+from search.admin import IndexedSearchMixin
+from search.documents import KIND_PROPERTY, KIND_ROOM
 
 # Register your models here.
 
@@ -9,27 +13,45 @@ from import_export import resources
 # admin.site.register(Room)
 # admin.site.register(Tenant)
 
-class PropertyResource(resources.ModelResource):
+class PropertyResource(BulkImportMixin, resources.ModelResource):
+    owner = fields.Field(
+        attribute='owner', column_name='owner', widget=CachedForeignKeyWidget(User)
+    )
 
-    class Meta:
+    class Meta(BulkImportMeta):
         model = Property
         
-class RoomResource(resources.ModelResource):
-    class Meta:
+class RoomResource(BulkImportMixin, resources.ModelResource):
+    property = fields.Field(
+        attribute='property', column_name='property', widget=CachedForeignKeyWidget(Property, 'name')
+    )
+
+    class Meta(BulkImportMeta):
         model = Room
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('property')
+
         
         
 @admin.register(Property)
-class PropertyAdmin(ImportExportModelAdmin):
+class PropertyAdmin(IndexedSearchMixin, ImportExportModelAdmin):
     resource_class = PropertyResource
+    search_kind = KIND_PROPERTY
     list_display = ('name', 'address', 'price')
     search_fields = ('name', 'address')
 
 @admin.register(Room)
-class RoomAdmin(ImportExportModelAdmin):
+class RoomAdmin(IndexedSearchMixin, ImportExportModelAdmin):
     resource_class = RoomResource
+    search_kind = KIND_ROOM
     list_display = ('room_no', 'property', 'rent_amount', 'is_occupied')
     list_filter = ('property', 'is_occupied')
     search_fields = ('room_no', 'property__name')
-    
\ No newline at end of file
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'kind', 'due_date', 'status', 'attempts', 'sent_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('to_email',)
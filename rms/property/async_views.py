@@ -0,0 +1,39 @@
+"""
+Async variants of the property reporting views, served under /api/async/.
+They return the same data as the views in property.views; independent
+queries are awaited together.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from rms.asyncviews import async_report_view
+from rms.dbrouter import reads_from_replica
+from rms.reportcache import async_cached_owner_report
+from .models import Property
+from .rollups import month_start, owner_month_totals
+from .views import monthly_insights_data, pending_rent_tenants, property_overview
+
+
+@async_report_view
+@async_cached_owner_report
+@reads_from_replica
+async def housewise_overview(request):
+    """Async variant of property.views.housewise_overview"""
+    properties = Property.objects.filter(owner=request.user).with_rent_totals().order_by('pk')
+    return [property_overview(prop) async for prop in properties]
+
+
+@async_report_view
+@async_cached_owner_report
+@reads_from_replica
+async def monthly_insights(request):
+    """Async variant of property.views.monthly_insights"""
+    now = timezone.now()
+    totals, tenants_with_pending = await asyncio.gather(
+        # owner_month_totals runs two queries; keep them one sync_to_async call.
+        sync_to_async(owner_month_totals)(request.user, month_start(now)),
+        pending_rent_tenants(request.user, now).acount(),
+    )
+    return monthly_insights_data(now, totals, tenants_with_pending)
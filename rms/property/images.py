@@ -0,0 +1,177 @@
+"""
+Resized derivatives of Property.image.
+
+Every image gets a WebP and a JPEG variant at each of the configured
+widths, stored in the default storage under DIRECTORY/<original name>/.
+They are generated off-request after an image is uploaded
+(property.processing, if IMAGE_DERIVATIVES['EAGER']), lazily by the
+property-image-variant view on first request, and for existing images by
+the backfill_image_derivatives command.
+
+Originals narrower than a width are re-encoded at their own size rather
+than upscaled, so every advertised variant exists.
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+DEFAULTS = {
+    'WIDTHS': [160, 320, 640, 1280],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'EAGER': True,
+    'DIRECTORY': 'derivatives',
+}
+
+# format -> (Pillow format, file extension, content type)
+FORMATS = {
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+}
+
+
+def image_setting(name):
+    return getattr(settings, 'IMAGE_DERIVATIVES', {}).get(name, DEFAULTS[name])
+
+
+def derivative_storage():
+    # Not the image field's storage, which names files by content.
+    return storages['default']
+
+
+def derivative_options():
+    """The settings derivatives depend on, picklable for worker processes"""
+    return {name: image_setting(name) for name in ('WIDTHS', 'FORMATS', 'QUALITY', 'DIRECTORY')}
+
+
+def all_targets(options):
+    return [(width, fmt) for width in options['WIDTHS'] for fmt in options['FORMATS']]
+
+
+def derivative_name(name, width, fmt, options=None):
+    directory = options['DIRECTORY'] if options else image_setting('DIRECTORY')
+    return f"{directory}/{name}/{width}.{FORMATS[fmt][1]}"
+
+
+def derivative_names(name, options=None):
+    options = options or derivative_options()
+    return [derivative_name(name, width, fmt, options) for width, fmt in all_targets(options)]
+
+
+def variant_urls(prop, request=None):
+    """
+    {format: {width: URL}} of the property's image variants, or None. The
+    URLs carry a digest of the image name, so they change with the image
+    and can be cached indefinitely.
+    """
+    if not prop.image:
+        return None
+    version = hashlib.sha1(prop.image.name.encode()).hexdigest()[:12]
+    urls = {}
+    for fmt in image_setting('FORMATS'):
+        urls[fmt] = {}
+        for width in image_setting('WIDTHS'):
+            url = f"{reverse('property-image-variant', args=[prop.pk, width, fmt])}?v={version}"
+            urls[fmt][str(width)] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def encode(image, fmt, quality):
+    pillow_format, _, _ = FORMATS[fmt]
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+    elif fmt == 'webp' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, pillow_format, quality=quality, optimize=fmt == 'jpeg')
+    return buffer.getvalue()
+
+
+def render_derivatives(source, targets, options=None):
+    """
+    Encode `targets` ((width, fmt) pairs) from one decode of the `source`
+    file object. Returns {(width, fmt): bytes}.
+    """
+    with Image.open(source) as image:
+        # Lets the JPEG decoder skip detail the widest variant won't use;
+        # square so an EXIF rotation cannot leave it too narrow.
+        widest = max(width for width, _ in targets)
+        image.draft(image.mode, (widest, widest))
+        return render_image(ImageOps.exif_transpose(image), targets, options)
+
+
+def render_image(image, targets, options=None):
+    """render_derivatives for an already decoded, upright image"""
+    quality = options['QUALITY'] if options else image_setting('QUALITY')
+    rendered = {}
+    # Widest first, each size scaled down from the previous one.
+    for width in sorted({width for width, _ in targets}, reverse=True):
+        if width < image.width:
+            image = image.resize(
+                (width, max(1, round(image.height * width / image.width))), Image.LANCZOS
+            )
+        for target_width, fmt in targets:
+            if target_width == width:
+                rendered[width, fmt] = encode(image, fmt, quality)
+    return rendered
+
+
+def save_derivative(storage, name, content):
+    saved = storage.save(name, ContentFile(content))
+    if saved != name:
+        # Another worker stored it first; keep theirs.
+        storage.delete(saved)
+    return name
+
+
+def save_derivatives(storage, name, rendered, options=None):
+    return [
+        save_derivative(storage, derivative_name(name, width, fmt, options), content)
+        for (width, fmt), content in rendered.items()
+    ]
+
+
+def missing_targets(storage, name, options=None):
+    options = options or derivative_options()
+    return [
+        (width, fmt) for width, fmt in all_targets(options)
+        if not storage.exists(derivative_name(name, width, fmt, options))
+    ]
+
+
+def ensure_derivatives(field_file, targets=None, force=False):
+    """
+    Create the missing derivatives of `field_file` (all configured ones
+    unless `targets` lists (width, fmt) pairs). Returns the names created.
+    """
+    storage, name = derivative_storage(), field_file.name
+    if targets is None:
+        targets = all_targets(derivative_options())
+    if force:
+        for width, fmt in targets:
+            storage.delete(derivative_name(name, width, fmt))
+    else:
+        targets = [(width, fmt) for width, fmt in targets if not storage.exists(derivative_name(name, width, fmt))]
+    if not targets:
+        return []
+
+    with field_file.storage.open(name, 'rb') as source:
+        rendered = render_derivatives(source, targets)
+    return save_derivatives(storage, name, rendered)
+
+
+def delete_derivatives(name):
+    storage = derivative_storage()
+    for derivative in derivative_names(name):
+        storage.delete(derivative)
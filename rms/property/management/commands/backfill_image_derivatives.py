@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from property.images import ensure_derivatives
+from property.models import Property
+from property.processing import process_now
+
+
+class Command(BaseCommand):
+    help = "Create the missing resized variants of every property image"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate existing variants too")
+        parser.add_argument('--process', action='store_true',
+                            help="Also strip metadata from the originals, as done for new uploads")
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        seen = set()
+        for prop in Property.objects.exclude(image='').only('image').order_by('pk').iterator():
+            # Several properties may share one file.
+            if prop.image.name in seen:
+                continue
+            seen.add(prop.image.name)
+            try:
+                if options['process']:
+                    process_now(prop.image)
+                names = ensure_derivatives(prop.image, force=options['force'])
+            except (OSError, ValueError, Image.DecompressionBombError) as exc:
+                failed += 1
+                self.stderr.write(f"{prop.image.name}: {exc}")
+                continue
+            created += len(names)
+            if names:
+                self.stdout.write(f"{prop.image.name}: {len(names)} variants")
+        self.stdout.write(f"{len(seen)} images, {created} variants created, {failed} failed")
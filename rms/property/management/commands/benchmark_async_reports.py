@@ -0,0 +1,110 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from rms.benchmarks import isolated_database, seed_portfolio
+from rms.imports import refresh_derived_data
+
+ENDPOINTS = [
+    'monthly-insights/',
+    'housewise-overview/',
+    'tenant-payment-status/',
+    'room-status/',
+]
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the reporting endpoints: sync views through the WSGI handler "
+        "with one thread per concurrent request, against the async variants "
+        "through the ASGI handler on a single event loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=50)
+        parser.add_argument('--rooms', type=int, default=20, help="Rooms per property")
+        parser.add_argument('--payments', type=int, default=50000, help="Payment history to seed")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint and mode")
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--cache', action='store_true',
+                            help="Keep the report cache enabled (by default every request recomputes)")
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            owner = User.objects.create_user('benchmark', password='benchmark')
+            self.stdout.write("Seeding...")
+            seed_portfolio(
+                owner, properties=options['properties'], rooms_per_property=options['rooms'],
+                payments=options['payments']
+            )
+            refresh_derived_data()
+            headers = {'Authorization': f'Bearer {AccessToken.for_user(owner)}'}
+
+            caches = {} if options['cache'] else {'CACHES': NO_CACHE}
+            with override_settings(**caches):
+                self.stdout.write(
+                    f"{options['requests']} requests per endpoint, concurrency {options['concurrency']}"
+                )
+                for endpoint in ENDPOINTS:
+                    wsgi = self.run_wsgi(f'/api/{endpoint}', headers, options)
+                    asgi = asyncio.run(self.run_asgi(f'/api/async/{endpoint}', headers, options))
+                    self.stdout.write(endpoint)
+                    self.stdout.write(self.format_result("WSGI, sync view", wsgi))
+                    self.stdout.write(self.format_result("ASGI, async view", asgi))
+
+    def run_wsgi(self, path, headers, options):
+        local = threading.local()
+
+        def request():
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            start = time.perf_counter()
+            response = local.client.get(path, headers=headers)
+            self.check_response(path, response)
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(lambda _: request(), range(options['concurrency'])))  # warm up
+            start = time.perf_counter()
+            latencies = list(pool.map(lambda _: request(), range(options['requests'])))
+            elapsed = time.perf_counter() - start
+        return elapsed, latencies
+
+    async def run_asgi(self, path, headers, options):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def request():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                self.check_response(path, response)
+                return time.perf_counter() - start
+
+        await asyncio.gather(*(request() for _ in range(options['concurrency'])))  # warm up
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(request() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        return elapsed, latencies
+
+    def check_response(self, path, response):
+        if response.status_code != 200:
+            raise CommandError(f"{path} returned {response.status_code}: {response.content[:200]!r}")
+
+    def format_result(self, label, result):
+        elapsed, latencies = result
+        latencies = sorted(latencies)
+        return (
+            f"  {label:<18} {len(latencies) / elapsed:8.1f} req/s  "
+            f"median {statistics.median(latencies) * 1000:8.2f} ms  "
+            f"p95 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000:8.2f} ms"
+        )
@@ -0,0 +1,105 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.core.mail.backends import locmem
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from property.notifications import claim_notifications, deliver_notifications, enqueue_due_rent_emails
+from property.utils import send_emails
+from rms.benchmarks import isolated_database, seed_portfolio
+from tenant.models import Tenant
+
+
+class SlowEmailBackend(locmem.EmailBackend):
+    """locmem backend with the latency of an SMTP handshake and of each send"""
+    connect_latency = 0.0
+    send_latency = 0.0
+    opened = 0
+
+    def open(self):
+        type(self).opened += 1
+        time.sleep(self.connect_latency)
+        return super().open()
+
+    def send_messages(self, messages):
+        time.sleep(self.send_latency * len(messages))
+        return super().send_messages(messages)
+
+
+def send_in_chunks(messages, size):
+    """A connection per `size` messages, as before connections were kept per worker"""
+    results = []
+    for start in range(0, len(messages), size):
+        results.extend(send_emails(messages[start:start + size]))
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare outbox delivery with a connection per message, per batch and "
+        "per worker, against a simulated SMTP server with the given latencies"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=1000, help="Due-rent reminders to deliver")
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help="Messages per connection for the per-batch strategy")
+        parser.add_argument('--connect-latency', type=float, default=50.0,
+                            help="Milliseconds to open a connection (TCP, TLS, EHLO, AUTH)")
+        parser.add_argument('--send-latency', type=float, default=2.0, help="Milliseconds per message")
+
+    def handle(self, *args, **options):
+        SlowEmailBackend.connect_latency = options['connect_latency'] / 1000
+        SlowEmailBackend.send_latency = options['send_latency'] / 1000
+        workers = options['workers']
+
+        with isolated_database(), override_settings(EMAIL_BACKEND=f'{__name__}.SlowEmailBackend'):
+            owner = User.objects.create_user('benchmark', password='benchmark')
+            self.stdout.write("Seeding...")
+            seed_portfolio(owner, properties=-(-options['tenants'] // 20), rooms_per_property=20, payments=0)
+            Tenant.objects.update(rent_due_date=timezone.now().date())
+            enqueue_due_rent_emails()
+            notifications = claim_notifications(options['tenants'])
+            messages = [
+                EmailMessage(n.subject, n.body, settings.DEFAULT_FROM_EMAIL, [n.to_email]) for n in notifications
+            ]
+            share = -(-len(messages) // workers)
+            shares = [messages[i:i + share] for i in range(0, len(messages), share)]
+
+            self.stdout.write(
+                f"{len(messages)} messages, {workers} workers, connect {options['connect_latency']} ms, "
+                f"send {options['send_latency']} ms"
+            )
+            strategies = [
+                ("connection per message", 1),
+                (f"connection per {options['batch_size']} messages", options['batch_size']),
+                ("connection per worker", None),
+            ]
+            for label, size in strategies:
+                SlowEmailBackend.opened = 0
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    if size is None:
+                        list(pool.map(send_emails, shares))
+                    else:
+                        list(pool.map(lambda part: send_in_chunks(part, size), shares))
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"{label:<32} {elapsed * 1000:9.1f} ms  {len(messages) / elapsed:8.1f} msg/s  "
+                    f"{SlowEmailBackend.opened} connections"
+                )
+
+            SlowEmailBackend.opened = 0
+            start = time.perf_counter()
+            sent, failed = deliver_notifications(notifications, workers=workers)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{'deliver_notifications':<32} {elapsed * 1000:9.1f} ms  {sent / elapsed:8.1f} msg/s  "
+                f"{SlowEmailBackend.opened} connections, {sent} sent, {failed} failed"
+            )
@@ -0,0 +1,124 @@
+import csv
+import time
+
+import tablib
+from django.core.management.base import BaseCommand, CommandError
+from import_export.results import RowResult
+
+from property.admin import PropertyResource, RoomResource
+from tenant.admin import TenantResource, PaymentResource
+
+RESOURCES = {
+    'property': PropertyResource,
+    'room': RoomResource,
+    'tenant': TenantResource,
+    'payment': PaymentResource,
+}
+
+
+def command_resource(resource_class):
+    """
+    Variant of an admin resource for command line imports: no per-row diff
+    (there is no preview to render).
+    """
+    class Meta(resource_class.Meta):
+        skip_diff = True
+
+    return type(resource_class.__name__, (resource_class,), {
+        'Meta': Meta,
+        '__module__': __name__,
+    })
+
+
+def read_chunks(path, chunk_size):
+    """Yield (first row number, tablib.Dataset) chunks without loading the whole file"""
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        reader = csv.reader(handle)
+        try:
+            headers = next(reader)
+        except StopIteration:
+            return
+        start = 1
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield start, tablib.Dataset(*rows, headers=headers)
+                start += len(rows)
+                rows = []
+        if rows:
+            yield start, tablib.Dataset(*rows, headers=headers)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import properties, rooms, tenants or payments from a CSV file. "
+        "The file is validated in a dry-run pass first, then written in "
+        "chunks, each in its own transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(RESOURCES))
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Rows validated and written per transaction")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Validate only, do not write anything")
+        parser.add_argument('--skip-validation', action='store_true',
+                            help="Write chunks without the preliminary dry-run pass")
+        parser.add_argument('--max-errors', type=int, default=50,
+                            help="Number of row errors to print")
+
+    def handle(self, *args, **options):
+        resource_class = command_resource(RESOURCES[options['model']])
+        path = options['path']
+        chunk_size = options['chunk_size']
+
+        if not options['skip_validation'] or options['dry_run']:
+            errors = self.run_pass(resource_class, path, chunk_size, dry_run=True, options=options)
+            if errors:
+                raise CommandError(f"Validation failed with {errors} row errors; nothing was imported.")
+            self.stdout.write(self.style.SUCCESS("Validation passed."))
+            if options['dry_run']:
+                return
+
+        errors = self.run_pass(resource_class, path, chunk_size, dry_run=False, options=options)
+        if errors:
+            raise CommandError(
+                f"Import stopped with {errors} row errors; chunks before the failing one were committed."
+            )
+        self.stdout.write(self.style.SUCCESS("Import complete."))
+
+    def run_pass(self, resource_class, path, chunk_size, dry_run, options):
+        label = "Validating" if dry_run else "Importing"
+        started = time.monotonic()
+        processed = errors = 0
+        totals = {RowResult.IMPORT_TYPE_NEW: 0, RowResult.IMPORT_TYPE_UPDATE: 0}
+
+        for start, dataset in read_chunks(path, chunk_size):
+            result = resource_class().import_data(dataset, dry_run=dry_run, use_transactions=True)
+            processed += len(dataset)
+            for import_type in totals:
+                totals[import_type] += result.totals[import_type]
+
+            for error in result.base_errors:
+                errors += 1
+                self.stderr.write(f"  rows {start}-{start + len(dataset) - 1}: {error.error}")
+            for number, row_errors in result.row_errors():
+                errors += len(row_errors)
+                if errors <= options['max_errors']:
+                    for error in row_errors:
+                        self.stderr.write(f"  row {start + number - 1}: {error.error}")
+            for invalid in result.invalid_rows:
+                errors += 1
+                if errors <= options['max_errors']:
+                    self.stderr.write(f"  row {start + invalid.number - 1}: {invalid.error_dict}")
+
+            rate = processed / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f"{label}: {processed} rows ({totals[RowResult.IMPORT_TYPE_NEW]} new, "
+                f"{totals[RowResult.IMPORT_TYPE_UPDATE]} updated, {errors} errors, {rate:.0f} rows/s)"
+            )
+            if errors and not dry_run:
+                break
+        return errors
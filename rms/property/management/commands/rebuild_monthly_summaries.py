@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from property.rollups import open_month, rebuild_monthly_summaries, verify_monthly_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly collection rollup from raw payments and verify it"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Only compare the stored rollup with raw data, do not rebuild",
+        )
+        parser.add_argument(
+            '--open-month',
+            action='store_true',
+            help="Only create the current month's missing buckets (run at the start of each month)",
+        )
+
+    def handle(self, *args, **options):
+        if options['open_month']:
+            count = open_month()
+            self.stdout.write(f"Created {count} monthly summaries.")
+            return
+
+        if not options['check']:
+            count = rebuild_monthly_summaries()
+            self.stdout.write(f"Rebuilt {count} monthly summaries.")
+
+        mismatches = verify_monthly_summaries()
+        for property_id, month, field, stored, actual in mismatches:
+            self.stdout.write(
+                f"property={property_id} month={month:%Y-%m} {field}: stored={stored} actual={actual}"
+            )
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} mismatches found in monthly summaries.")
+        self.stdout.write(self.style.SUCCESS("Monthly summaries match raw data."))
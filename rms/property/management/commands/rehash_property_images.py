@@ -0,0 +1,57 @@
+import os
+import re
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from property.images import delete_derivatives
+from property.models import Property
+from property.processing import process_now
+from property.storage import content_hash_name, property_image_storage
+from property.versions import bump_for_properties
+from rms.transactions import write_atomic
+
+HASHED_NAME = re.compile(r'^[0-9a-f]{64}(\.\w+)?$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Move property images stored under upload names to content-hash "
+        "names, merging identical files and removing the old copies"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        storage = property_image_storage()
+        names = Property.objects.exclude(image='').order_by().values_list('image', flat=True).distinct()
+        targets = {}
+        for name in sorted(names):
+            if HASHED_NAME.match(os.path.basename(name)):
+                continue
+            if not storage.exists(name):
+                self.stderr.write(f"{name}: file missing")
+                continue
+            with storage.open(name, 'rb') as file:
+                if options['dry_run']:
+                    targets[name] = content_hash_name(name, file.chunks())
+                    continue
+                targets[name] = storage.save(name, file)
+            with write_atomic():
+                property_ids = list(Property.objects.filter(image=name).values_list('pk', flat=True))
+                Property.objects.filter(pk__in=property_ids).update(image=targets[name])
+                bump_for_properties(property_ids)
+            delete_derivatives(name)
+            storage.delete(name)
+            try:
+                process_now(Property(image=targets[name]).image)
+            except (OSError, ValueError, Image.DecompressionBombError) as exc:
+                self.stderr.write(f"{targets[name]}: {exc}")
+
+        for name, target in targets.items():
+            self.stdout.write(f"{name} -> {target}")
+        self.stdout.write(
+            f"{len(targets)} files {'would be ' if options['dry_run'] else ''}moved "
+            f"to {len(set(targets.values()))} content-hash names"
+        )
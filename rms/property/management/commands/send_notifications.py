@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from property.notifications import (
+    MAX_ATTEMPTS, claim_notifications, deliver_notifications, enqueue_due_rent_emails
+)
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Notifications claimed per round")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Concurrent SMTP connections")
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help="Attempts before a notification is marked failed")
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help="Seconds to sleep when the outbox is empty")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the outbox once and exit instead of polling")
+        parser.add_argument('--enqueue-due', action='store_true',
+                            help="Queue today's due-rent reminders before sending")
+
+    def handle(self, *args, **options):
+        if options['enqueue_due']:
+            queued = enqueue_due_rent_emails()
+            self.stdout.write(f"Queued {queued} due-rent reminders.")
+
+        while True:
+            notifications = claim_notifications(options['batch_size'], options['max_attempts'])
+            if not notifications:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            sent, failed = deliver_notifications(
+                notifications,
+                workers=options['workers'],
+                max_attempts=options['max_attempts']
+            )
+            self.stdout.write(f"Sent {sent}, failed {failed}.")
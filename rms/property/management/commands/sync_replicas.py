@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from rms.dbrouter import replica_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the SQLite replicas in "
+        "DATABASE_REPLICAS, once or every --every seconds to simulate "
+        "replication lag locally"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, help="Keep copying at this interval (seconds)")
+
+    def handle(self, *args, **options):
+        aliases = replica_aliases()
+        if not aliases:
+            raise CommandError("DATABASE_REPLICAS is empty; set DATABASE_REPLICA_FILES")
+        for alias in ['default', *aliases]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f"{alias} is not a SQLite database; use the server's replication")
+
+        while True:
+            self.sync(aliases)
+            if not options['every']:
+                return
+            time.sleep(options['every'])
+
+    def sync(self, aliases):
+        primary = connections['default']
+        primary.ensure_connection()
+        for alias in aliases:
+            replica = connections[alias]
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            self.stdout.write(f"Copied default to {alias} ({replica.settings_dict['NAME']})")
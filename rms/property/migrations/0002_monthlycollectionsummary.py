@@ -0,0 +1,82 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:42
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def populate_summaries(apps, schema_editor):
+    """Build the rollup from existing payments and rooms (see property.rollups)"""
+    Property = apps.get_model('property', 'Property')
+    Room = apps.get_model('property', 'Room')
+    Payment = apps.get_model('tenant', 'Payment')
+    MonthlyCollectionSummary = apps.get_model('property', 'MonthlyCollectionSummary')
+
+    def money(value):
+        return (value or Decimal('0')).quantize(Decimal('0.01'))
+
+    current = timezone.localtime(timezone.now()).date().replace(day=1)
+    owners = dict(Property.objects.values_list('pk', 'owner_id'))
+    rows = {}
+    grouped = Payment.objects.annotate(month=TruncMonth('payment_date')).order_by().values(
+        'property_id', 'month'
+    ).annotate(total=Sum('amount'), count=Count('id'), tenants=Count('tenant', distinct=True))
+    for row in grouped:
+        month = row['month']
+        month = (timezone.localtime(month).date() if timezone.is_aware(month) else month.date()).replace(day=1)
+        rows[row['property_id'], month] = {
+            'total_collected': money(row['total']),
+            'payment_count': row['count'],
+            'paid_tenant_count': row['tenants'],
+        }
+
+    occupied = dict(
+        Room.objects.filter(is_occupied=True).order_by().values('property_id')
+        .annotate(total=Sum('rent_amount')).values_list('property_id', 'total')
+    )
+    for property_id in owners:
+        rows.setdefault((property_id, current), {})['expected_rent'] = money(occupied.get(property_id))
+
+    MonthlyCollectionSummary.objects.bulk_create(
+        [
+            MonthlyCollectionSummary(property_id=property_id, owner_id=owners[property_id], month=month, **values)
+            for (property_id, month), values in rows.items()
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0001_initial'),
+        ('tenant', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCollectionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('expected_rent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_collected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('paid_tenant_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to=settings.AUTH_USER_MODEL)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='property.property')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'month'], name='summary_owner_month_idx')],
+                'unique_together': {('property', 'month')},
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:57
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_balances(apps, schema_editor):
+    Property = apps.get_model('property', 'Property')
+    Payment = apps.get_model('tenant', 'Payment')
+    payments = Payment.objects.filter(property=OuterRef('pk')).order_by().values('property')
+
+    def total(status):
+        return Coalesce(
+            Subquery(payments.filter(status=status).annotate(total=Sum('amount')).values('total')),
+            Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=14, decimal_places=2)
+        )
+
+    Property.objects.update(
+        paid_total=total('paid'),
+        pending_total=total('pending'),
+        payment_count=Coalesce(Subquery(payments.annotate(count=Count('id')).values('count')), Value(0)),
+        last_payment_date=Subquery(payments.annotate(latest=Max('payment_date')).values('latest')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0003_notification'),
+        ('tenant', '0002_payment_receipt_number_payment_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='last_payment_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='paid_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='payment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='pending_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:22
+
+import property.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0005_ownerdataversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='property',
+            name='image',
+            field=models.ImageField(blank=True, storage=property.storage.property_image_storage, upload_to='property_images/'),
+        ),
+    ]
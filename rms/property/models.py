@@ -1,12 +1,74 @@
+from decimal import Decimal
 from django.db import models
-from tenant.models import Payment, Tenant
+from django.db.models import OuterRef, Subquery, Sum, Value, F
+from django.db.models.functions import Coalesce
+from tenant.models import Payment, Tenant, without_balance_fields
+from .storage import property_image_storage
 from django.conf import settings
+from django.utils import timezone
 # Create your models here.
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from django.db.models import QuerySet
 
+
+CENTS = Decimal('0.01')
+
+
+def money_field(**kwargs):
+    """Field used for rent/payment aggregates"""
+    return models.DecimalField(max_digits=14, decimal_places=2, **kwargs)
+
+
+def money_sum(queryset, group_by, field):
+    """
+    Correlated subquery returning SUM(field) of `queryset` grouped by
+    `group_by`, coalesced to 0.00 so empty groups stay Decimal.
+    """
+    total = queryset.order_by().values(group_by).annotate(
+        total=Sum(field)
+    ).values('total')
+    return Coalesce(
+        Subquery(total, output_field=money_field()),
+        Value(Decimal('0.00')),
+        output_field=money_field()
+    )
+
+
+class PropertyQuerySet(models.QuerySet):
+
+    def with_rent_totals(self):
+        """
+        Annotate each property with rent_due, rent_collected and rent_pending
+        computed in SQL, so a whole portfolio is one query.
+        """
+        return self.annotate(
+            rent_due=money_sum(
+                Room.objects.filter(property=OuterRef('pk')), 'property', 'rent_amount'
+            ),
+            rent_collected=models.ExpressionWrapper(
+                F('paid_total') + F('pending_total'),
+                output_field=money_field()
+            ),
+        ).annotate(
+            rent_pending=models.ExpressionWrapper(
+                F('rent_due') - F('rent_collected'),
+                output_field=money_field()
+            )
+        )
+
+    def portfolio_totals(self):
+        """Due, collected and pending rent summed over the whole queryset"""
+        totals = self.with_rent_totals().aggregate(
+            total_rent_due=Coalesce(Sum('rent_due'), Value(Decimal('0.00')), output_field=money_field()),
+            total_collected=Coalesce(Sum('rent_collected'), Value(Decimal('0.00')), output_field=money_field()),
+        )
+        totals = {key: value.quantize(CENTS) for key, value in totals.items()}
+        totals['pending'] = totals['total_rent_due'] - totals['total_collected']
+        return totals
+
+
 class Property(models.Model):
     if TYPE_CHECKING:
         rooms: QuerySet['Room']
@@ -21,27 +83,74 @@ class Property(models.Model):
     # image_height = models.PositiveIntegerField(null=True, blank=True)
     # image_width = models.PositiveIntegerField(null=True, blank=True)
     # height_field='image_height', width_field='image_width',
-    image = models.ImageField(upload_to='property_images/', blank=True, max_length=None)
+    image = models.ImageField(
+        upload_to='property_images/', storage=property_image_storage, blank=True, max_length=None
+    )
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField()
 
+    # Running payment totals, maintained by tenant.balances
+    paid_total = money_field(default=Decimal('0.00'), editable=False)
+    pending_total = money_field(default=Decimal('0.00'), editable=False)
+    payment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_payment_date = models.DateTimeField(blank=True, null=True, editable=False)
+
+    objects = PropertyQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **without_balance_fields(self, kwargs))
     
     def total_rent_due(self):
         """Sum of all room rents"""
-        return sum(room.rent_amount for room in self.rooms.all())
+        if hasattr(self, 'rent_due'):
+            return self.rent_due.quantize(CENTS)
+        return self.rooms.aggregate(total=Sum('rent_amount'))['total'] or 0
     
     def total_rent_collected(self):
         """Sum of all payments for this property"""
-        from django.db.models import Sum
-        return self.payments.aggregate(total=Sum('amount'))['total'] or 0
+        if hasattr(self, 'rent_collected'):
+            return self.rent_collected.quantize(CENTS)
+        return self.paid_total + self.pending_total
     
     def total_rent_pending(self):
         """Difference between due and collected rent"""
+        if hasattr(self, 'rent_pending'):
+            return self.rent_pending.quantize(CENTS)
         return self.total_rent_due() - self.total_rent_collected()
     
 
+class RoomQuerySet(models.QuerySet):
+
+    def with_occupancy(self, today=None):
+        """
+        Annotate each room with `has_tenant` (flagged occupied and has a
+        tenant) and `rent_overdue` (occupied and the tenant's rent due date
+        is today or earlier, as Tenant.is_rent_due).
+        """
+        today = today or timezone.now().date()
+        occupied = models.Q(is_occupied=True, tenant__isnull=False)
+        return self.annotate(
+            has_tenant=models.ExpressionWrapper(occupied, output_field=models.BooleanField()),
+            rent_overdue=models.ExpressionWrapper(
+                occupied & models.Q(tenant__rent_due_date__lte=today),
+                output_field=models.BooleanField()
+            ),
+        )
+
+    def occupancy_summary(self):
+        """Room, occupied, vacant and overdue counts of the annotated queryset"""
+        summary = self.aggregate(
+            total_rooms=models.Count('id'),
+            occupied=models.Count('id', filter=models.Q(has_tenant=True)),
+            overdue=models.Count('id', filter=models.Q(rent_overdue=True)),
+        )
+        summary['vacant'] = summary['total_rooms'] - summary['occupied']
+        return summary
+
+
 class Room(models.Model):
     if TYPE_CHECKING:
         id: int
@@ -52,10 +161,107 @@ class Room(models.Model):
     rent_amount = models.DecimalField(max_digits=10, decimal_places=2)
     is_occupied = models.BooleanField(default=False)
 
+    objects = RoomQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.property.name} - Room {self.room_no}"
     
     class Meta:
         unique_together = ['property', 'room_no']
     
-    
\ No newline at end of file
+    
+
+class MonthlyCollectionSummary(models.Model):
+    """
+    Per-property, per-month collection rollup maintained by signals in
+    property.signals. Rebuild with `manage.py rebuild_monthly_summaries`.
+    """
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='monthly_summaries'
+    )
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='monthly_summaries')
+    month = models.DateField(help_text="First day of the month")
+    expected_rent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payment_count = models.PositiveIntegerField(default=0)
+    paid_tenant_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.property.name} - {self.month:%B %Y}"
+
+    class Meta:
+        unique_together = ['property', 'month']
+        indexes = [
+            models.Index(fields=['owner', 'month'], name='summary_owner_month_idx'),
+        ]
+
+
+class Notification(models.Model):
+    """
+    Outbox row for an outgoing email. Rows are enqueued by request handlers
+    and delivered by `manage.py send_notifications`; the unique constraint
+    keeps one reminder per tenant per due date.
+    """
+    KIND_DUE_RENT = 'due_rent'
+
+    notification_kinds = [
+        (KIND_DUE_RENT, 'Due rent reminder'),
+    ]
+
+    notification_status = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=20, choices=notification_kinds)
+    due_date = models.DateField()
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=notification_status, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email} ({self.status})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tenant', 'kind', 'due_date'],
+                name='unique_notification_per_due_date'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_queue_idx'),
+        ]
+
+
+class OwnerDataVersion(models.Model):
+    """
+    Counter bumped by property.signals on any write to an owner's
+    properties, rooms, tenants or payments. Read endpoints derive their
+    ETag and Last-Modified from it (see rms.conditional).
+    """
+    owner = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='data_version'
+    )
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.owner} v{self.version}"
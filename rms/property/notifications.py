@@ -1,17 +1,179 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+from django.core.mail import EmailMessage
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Case, F, Q, Value, When
 from django.utils import timezone
-from .models import Tenant
-from .utils import send_due_rent_email
-
-def send_due_rent_emails():
-    today = timezone.now().date()
-    tenants_due = Tenant.objects.filter(rent_due_date=today, is_active=True)
-
-    for tenant in tenants_due:
-        if tenant.room and tenant.email:
-            send_due_rent_email(
-                to_email=tenant.email,
-                tenant_name=tenant.tenant_name,
-                room_no=tenant.room.room_no,
-                rent_due_date=tenant.rent_due_date,
-                rent_amount=tenant.room.rent_amount
+from rms.transactions import write_atomic
+from .models import Tenant, Notification
+from .utils import build_due_rent_email, send_emails
+
+logger = logging.getLogger(__name__)
+
+CLAIM_TIMEOUT = timedelta(minutes=10)
+RETRY_BASE_DELAY = timedelta(seconds=30)
+RETRY_MAX_DELAY = timedelta(hours=1)
+MAX_ATTEMPTS = 5
+
+
+def due_rent_messages(today=None, chunk_size=2000):
+    """Yield (tenant, EmailMessage) for active tenants whose rent is due `today`"""
+    today = today or timezone.now().date()
+    tenants_due = Tenant.objects.filter(
+        rent_due_date=today, is_active=True
+    ).exclude(email='').select_related('room').order_by('pk')
+
+    for tenant in tenants_due.iterator(chunk_size=chunk_size):
+        yield tenant, build_due_rent_email(
+            to_email=tenant.email,
+            tenant_name=tenant.tenant_name,
+            room_no=tenant.room.room_no,
+            rent_due_date=tenant.rent_due_date,
+            rent_amount=tenant.room.rent_amount
+        )
+
+
+def enqueue_due_rent_emails(today=None, batch_size=500):
+    """
+    Add a due-rent reminder to the outbox for every tenant due `today`, in
+    batches of `batch_size` tenants. Tenants that already have a reminder
+    for their due date are skipped, so calling this repeatedly never
+    produces duplicates. Returns the number of notifications this call
+    queued.
+    """
+    queued = 0
+    messages = due_rent_messages(today, chunk_size=batch_size)
+    while True:
+        batch = list(islice(messages, batch_size))
+        if not batch:
+            return queued
+        queued += enqueue_batch([
+            Notification(
+                tenant=tenant,
+                kind=Notification.KIND_DUE_RENT,
+                due_date=tenant.rent_due_date,
+                to_email=message.to[0],
+                subject=message.subject,
+                body=message.body,
             )
+            for tenant, message in batch
+        ])
+
+
+def queued_keys(rows):
+    """(tenant_id, due_date) of the reminders already queued for `rows`' tenants"""
+    return set(
+        Notification.objects.filter(
+            kind=Notification.KIND_DUE_RENT,
+            tenant_id__in=[row.tenant_id for row in rows]
+        ).values_list('tenant_id', 'due_date')
+    )
+
+
+def enqueue_batch(rows):
+    """
+    Insert the `rows` whose (tenant, due date) is not queued yet and return
+    how many were inserted. A concurrent enqueue that inserts one of them
+    first makes the INSERT fail as a whole; the batch is then retried
+    against the rows that exist by then, so the count is exact.
+    """
+    while True:
+        existing = queued_keys(rows)
+        missing = [row for row in rows if (row.tenant_id, row.due_date) not in existing]
+        if not missing:
+            return 0
+        try:
+            with write_atomic():
+                Notification.objects.bulk_create(missing)
+        except IntegrityError:
+            for row in missing:
+                row.pk = None
+            continue
+        return len(missing)
+
+
+def claim_notifications(limit, max_attempts=MAX_ATTEMPTS):
+    """
+    Atomically mark up to `limit` deliverable notifications as sending and
+    return them. Rows left in "sending" by a crashed worker are reclaimed
+    after CLAIM_TIMEOUT; the lost delivery counts as an attempt, so a
+    message that keeps crashing the worker is marked failed after
+    `max_attempts` like any other.
+    """
+    now = timezone.now()
+    stale = Q(status='sending', claimed_at__lt=now - CLAIM_TIMEOUT)
+    Notification.objects.filter(stale, attempts__gte=max_attempts - 1).update(
+        status='failed', attempts=F('attempts') + 1, claim_token=None,
+        last_error="Delivery did not finish within the claim timeout."
+    )
+
+    claimable = Q(status='pending', next_attempt_at__lte=now) | stale
+    candidates = list(
+        Notification.objects.filter(claimable).order_by('next_attempt_at', 'pk')
+        .values_list('pk', flat=True)[:limit]
+    )
+    if not candidates:
+        return []
+
+    token = uuid.uuid4().hex
+    # The claimable filter is re-applied in the UPDATE so that of two
+    # workers racing for the same row only one gets it.
+    Notification.objects.filter(claimable, pk__in=candidates).update(
+        status='sending', claim_token=token, claimed_at=now,
+        attempts=F('attempts') + Case(When(status='sending', then=Value(1)), default=Value(0)),
+    )
+    return list(Notification.objects.filter(claim_token=token).order_by('pk'))
+
+
+def retry_delay(attempts):
+    """Exponential backoff after `attempts` failed deliveries"""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def deliver_notifications(notifications, workers=4, max_attempts=MAX_ATTEMPTS):
+    """
+    Send claimed notifications from `workers` threads, each over a single
+    connection reused for its whole share, and record the outcome of
+    each. Returns (sent, failed) counts.
+    """
+    messages = [
+        EmailMessage(n.subject, n.body, settings.DEFAULT_FROM_EMAIL, [n.to_email])
+        for n in notifications
+    ]
+    chunk_size = max(1, -(-len(messages) // workers))
+    chunks = [messages[i:i + chunk_size] for i in range(0, len(messages), chunk_size)]
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk_results in pool.map(send_emails, chunks):
+            results.extend(chunk_results)
+
+    now = timezone.now()
+    sent_ids = []
+    failed = 0
+    for notification, (message, error) in zip(notifications, results):
+        if error is None:
+            sent_ids.append(notification.pk)
+            continue
+        failed += 1
+        notification.attempts += 1
+        notification.last_error = str(error)
+        notification.claim_token = None
+        if notification.attempts >= max_attempts:
+            notification.status = 'failed'
+        else:
+            notification.status = 'pending'
+            notification.next_attempt_at = now + retry_delay(notification.attempts)
+        notification.save(update_fields=[
+            'attempts', 'last_error', 'claim_token', 'status', 'next_attempt_at'
+        ])
+
+    Notification.objects.filter(pk__in=sent_ids).update(
+        status='sent', sent_at=now, claim_token=None
+    )
+    return len(sent_ids), failed
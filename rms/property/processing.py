@@ -0,0 +1,166 @@
+"""
+Off-request processing of uploaded property images.
+
+A request that saves a property image only writes the upload (through
+property.storage.ContentHashStorage). post_save then hands the file to a
+bounded pool of worker processes, which decode it once, rewrite it in
+place with the EXIF orientation applied and the metadata stripped, and
+render its derivatives (property.images) from the same decode.
+
+Lossy originals are only re-encoded when they carry metadata, and
+lossless ones only when recompression makes them smaller, so processing
+a file twice (an identical upload) changes nothing.
+
+IMAGE_PROCESSING['WORKERS'] = 0 processes inline instead. At most
+MAX_PENDING files are queued; beyond that uploads stay as written, their
+derivatives are left to the lazy view, and `backfill_image_derivatives
+--process` catches up later.
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'MAX_PENDING': 100,
+    'ORIGINAL_QUALITY': 90,
+}
+
+LOSSLESS_FORMATS = {'PNG'}
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def processing_setting(name):
+    return getattr(settings, 'IMAGE_PROCESSING', {}).get(name, DEFAULTS[name])
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def has_metadata(image):
+    return bool(image.getexif()) or any(key in image.info for key in METADATA_KEYS)
+
+
+def recompress(image, pillow_format, quality):
+    options = {'icc_profile': image.info.get('icc_profile')}
+    if pillow_format == 'PNG':
+        options['optimize'] = True
+    else:
+        options.update(quality=quality, optimize=pillow_format == 'JPEG')
+    buffer = BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def replace_file(path, content):
+    directory = os.path.dirname(path)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.processing-')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(content)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def process_image(source_location, name, derivative_location, options, quality, derivatives=True):
+    """
+    Process one stored image. Runs in a worker process, so everything it
+    needs arrives as plain arguments. Returns the derivative names created.
+    """
+    from django.core.files.storage import FileSystemStorage
+    from .images import missing_targets, render_image, save_derivatives
+
+    path = os.path.join(source_location, name)
+    derivative_storage = FileSystemStorage(location=derivative_location)
+    with Image.open(path) as original:
+        pillow_format = original.format
+        stripped = has_metadata(original)
+        image = ImageOps.exif_transpose(original)
+        if pillow_format in ('JPEG', 'PNG', 'WEBP') and (stripped or pillow_format in LOSSLESS_FORMATS):
+            content = recompress(image, pillow_format, quality)
+            if stripped or len(content) < os.path.getsize(path):
+                replace_file(path, content)
+
+    targets = missing_targets(derivative_storage, name, options) if derivatives else []
+    if not targets:
+        return []
+    return save_derivatives(derivative_storage, name, render_image(image, targets, options), options)
+
+
+def job_arguments(field_file):
+    from .images import derivative_options, derivative_storage, image_setting
+
+    return (
+        field_file.storage.location, field_file.name, derivative_storage().location,
+        derivative_options(), processing_setting('ORIGINAL_QUALITY'), image_setting('EAGER'),
+    )
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=processing_setting('WORKERS'),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        )
+    return _executor
+
+
+def process_now(field_file):
+    """Process `field_file` in this process. Returns the derivative names created."""
+    return process_image(*job_arguments(field_file))
+
+
+def process_upload(field_file):
+    """
+    Process a newly saved image off-request. Returns False when the queue
+    is full and the file was left as uploaded.
+    """
+    if processing_setting('WORKERS') == 0:
+        try:
+            process_now(field_file)
+        except (OSError, ValueError, Image.DecompressionBombError) as exc:
+            logger.warning("Could not process %s: %s", field_file.name, exc)
+        return True
+
+    with _lock:
+        if len(_pending) >= processing_setting('MAX_PENDING'):
+            logger.warning("Image processing queue is full; leaving %s unprocessed", field_file.name)
+            return False
+        future = executor().submit(process_image, *job_arguments(field_file))
+        _pending.add(future)
+    future.add_done_callback(lambda future: finished(field_file.name, future))
+    return True
+
+
+def finished(name, future):
+    with _lock:
+        _pending.discard(future)
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Could not process %s: %s", name, future.exception())
+
+
+def wait_for_pending(timeout=None):
+    """Block until the queued images are processed (tests, shutdown)"""
+    with _lock:
+        pending = list(_pending)
+    wait(pending, timeout)
@@ -0,0 +1,326 @@
+"""
+Maintenance of the MonthlyCollectionSummary rollup.
+
+Rows are keyed by (property, first day of month). Payment writes adjust
+the bucket(s) they touch with one conditional UPDATE each, and room
+writes refresh the current month's expected rent, so reporting views read
+one small indexed table instead of scanning the payment history.
+
+Buckets are created by writes (a bucket's first payment, a new property,
+a room change) and by `rebuild_monthly_summaries`; `--open-month` creates
+the current month's buckets without a rebuild. Reads never write: a
+property without a bucket for the current month has no payments in it,
+and owner_month_totals takes its expected rent from its rooms.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Case, Count, Exists, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from rms.dbrouter import primary_reads
+from rms.transactions import write_atomic
+from tenant.models import Payment
+from .models import Property, Room, MonthlyCollectionSummary, CENTS
+
+
+def month_start(value=None):
+    """First day of the month containing `value` (a datetime/date, default now)"""
+    if value is None:
+        value = timezone.now()
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date()
+    return value.replace(day=1)
+
+
+def month_bounds(month):
+    """Half-open [start, end) aware datetimes covering `month`"""
+    month = month_start(month)
+    next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return (
+        timezone.make_aware(datetime.combine(month, time.min)),
+        timezone.make_aware(datetime.combine(next_month, time.min)),
+    )
+
+
+def _money(value):
+    return (value or Decimal('0')).quantize(CENTS)
+
+
+def expected_rent(property_id):
+    """Rent of currently occupied rooms of a property"""
+    return _money(
+        Room.objects.filter(property_id=property_id, is_occupied=True)
+        .aggregate(total=Sum('rent_amount'))['total']
+    )
+
+
+@primary_reads()
+def refresh_monthly_summary(property_id, month):
+    """
+    Recompute one (property, month) bucket from raw payments, creating it
+    if needed. Used when a bucket does not exist yet and after deletes an
+    UPDATE cannot account for; other writes adjust buckets incrementally.
+    Expected rent is only refreshed for the current month; past months
+    keep the value they had when the month was live. Always computed from
+    the primary, since the result is written back.
+    """
+    owner_id = Property.objects.filter(pk=property_id).values_list('owner_id', flat=True).first()
+    if owner_id is None:
+        # Property is being deleted; its summaries cascade with it.
+        return None
+
+    month = month_start(month)
+    start, end = month_bounds(month)
+    totals = Payment.objects.filter(
+        property_id=property_id,
+        payment_date__gte=start,
+        payment_date__lt=end
+    ).aggregate(
+        total=Sum('amount'),
+        count=Count('id'),
+        tenants=Count('tenant', distinct=True)
+    )
+
+    defaults = {
+        'owner_id': owner_id,
+        'total_collected': _money(totals['total']),
+        'payment_count': totals['count'],
+        'paid_tenant_count': totals['tenants'],
+    }
+    if month == month_start():
+        defaults['expected_rent'] = expected_rent(property_id)
+
+    summary, _ = MonthlyCollectionSummary.objects.update_or_create(
+        property_id=property_id, month=month, defaults=defaults
+    )
+    return summary
+
+
+def adjust_bucket(payment, sign):
+    """
+    Add (sign=1) or take out (sign=-1) `payment`'s contribution to its
+    bucket with one UPDATE. Whether it is the tenant's only payment in the
+    bucket is an EXISTS over the tenant's other payments there, inside the
+    same statement. Returns False when the bucket does not exist.
+    """
+    month = month_start(payment.payment_date)
+    start, end = month_bounds(month)
+    others = Payment.objects.filter(
+        tenant_id=payment.tenant_id,
+        property_id=payment.property_id,
+        payment_date__gte=start,
+        payment_date__lt=end
+    ).exclude(pk=payment.pk)
+    return bool(MonthlyCollectionSummary.objects.filter(
+        property_id=payment.property_id, month=month
+    ).update(
+        total_collected=F('total_collected') + sign * Decimal(str(payment.amount)),
+        payment_count=F('payment_count') + sign,
+        paid_tenant_count=F('paid_tenant_count') + Case(
+            When(Exists(others), then=Value(0)), default=Value(sign)
+        ),
+        updated_at=timezone.now()
+    ))
+
+
+def add_payment(payment):
+    """Fold a new payment into its bucket, creating the bucket if it is missing"""
+    if not adjust_bucket(payment, 1):
+        refresh_monthly_summary(payment.property_id, payment.payment_date)
+
+
+def remove_payment(payment):
+    """
+    Take a payment that was deleted, or `previous` values of an updated
+    one, out of its bucket. Only valid when the tenant's other payments in
+    the bucket are still stored, i.e. not for cascading or bulk deletes.
+    """
+    if not adjust_bucket(payment, -1):
+        refresh_monthly_summary(payment.property_id, payment.payment_date)
+
+
+def refresh_expected_rent(property_id):
+    """Recompute the current month's expected rent of a property"""
+    month = month_start()
+    occupied = Room.objects.filter(
+        property_id=OuterRef('property_id'), is_occupied=True
+    ).order_by().values('property_id').annotate(total=Sum('rent_amount')).values('total')
+    updated = MonthlyCollectionSummary.objects.filter(property_id=property_id, month=month).update(
+        expected_rent=Coalesce(Subquery(occupied), Value(Decimal('0.00'))),
+        updated_at=timezone.now()
+    )
+    if not updated:
+        refresh_monthly_summary(property_id, month)
+
+
+def refresh_for_payments(payments):
+    """Refresh the buckets touched by payments written without signals (bulk_create)"""
+    buckets = {(payment.property_id, month_start(payment.payment_date)) for payment in payments}
+    for property_id, month in buckets:
+        refresh_monthly_summary(property_id, month)
+
+
+def refresh_for_properties(property_ids):
+    """
+    Bring the buckets of properties written without signals (bulk_create,
+    bulk_update) in line with their owner, and create the current month's
+    bucket of those that have none.
+    """
+    owner = Property.objects.filter(pk=OuterRef('property_id')).values('owner_id')
+    MonthlyCollectionSummary.objects.filter(property_id__in=property_ids).exclude(
+        owner_id=Subquery(owner)
+    ).update(owner_id=Subquery(owner), updated_at=timezone.now())
+    month = month_start()
+    missing = Property.objects.filter(pk__in=property_ids).exclude(monthly_summaries__month=month)
+    for property_id in missing.values_list('pk', flat=True):
+        refresh_monthly_summary(property_id, month)
+
+
+def open_month(month=None):
+    """
+    Create the missing buckets of `month` (default: the current one) for
+    every property, e.g. from a job at the start of each month. Returns
+    the number created.
+    """
+    month = month_start(month)
+    missing = Property.objects.exclude(monthly_summaries__month=month).values_list('pk', flat=True)
+    created = 0
+    for property_id in missing.iterator():
+        refresh_monthly_summary(property_id, month)
+        created += 1
+    return created
+
+
+def owner_month_totals(owner, month=None):
+    """
+    Summed rollup for all of an owner's properties in one month. Read-only:
+    in the current month, properties that have no bucket yet add their
+    occupied rooms' rent to the expected rent.
+    """
+    month = month_start(month)
+    totals = MonthlyCollectionSummary.objects.filter(owner=owner, month=month).aggregate(
+        expected_rent=Sum('expected_rent'),
+        total_collected=Sum('total_collected'),
+        payment_count=Sum('payment_count'),
+        paid_tenant_count=Sum('paid_tenant_count'),
+    )
+    expected = _money(totals['expected_rent'])
+    if month == month_start():
+        expected += _money(
+            Room.objects.filter(property__owner=owner, is_occupied=True).exclude(
+                property__monthly_summaries__month=month
+            ).aggregate(total=Sum('rent_amount'))['total']
+        )
+    return {
+        'expected_rent': expected,
+        'total_collected': _money(totals['total_collected']),
+        'payment_count': totals['payment_count'] or 0,
+        'paid_tenant_count': totals['paid_tenant_count'] or 0,
+    }
+
+
+def compute_monthly_summaries():
+    """
+    Build rollup rows from raw data with grouped queries. Returns a dict of
+    (property_id, month) -> field values.
+    """
+    current = month_start()
+    owners = dict(Property.objects.values_list('pk', 'owner_id'))
+    rows = {}
+
+    grouped = Payment.objects.annotate(
+        month=TruncMonth('payment_date')
+    ).order_by().values('property_id', 'month').annotate(
+        total=Sum('amount'),
+        count=Count('id'),
+        tenants=Count('tenant', distinct=True)
+    )
+    for row in grouped:
+        key = (row['property_id'], month_start(row['month']))
+        rows[key] = {
+            'owner_id': owners[row['property_id']],
+            'expected_rent': Decimal('0.00'),
+            'total_collected': _money(row['total']),
+            'payment_count': row['count'],
+            'paid_tenant_count': row['tenants'],
+        }
+
+    occupied = dict(
+        Room.objects.filter(is_occupied=True).order_by().values('property_id')
+        .annotate(total=Sum('rent_amount')).values_list('property_id', 'total')
+    )
+    for property_id, owner_id in owners.items():
+        row = rows.setdefault((property_id, current), {
+            'owner_id': owner_id,
+            'total_collected': Decimal('0.00'),
+            'payment_count': 0,
+            'paid_tenant_count': 0,
+        })
+        row['expected_rent'] = _money(occupied.get(property_id))
+
+    return rows
+
+
+def rebuild_monthly_summaries():
+    """
+    Replace the rollup with values recomputed from raw data. Expected rent
+    of past months cannot be recovered and is kept from the existing rows.
+    """
+    rows = compute_monthly_summaries()
+    current = month_start()
+    with write_atomic():
+        historical = {
+            (property_id, month): expected
+            for property_id, month, expected in MonthlyCollectionSummary.objects.exclude(
+                month=current
+            ).values_list('property_id', 'month', 'expected_rent')
+        }
+        MonthlyCollectionSummary.objects.all().delete()
+        MonthlyCollectionSummary.objects.bulk_create(
+            [
+                MonthlyCollectionSummary(
+                    property_id=property_id,
+                    month=month,
+                    **dict(values, expected_rent=historical.get((property_id, month), values['expected_rent']))
+                )
+                for (property_id, month), values in rows.items()
+            ],
+            batch_size=500
+        )
+    return len(rows)
+
+
+def verify_monthly_summaries():
+    """
+    Compare the stored rollup against raw data. Returns a list of
+    (property_id, month, field, stored, actual) mismatches.
+    """
+    expected = compute_monthly_summaries()
+    current = month_start()
+    fields = ['owner_id', 'total_collected', 'payment_count', 'paid_tenant_count']
+    mismatches = []
+
+    stored = {
+        (row['property_id'], row['month']): row
+        for row in MonthlyCollectionSummary.objects.values('property_id', 'month', 'expected_rent', *fields)
+    }
+    for key in expected.keys() | stored.keys():
+        actual = expected.get(key)
+        row = stored.get(key)
+        if actual is None:
+            if row['payment_count'] or key[1] == current:
+                mismatches.append((*key, 'row', 'present', 'missing'))
+            continue
+        if row is None:
+            if not actual['payment_count']:
+                # Empty buckets are created by writes or open_month().
+                continue
+            mismatches.append((*key, 'row', 'missing', 'present'))
+            continue
+        checked = fields + ['expected_rent'] if key[1] == current else fields
+        for field in checked:
+            if row[field] != actual[field]:
+                mismatches.append((*key, field, row[field], actual[field]))
+    return mismatches
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from tenant.models import BALANCE_FIELDS
+from .images import variant_urls
 from .models import Property, Room
 
 class RoomSerializer(serializers.ModelSerializer):
@@ -10,6 +12,12 @@ class RoomSerializer(serializers.ModelSerializer):
         fields = ['id', 'property', 'property_name', 'room_no', 'rent_amount', 'is_occupied', 'tenant_name']
         read_only_fields = ['id', 'is_occupied']
     
+    def validate_property(self, value):
+        request = self.context.get('request')
+        if request and value.owner_id != request.user.id:
+            raise serializers.ValidationError("You can only add rooms to your own properties.")
+        return value
+    
     def get_property_name(self, obj):
         return obj.property.name if obj.property else None
     
@@ -19,10 +27,16 @@ class RoomSerializer(serializers.ModelSerializer):
 
 class PropertySerializer(serializers.ModelSerializer):
     rooms = RoomSerializer(many=True, read_only=True)
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Property
-        fields = '__all__'
+        # The running payment totals are internal (tenant.balances).
+        exclude = BALANCE_FIELDS
         read_only_fields = ['owner']
 
+    def get_image_variants(self, obj):
+        """Resized WebP/JPEG URLs by format and width, for list thumbnails"""
+        return variant_urls(obj, self.context.get('request'))
+
 
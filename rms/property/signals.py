@@ -0,0 +1,167 @@
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from tenant.models import Payment, Tenant
+from .images import delete_derivatives
+from .models import Property, Room, MonthlyCollectionSummary
+from .processing import process_upload
+from .rollups import add_payment, month_start, refresh_expected_rent, refresh_monthly_summary, remove_payment
+from .versions import bump_for_properties, bump_for_rooms, bump_owners
+
+
+def _deleted_with_property(kwargs):
+    """
+    True when a delete cascades from a Property (or its owner), in which
+    case the property's summaries are being removed as well.
+    """
+    origin = kwargs.get('origin')
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return not issubclass(model, (Payment, Room, Tenant))
+
+
+def _cascaded(sender, kwargs):
+    """
+    True when a delete was started by another model's delete, whose own
+    signal bumps the owner's data version.
+    """
+    origin = kwargs.get('origin')
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return not issubclass(model, sender)
+
+
+def _previous_bucket(payment):
+    """
+    The (property_id, month) bucket a payment belonged to before an update,
+    from the row tenant.signals.remember_previous_payment read.
+    """
+    previous = getattr(payment, '_previous_payment', None)
+    if previous is None:
+        return None
+    return (previous.property_id, month_start(previous.payment_date))
+
+
+@receiver(post_save, sender=Payment)
+def update_payment_bucket(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_payment', None)
+    if not created and previous is not None:
+        fields = ['tenant_id', 'property_id', 'amount', 'payment_date']
+        if all(getattr(previous, field) == getattr(instance, field) for field in fields):
+            return
+        remove_payment(previous)
+    add_payment(instance)
+
+
+@receiver(post_delete, sender=Payment)
+def remove_payment_from_bucket(sender, instance, **kwargs):
+    if _deleted_with_property(kwargs):
+        return
+    if isinstance(kwargs.get('origin'), Payment):
+        remove_payment(instance)
+    else:
+        # Cascading and queryset deletes remove the tenant's other payments
+        # in the same pass, so recount what remains.
+        refresh_monthly_summary(instance.property_id, instance.payment_date)
+
+
+@receiver(pre_save, sender=Room)
+def remember_room_property(sender, instance, **kwargs):
+    instance._previous_property_id = None
+    if instance.pk:
+        instance._previous_property_id = Room.objects.filter(pk=instance.pk).values_list(
+            'property_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def refresh_room_expected_rent(sender, instance, **kwargs):
+    if _deleted_with_property(kwargs):
+        return
+    property_ids = {instance.property_id, getattr(instance, '_previous_property_id', None)}
+    for property_id in property_ids - {None}:
+        refresh_expected_rent(property_id)
+
+
+@receiver(post_save, sender=Property)
+def sync_summary_owner(sender, instance, created, **kwargs):
+    if created:
+        refresh_monthly_summary(instance.pk, month_start())
+        return
+    MonthlyCollectionSummary.objects.filter(property=instance).exclude(
+        owner=instance.owner_id
+    ).update(owner=instance.owner_id)
+
+
+@receiver(pre_save, sender=Property)
+def remember_property_owner(sender, instance, **kwargs):
+    instance._previous_owner_id = instance._previous_image = None
+    if instance.pk:
+        previous = Property.objects.filter(pk=instance.pk).values_list('owner_id', 'image').first()
+        if previous:
+            instance._previous_owner_id, instance._previous_image = previous
+
+
+@receiver(pre_save, sender=Tenant)
+def remember_tenant_room(sender, instance, **kwargs):
+    instance._previous_room_id = None
+    if instance.pk:
+        instance._previous_room_id = Tenant.objects.filter(pk=instance.pk).values_list(
+            'room_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def bump_property_owner(sender, instance, **kwargs):
+    if _cascaded(sender, kwargs):
+        return
+    bump_owners({instance.owner_id, getattr(instance, '_previous_owner_id', None)})
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def bump_room_owner(sender, instance, **kwargs):
+    if _cascaded(sender, kwargs):
+        return
+    bump_for_properties({instance.property_id, getattr(instance, '_previous_property_id', None)})
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def bump_tenant_owner(sender, instance, **kwargs):
+    if _cascaded(sender, kwargs):
+        return
+    bump_for_rooms({instance.room_id, getattr(instance, '_previous_room_id', None)})
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def bump_payment_owner(sender, instance, **kwargs):
+    if _cascaded(sender, kwargs):
+        return
+    previous = _previous_bucket(instance)
+    bump_for_properties({instance.property_id, previous[0] if previous else None})
+
+
+@receiver(post_save, sender=Property)
+def process_new_image(sender, instance, **kwargs):
+    previous, current = getattr(instance, '_previous_image', None) or '', instance.image.name or ''
+    if previous == current:
+        return
+    if previous and not Property.objects.filter(image=previous).exists():
+        delete_derivatives(previous)
+    if current:
+        process_upload(instance.image)
+
+
+@receiver(post_delete, sender=Property)
+def delete_image_derivatives(sender, instance, **kwargs):
+    # Originals are kept, as Django does; derivatives are ours to remove.
+    name = instance.image.name
+    if name and not Property.objects.filter(image=name).exists():
+        delete_derivatives(name)
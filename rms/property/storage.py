@@ -0,0 +1,47 @@
+"""
+Content-addressed storage for uploaded property images.
+
+Uploads are named by the SHA-256 of their bytes inside the upload_to
+directory (property_images/<digest>.<ext>). An upload identical to a
+stored file maps to the same name and is not written again, so the
+collision suffixes Django's default storage adds (hamster.jpg /
+hamster_fysh6gk.jpg for the same picture) cannot occur.
+
+property.processing later rewrites the file in place with its EXIF data
+stripped; the name stays the digest of the upload, which is what
+identical uploads are matched by.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+
+
+def content_hash_name(name, chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    directory, filename = os.path.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(directory, f"{digest.hexdigest()}{extension}")
+
+
+class ContentHashStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_hash_name(name, content.chunks())
+        if self.exists(name):
+            return name
+        saved = super().save(name, content, max_length)
+        if saved != name:
+            # Stored concurrently by an identical upload.
+            self.delete(saved)
+        return name
+
+
+def property_image_storage():
+    return storages['property_images']
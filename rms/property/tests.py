@@ -1,3 +1,897 @@
-from django.test import TestCase
+import copy
+import csv
+import importlib
+import os
+import shutil
+import smtplib
+import tempfile
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import tablib
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from rms import dbrouter
+from rms.transactions import write_atomic
+from search.backends import get_backend
+from search.documents import KIND_TENANT
+from tenant.admin import PaymentResource
+from tenant.balances import verify_balances
+from tenant.models import BALANCE_FIELDS, Payment, Tenant
+from .management.commands.import_csv import command_resource
+from .images import derivative_name, derivative_names, derivative_storage
+from .models import MonthlyCollectionSummary, Notification, Property, Room, OwnerDataVersion
+from .notifications import (
+    CLAIM_TIMEOUT, RETRY_BASE_DELAY, RETRY_MAX_DELAY, claim_notifications, deliver_notifications,
+    enqueue_due_rent_emails, queued_keys, retry_delay
+)
+from .processing import wait_for_pending
+from .rollups import month_start, verify_monthly_summaries
+from .versions import owner_version
+from .storage import property_image_storage
+
+
+def legacy_rent_totals(prop):
+    """The per-property loop housewise_overview used before with_rent_totals"""
+    due = sum(room.rent_amount for room in prop.rooms.all())
+    collected = prop.payments.aggregate(total=Sum('amount'))['total'] or 0
+    return {"property": prop.name, "total_rent_due": due, "total_collected": collected, "pending": due - collected}
+
+
+class RentTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.other_owner = User.objects.create_user('other', password='secret')
+        due = timezone.now().date()
+
+        def create(owner, name, rents, payments):
+            prop = Property.objects.create(owner=owner, name=name, address='Main St', price=1000, description='-')
+            rooms = []
+            for number, rent in enumerate(rents):
+                room = Room.objects.create(
+                    property=prop, room_no=str(101 + number), rent_amount=Decimal(rent), is_occupied=True
+                )
+                Tenant.objects.create(
+                    room=room, tenant_name=f'{name} {number}', phone_no='98000',
+                    email=f'{name.lower()}{number}@example.com', rent_due_date=due
+                )
+                rooms.append(room)
+            for number, (amount, status) in enumerate(payments):
+                room = rooms[number % len(rooms)]
+                Payment.objects.create(
+                    tenant=room.tenant, room=room, property=prop, amount=Decimal(amount), method='cash', status=status
+                )
+            return prop
+
+        create(cls.owner, 'Sunrise', ['500.00', '750.50', '1200.00'], [
+            ('500.00', 'paid'), ('750.50', 'pending'), ('0.25', 'paid'), ('1200.00', 'paid'), ('99.99', 'pending')
+        ])
+        create(cls.owner, 'Vacant', ['800.00', '800.00'], [])
+        create(cls.owner, 'Plot', [], [])
+        create(cls.owner, 'Overpaid', ['300.00'], [('450.00', 'paid'), ('300.00', 'paid')])
+        create(cls.other_owner, 'Sunset', ['650.00'], [('650.00', 'paid'), ('10.00', 'pending')])
+
+        # Updates and deletes go through the running totals as well.
+        payment = Payment.objects.get(amount=Decimal('0.25'))
+        payment.amount = Decimal('25.00')
+        payment.save()
+        Payment.objects.get(amount=Decimal('1200.00')).delete()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_annotations_match_the_python_loop(self):
+        for prop in Property.objects.with_rent_totals().order_by('pk'):
+            with self.subTest(prop.name):
+                expected = legacy_rent_totals(Property.objects.get(pk=prop.pk))
+                self.assertEqual(
+                    (prop.total_rent_due(), prop.total_rent_collected(), prop.total_rent_pending()),
+                    (expected['total_rent_due'], expected['total_collected'], expected['pending'])
+                )
+
+    def test_housewise_overview_matches_the_python_loop(self):
+        client = APIClient()
+        for owner in (self.owner, self.other_owner):
+            client.force_authenticate(owner)
+            owner_version(owner)
+            with self.assertNumQueries(2):  # the owner's data version and the overview
+                response = client.get('/api/housewise-overview/')
+            expected = [legacy_rent_totals(prop) for prop in Property.objects.filter(owner=owner).order_by('pk')]
+            self.assertEqual(response.data, expected)
+
+    def test_portfolio_totals_match_the_python_loop(self):
+        for owner in (self.owner, self.other_owner):
+            rows = [legacy_rent_totals(prop) for prop in Property.objects.filter(owner=owner)]
+            totals = Property.objects.filter(owner=owner).portfolio_totals()
+            self.assertEqual(totals, {
+                'total_rent_due': sum(row['total_rent_due'] for row in rows),
+                'total_collected': sum(row['total_collected'] for row in rows),
+                'pending': sum(row['pending'] for row in rows),
+            })
+        self.assertEqual(
+            Property.objects.filter(owner__username='nobody').portfolio_totals(),
+            {'total_rent_due': Decimal('0.00'), 'total_collected': Decimal('0.00'), 'pending': Decimal('0.00')}
+        )
+
+
+class ListQueryCountTests(TestCase):
+    """Listing properties and rooms must not issue per-row queries"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', password='secret')
+        self.other = User.objects.create_user('other', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.add_properties(self.other, 1)
+
+    def add_properties(self, owner, count, rooms_per_property=3):
+        start = Property.objects.count()
+        for i in range(start, start + count):
+            prop = Property.objects.create(
+                owner=owner, name=f'Property {i}', address='Main St', price=1000, description='-'
+            )
+            for j in range(rooms_per_property):
+                room = Room.objects.create(
+                    property=prop, room_no=str(j), rent_amount=Decimal('500.00'), is_occupied=j % 2 == 0
+                )
+                if room.is_occupied:
+                    Tenant.objects.create(
+                        room=room, tenant_name=f'Tenant {i}-{j}', phone_no='98000',
+                        email=f'tenant{i}-{j}@example.com', rent_due_date=timezone.now().date()
+                    )
+
+    def test_property_list_query_count_is_constant(self):
+        self.add_properties(self.owner, 2)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/properties/')
+        self.assertEqual(len(response.json()['results']), 2)
+
+        self.add_properties(self.owner, 10)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/properties/')
+        properties = response.json()['results']
+        self.assertEqual(len(properties), 12)
+        self.assertEqual(properties[0]['rooms'][0]['tenant_name'], 'Tenant 1-0')
+        self.assertIsNone(properties[0]['rooms'][1]['tenant_name'])
+
+    def test_property_responses_omit_running_totals(self):
+        self.add_properties(self.owner, 1)
+        prop = Property.objects.get(owner=self.owner)
+        Payment.objects.create(
+            tenant=prop.rooms.get(room_no='0').tenant, room=prop.rooms.get(room_no='0'), property=prop,
+            amount=Decimal('500.00'), method='cash', status='paid'
+        )
+        listed = self.client.get('/api/properties/').json()['results'][0]
+        detail = self.client.get(f'/api/properties/{prop.pk}/').json()
+        for data in (listed, detail):
+            self.assertEqual(set(data) & set(BALANCE_FIELDS), set())
+            self.assertEqual(data['name'], prop.name)
+
+        response = self.client.patch(f'/api/properties/{prop.pk}/', {'paid_total': '0.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        prop.refresh_from_db()
+        self.assertEqual(prop.paid_total, Decimal('500.00'))
+
+    def test_room_list_query_count_is_constant(self):
+        self.add_properties(self.owner, 2)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/rooms/')
+        self.assertEqual(len(response.json()['results']), 6)
+
+        self.add_properties(self.owner, 10)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/rooms/')
+        rooms = response.json()['results']
+        self.assertEqual(len(rooms), 36)
+        self.assertEqual(rooms[0]['property_name'], 'Property 1')
+
+    def test_cannot_add_room_to_another_owners_property(self):
+        foreign = Property.objects.get(owner=self.other)
+        response = self.client.post('/api/rooms/', {
+            'property': foreign.pk, 'room_no': '999', 'rent_amount': '100.00'
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class MonthlyRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        cls.tenants = []
+        for number in range(2):
+            room = Room.objects.create(
+                property=cls.property, room_no=str(101 + number), rent_amount=Decimal('500.00'), is_occupied=True
+            )
+            cls.tenants.append(Tenant.objects.create(
+                room=room, tenant_name=f'Tenant {number}', phone_no='98000',
+                email=f'tenant{number}@example.com', rent_due_date=timezone.now().date()
+            ))
+
+    def pay(self, tenant, amount):
+        return Payment.objects.create(
+            tenant=tenant, room=tenant.room, property=self.property, amount=Decimal(amount), method='cash'
+        )
+
+    def bucket(self, month=None):
+        summary = MonthlyCollectionSummary.objects.get(property=self.property, month=month_start(month))
+        return summary.total_collected, summary.payment_count, summary.paid_tenant_count
+
+    def test_migration_backfills_existing_payments(self):
+        migration = importlib.import_module('property.migrations.0002_monthlycollectionsummary')
+        self.pay(self.tenants[0], '200.00')
+        old = self.pay(self.tenants[1], '100.00')
+        Payment.objects.filter(pk=old.pk).update(payment_date=timezone.now() - timedelta(days=40))
+        MonthlyCollectionSummary.objects.all().delete()
+
+        migration.populate_summaries(django_apps, None)
+        self.assertEqual(verify_monthly_summaries(), [])
+        self.assertEqual(self.bucket(), (Decimal('200.00'), 1, 1))
+        self.assertEqual(self.bucket(timezone.now() - timedelta(days=40)), (Decimal('100.00'), 1, 1))
+        self.assertEqual(
+            MonthlyCollectionSummary.objects.get(property=self.property, month=month_start()).expected_rent,
+            Decimal('1000.00')
+        )
+
+    def test_rollup_follows_payment_writes(self):
+        first = self.pay(self.tenants[0], '200.00')
+        second = self.pay(self.tenants[0], '300.00')
+        other = self.pay(self.tenants[1], '500.00')
+        self.assertEqual(self.bucket(), (Decimal('1000.00'), 3, 2))
+
+        first.amount = Decimal('250.00')
+        first.save()
+        self.assertEqual(self.bucket(), (Decimal('1050.00'), 3, 2))
+
+        last_month = timezone.now() - timedelta(days=40)
+        second.payment_date = last_month
+        second.save()
+        self.assertEqual(self.bucket(), (Decimal('750.00'), 2, 2))
+        self.assertEqual(self.bucket(last_month), (Decimal('300.00'), 1, 1))
+
+        other.delete()
+        self.assertEqual(self.bucket(), (Decimal('250.00'), 1, 1))
+        self.assertEqual(verify_monthly_summaries(), [])
+
+    def test_cascading_and_bulk_deletes_recount(self):
+        self.pay(self.tenants[0], '200.00')
+        self.pay(self.tenants[0], '300.00')
+        self.pay(self.tenants[1], '500.00')
+        self.pay(self.tenants[1], '100.00')
+        Payment.objects.filter(tenant=self.tenants[1]).delete()
+        self.assertEqual(self.bucket(), (Decimal('500.00'), 2, 1))
+        self.tenants[0].delete()
+        self.assertEqual(self.bucket(), (Decimal('0.00'), 0, 0))
+        self.assertEqual(verify_monthly_summaries(), [])
+
+    def test_room_changes_refresh_expected_rent(self):
+        room = self.tenants[0].room
+        room.is_occupied = False
+        room.save()
+        self.assertEqual(
+            MonthlyCollectionSummary.objects.get(property=self.property, month=month_start()).expected_rent,
+            Decimal('500.00')
+        )
+        self.assertEqual(verify_monthly_summaries(), [])
+
+    def test_report_does_not_write(self):
+        self.pay(self.tenants[0], '200.00')
+        second = Property.objects.create(owner=self.owner, name='Moonrise', address='-', price=1000, description='-')
+        Room.objects.create(property=second, room_no='1', rent_amount=Decimal('700.00'), is_occupied=True)
+        # As at the start of a month nothing has been written in yet.
+        MonthlyCollectionSummary.objects.filter(property=second).delete()
+
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        owner_version(self.owner)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/monthly-insights/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary']['total_expected_rent'], 1700.0)
+        self.assertEqual(response.data['summary']['total_collected'], 200.0)
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ])
+        self.assertFalse(MonthlyCollectionSummary.objects.filter(property=second).exists())
+
+        out = StringIO()
+        call_command('rebuild_monthly_summaries', '--open-month', stdout=out)
+        self.assertIn("Created 1 monthly summaries.", out.getvalue())
+        self.assertEqual(verify_monthly_summaries(), [])
+
+    def test_rebuild_and_verify(self):
+        self.pay(self.tenants[0], '200.00')
+        last_month = timezone.now() - timedelta(days=40)
+        old = self.pay(self.tenants[1], '500.00')
+        old.payment_date = last_month
+        old.save()
+        MonthlyCollectionSummary.objects.filter(month=month_start(last_month)).update(expected_rent=Decimal('900.00'))
+        self.assertEqual(verify_monthly_summaries(), [])
+
+        MonthlyCollectionSummary.objects.filter(month=month_start()).update(
+            total_collected=Decimal('1.00'), paid_tenant_count=5
+        )
+        mismatches = verify_monthly_summaries()
+        self.assertEqual(
+            {(field, stored, actual) for _, _, field, stored, actual in mismatches},
+            {('total_collected', Decimal('1.00'), Decimal('200.00')), ('paid_tenant_count', 5, 1)}
+        )
+        with self.assertRaises(CommandError):
+            call_command('rebuild_monthly_summaries', '--check', stdout=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_monthly_summaries', stdout=out)
+        self.assertIn("Rebuilt 2 monthly summaries.", out.getvalue())
+        self.assertEqual(verify_monthly_summaries(), [])
+        self.assertEqual(self.bucket(), (Decimal('200.00'), 1, 1))
+        # Past expected rent cannot be recomputed and is kept.
+        self.assertEqual(
+            MonthlyCollectionSummary.objects.get(month=month_start(last_month)).expected_rent, Decimal('900.00')
+        )
+
+
+class BulkImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        for name in ['Sunrise', 'Moonrise']:
+            prop = Property.objects.create(owner=cls.owner, name=name, address='Main St', price=1000, description='-')
+            for number in range(5):
+                room = Room.objects.create(
+                    property=prop, room_no=str(101 + number), rent_amount=Decimal('500.00'), is_occupied=True
+                )
+                Tenant.objects.create(
+                    room=room, tenant_name=f'{name} tenant {number}', phone_no='98000',
+                    email=f'{name.lower()}{number}@example.com', rent_due_date=timezone.now().date()
+                )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_csv(self, header, rows):
+        path = os.path.join(self.directory, 'import.csv')
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return path
+
+    def payment_dataset(self, count):
+        return tablib.Dataset(*[
+            ['', f'sunrise{n % 5}@example.com', str(101 + n % 5), 'Sunrise', '500.00', 'cash', 'paid']
+            for n in range(count)
+        ], headers=['id', 'tenant', 'room', 'property', 'amount', 'method', 'status'])
+
+    def test_foreign_keys_are_resolved_once_per_dataset(self):
+        resource_class = command_resource(PaymentResource)
+        lookups = {}
+        for count in (5, 50):
+            with CaptureQueriesContext(connection) as queries:
+                result = resource_class().import_data(self.payment_dataset(count), dry_run=False)
+            self.assertFalse(result.has_errors() or result.has_validation_errors())
+            lookups[count] = [
+                query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith('SELECT') and 'FROM "tenant_payment"' not in query['sql']
+            ]
+        self.assertEqual(len(lookups[50]), len(lookups[5]))
+        self.assertEqual(Payment.objects.count(), 55)
+        payment = Payment.objects.filter(tenant__email='sunrise3@example.com').first()
+        self.assertEqual((payment.room.room_no, payment.property.name), ('104', 'Sunrise'))
+
+    def test_bad_foreign_keys_are_reported(self):
+        path = self.write_csv(['id', 'tenant', 'room', 'property', 'amount', 'method', 'status'], [
+            ['', 'sunrise0@example.com', '101', 'Sunrise', '500.00', 'cash', 'paid'],
+            ['', 'nobody@example.com', '101', 'Sunrise', '500.00', 'cash', 'paid'],
+            ['', 'sunrise1@example.com', '102', '', '500.00', 'cash', 'paid'],
+            ['', 'sunrise1@example.com', '999', 'Sunrise', '500.00', 'cash', 'paid'],
+        ])
+        err = StringIO()
+        with self.assertRaisesMessage(CommandError, "Validation failed with 3 row errors"):
+            call_command('import_csv', 'payment', path, stdout=StringIO(), stderr=err)
+        self.assertIn("Tenant 'nobody@example.com' does not exist.", err.getvalue())
+        self.assertIn("'102' matches more than one room.", err.getvalue())
+        self.assertIn("Room '999' does not exist.", err.getvalue())
+        self.assertFalse(Payment.objects.exists())
+
+    def test_import_refreshes_derived_data(self):
+        version = owner_version(self.owner).version
+        path = self.write_csv(['id', 'tenant_name', 'room', 'property', 'phone_no', 'email', 'rent_due_date'], [
+            ['', 'Hari Gurung', '105', 'Moonrise', '98111', 'hari@example.com', timezone.now().date().isoformat()],
+        ])
+        Tenant.objects.filter(room__room_no='105', room__property__name='Moonrise').delete()
+        call_command('import_csv', 'tenant', path, '--chunk-size', '1', stdout=StringIO())
+        hari = Tenant.objects.get(email='hari@example.com')
+
+        path = self.write_csv(['id', 'tenant', 'room', 'property', 'amount', 'method', 'status'], [
+            ['', 'hari@example.com', '105', 'Moonrise', '700.00', 'cash', 'paid'],
+            ['', 'sunrise0@example.com', '101', 'Sunrise', '500.00', 'online', 'pending'],
+        ])
+        out = StringIO()
+        call_command('import_csv', 'payment', path, stdout=out)
+        self.assertIn("Import complete.", out.getvalue())
+
+        hari.refresh_from_db()
+        self.assertEqual((hari.paid_total, hari.payment_count), (Decimal('700.00'), 1))
+        self.assertEqual(verify_balances(), [])
+        self.assertEqual(verify_monthly_summaries(), [])
+        self.assertEqual(
+            MonthlyCollectionSummary.objects.get(property__name='Moonrise', month=month_start()).total_collected,
+            Decimal('700.00')
+        )
+        self.assertGreater(owner_version(self.owner).version, version)
+        self.assertEqual(
+            [result.object_id for result in get_backend().search('hari', [KIND_TENANT])], [hari.pk]
+        )
+
+    def test_import_refreshes_only_what_it_wrote(self):
+        other = User.objects.create_user('other', password='secret')
+        elsewhere = Property.objects.create(owner=other, name='Elsewhere', address='-', price=1, description='-')
+        MonthlyCollectionSummary.objects.filter(property=elsewhere).update(total_collected=Decimal('1.00'))
+        other_version = owner_version(other).version
+        version = owner_version(self.owner).version
+        payment = Payment.objects.create(
+            tenant=Tenant.objects.get(email='sunrise0@example.com'), room=Room.objects.get(
+                property__name='Sunrise', room_no='101'
+            ), property=Property.objects.get(name='Sunrise'), amount=Decimal('500.00'), method='cash', status='paid'
+        )
+
+        # Moving a payment refreshes both the property it left and the one it joined.
+        dataset = tablib.Dataset(
+            [payment.pk, 'moonrise0@example.com', '101', 'Moonrise', '300.00', 'cash', 'paid'],
+            headers=['id', 'tenant', 'room', 'property', 'amount', 'method', 'status']
+        )
+        result = PaymentResource().import_data(dataset, dry_run=False)
+        self.assertFalse(result.has_errors() or result.has_validation_errors())
+
+        self.assertEqual(verify_balances(), [])
+        mismatches = verify_monthly_summaries()
+        # Buckets the import did not touch are left alone rather than rebuilt.
+        self.assertEqual([(m[0], m[2]) for m in mismatches], [(elsewhere.pk, 'total_collected')])
+        self.assertEqual(
+            MonthlyCollectionSummary.objects.get(property__name='Moonrise', month=month_start()).total_collected,
+            Decimal('300.00')
+        )
+        self.assertGreater(owner_version(self.owner).version, version)
+        self.assertEqual(owner_version(other).version, other_version)
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """locmem backend that refuses `failing` recipients and counts opened connections"""
+    failing = set()
+    dropping = set()
+    opened = 0
+
+    def open(self):
+        type(self).opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to[0] in self.failing:
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b'No such user')})
+            if message.to[0] in self.dropping:
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='property.tests.FlakyEmailBackend')
+class NotificationOutboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', password='secret')
+        prop = Property.objects.create(owner=owner, name='Sunrise', address='Main St', price=1000, description='-')
+        today = timezone.now().date()
+        cls.tenants = []
+        for number, due in enumerate([today, today, today, today + timedelta(days=1)]):
+            room = Room.objects.create(property=prop, room_no=str(101 + number), rent_amount=500, is_occupied=True)
+            cls.tenants.append(Tenant.objects.create(
+                room=room, tenant_name=f'Tenant {number}', phone_no='98000',
+                email=f'tenant{number}@example.com', rent_due_date=due
+            ))
+
+    def setUp(self):
+        FlakyEmailBackend.failing = set()
+        FlakyEmailBackend.dropping = set()
+        FlakyEmailBackend.opened = 0
+
+    def test_each_worker_reuses_one_connection(self):
+        enqueue_due_rent_emails()
+        FlakyEmailBackend.failing = {self.tenants[1].email}
+        with self.assertLogs('property.utils', 'WARNING'):
+            sent, failed = deliver_notifications(claim_notifications(10), workers=1)
+        self.assertEqual((sent, failed), (2, 1))
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            self.tenants[0].email, self.tenants[2].email
+        ])
+        self.assertEqual(
+            dict(Notification.objects.values_list('tenant_id', 'status')),
+            {self.tenants[0].pk: 'sent', self.tenants[1].pk: 'pending', self.tenants[2].pk: 'sent'}
+        )
+
+        Notification.objects.update(status='pending', next_attempt_at=timezone.now())
+        FlakyEmailBackend.opened = 0
+        mail.outbox = []
+        with self.assertLogs('property.utils', 'WARNING'):
+            deliver_notifications(claim_notifications(10), workers=2)
+        self.assertEqual(FlakyEmailBackend.opened, 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_dropped_connection_is_reopened(self):
+        enqueue_due_rent_emails()
+        FlakyEmailBackend.dropping = {self.tenants[0].email}
+        with self.assertLogs('property.utils', 'WARNING') as logs:
+            sent, failed = deliver_notifications(claim_notifications(10), workers=1)
+        self.assertEqual((sent, failed), (2, 1))
+        self.assertEqual(FlakyEmailBackend.opened, 2)
+        self.assertIn('Connection unexpectedly closed', logs.output[0])
+        self.assertEqual(Notification.objects.get(tenant=self.tenants[0]).last_error, 'Connection unexpectedly closed')
+
+    def test_enqueue_is_idempotent(self):
+        self.assertEqual(enqueue_due_rent_emails(batch_size=2), 3)
+        self.assertEqual(enqueue_due_rent_emails(batch_size=2), 0)
+        self.assertEqual(
+            set(Notification.objects.values_list('tenant_id', flat=True)),
+            {tenant.pk for tenant in self.tenants[:3]}
+        )
+
+    def test_enqueue_counts_only_its_own_rows(self):
+        Notification.objects.create(
+            tenant=self.tenants[0], kind=Notification.KIND_DUE_RENT, due_date=self.tenants[0].rent_due_date,
+            to_email=self.tenants[0].email, subject='-', body='-'
+        )
+        real_queued_keys = queued_keys
+
+        def racing_queued_keys(rows):
+            keys = real_queued_keys(rows)
+            if not Notification.objects.filter(tenant=self.tenants[1]).exists():
+                # Another enqueue inserts a row right after our check.
+                Notification.objects.create(
+                    tenant=self.tenants[1], kind=Notification.KIND_DUE_RENT,
+                    due_date=self.tenants[1].rent_due_date, to_email=self.tenants[1].email, subject='-', body='-'
+                )
+            return keys
+
+        with mock.patch('property.notifications.queued_keys', side_effect=racing_queued_keys):
+            self.assertEqual(enqueue_due_rent_emails(), 1)
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_claim_race_has_one_winner(self):
+        enqueue_due_rent_emails()
+        real_uuid4 = uuid.uuid4
+        other_worker = []
+
+        def uuid4():
+            # Another worker claims the same candidates before our UPDATE.
+            if not other_worker:
+                other_worker.append(None)
+                other_worker[0] = claim_notifications(10)
+            return real_uuid4()
+
+        with mock.patch('property.notifications.uuid.uuid4', side_effect=uuid4):
+            self.assertEqual(claim_notifications(10), [])
+        self.assertEqual(len(other_worker[0]), 3)
+        self.assertEqual(claim_notifications(10), [])
+
+    def test_failures_back_off_until_max_attempts(self):
+        self.assertEqual(retry_delay(1), RETRY_BASE_DELAY)
+        self.assertEqual(retry_delay(2), RETRY_BASE_DELAY * 2)
+        self.assertEqual(retry_delay(20), RETRY_MAX_DELAY)
+
+        enqueue_due_rent_emails()
+        FlakyEmailBackend.failing = {self.tenants[0].email}
+        for attempt in range(1, 4):
+            before = timezone.now()
+            with self.assertLogs('property.utils', 'WARNING'):
+                sent, failed = deliver_notifications(claim_notifications(10, max_attempts=3), max_attempts=3)
+            self.assertEqual((sent, failed), (2 if attempt == 1 else 0, 1))
+            notification = Notification.objects.get(tenant=self.tenants[0])
+            self.assertEqual(notification.attempts, attempt)
+            if attempt < 3:
+                self.assertEqual(notification.status, 'pending')
+                self.assertGreaterEqual(notification.next_attempt_at, before + retry_delay(attempt))
+                self.assertEqual(claim_notifications(10, max_attempts=3), [])  # not due yet
+                Notification.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+        self.assertEqual(notification.status, 'failed')
+        self.assertIn('No such user', notification.last_error)
+        self.assertEqual(Notification.objects.filter(status='sent').count(), 2)
+        self.assertEqual(claim_notifications(10, max_attempts=3), [])
+
+    def test_stale_claims_count_as_attempts(self):
+        enqueue_due_rent_emails()
+        Notification.objects.exclude(tenant=self.tenants[0]).delete()
+        for attempt in range(3):
+            claimed = claim_notifications(10, max_attempts=3)
+            self.assertEqual([(n.status, n.attempts) for n in claimed], [('sending', attempt)])
+            # The worker dies without recording an outcome.
+            Notification.objects.update(claimed_at=timezone.now() - CLAIM_TIMEOUT - timedelta(seconds=1))
+        self.assertEqual(claim_notifications(10, max_attempts=3), [])
+        notification = Notification.objects.get()
+        self.assertEqual((notification.status, notification.attempts), ('failed', 3))
+
+
+class SQLiteProfileTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.settings_dict = dict(copy.deepcopy(connection.settings_dict), NAME=os.path.join(directory, 'db.sqlite3'))
+        self.settings_dict.update(copy.deepcopy(settings.SQLITE_PRODUCTION_PROFILE))
+
+    def open_connection(self, alias):
+        wrapper = SQLiteDatabaseWrapper(self.settings_dict, alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied(self):
+        wrapper = self.open_connection('profile')
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 20000)
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 268435456)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -65536)
+        self.assertEqual(self.pragma(wrapper, 'temp_store'), 2)  # MEMORY
+        self.assertIsNone(wrapper.transaction_mode)
+
+    def test_only_write_transactions_begin_immediate(self):
+        wrapper = self.open_connection('profile')
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with mock.patch.dict(connections._connections.__dict__, {'profile': wrapper}), \
+                wrapper.execute_wrapper(record):
+            with transaction.atomic(using='profile'):
+                self.pragma(wrapper, 'user_version')
+            with write_atomic(using='profile'):
+                with write_atomic(using='profile'):
+                    with wrapper.cursor() as cursor:
+                        cursor.execute('INSERT INTO item DEFAULT VALUES')
+        self.assertEqual([sql for sql in statements if sql.startswith('BEGIN')], ['BEGIN', 'BEGIN IMMEDIATE'])
+        self.assertIsNone(wrapper.transaction_mode)
+
+    def test_reads_are_not_queued_behind_a_writer(self):
+        writer, reader = self.open_connection('writer'), self.open_connection('reader')
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        with mock.patch.dict(connections._connections.__dict__, {'writer': writer, 'reader': reader}):
+            with write_atomic(using='writer'):
+                with writer.cursor() as cursor:
+                    cursor.execute('INSERT INTO item DEFAULT VALUES')
+                with reader.cursor() as cursor:
+                    cursor.execute('PRAGMA busy_timeout = 0')
+                with transaction.atomic(using='reader'):
+                    with reader.cursor() as cursor:
+                        cursor.execute('SELECT COUNT(*) FROM item')
+                        self.assertEqual(cursor.fetchone()[0], 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+    """Reports read from a replica; writes and reads after them stay on the primary"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        prop = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        room = Room.objects.create(property=prop, room_no='101', rent_amount=Decimal('500.00'), is_occupied=True)
+        Tenant.objects.create(
+            room=room, tenant_name='Ram', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date()
+        )
+
+    def setUp(self):
+        cache.clear()
+        dbrouter.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.router = dbrouter.PrimaryReplicaRouter()
+
+    def get_report(self):
+        # The test database has no replica, so "choose" the primary while
+        # recording whether a replica was asked for.
+        with mock.patch('rms.dbrouter.random.choice', return_value='default') as choice:
+            response = self.client.get('/api/monthly-insights/')
+        self.assertEqual(response.status_code, 200)
+        return choice.called
+
+    def settle(self):
+        """Age the owner's data version past the sticky window"""
+        self.client.get('/api/monthly-insights/')
+        OwnerDataVersion.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+        cache.clear()
+
+    def test_reads_stay_on_primary_outside_replica_reads(self):
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+        with dbrouter.replica_reads():
+            self.assertEqual(self.router.db_for_read(Property), 'replica')
+            self.assertEqual(self.router.db_for_write(Property), 'default')
+            self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_report_reads_from_replica(self):
+        self.settle()
+        self.assertTrue(self.get_report())
+
+    def test_reports_stay_on_primary_after_a_write(self):
+        self.settle()
+        response = self.client.post('/api/log-payment/', {
+            'tenant_name': 'Ram', 'room_no': '101', 'property_name': 'Sunrise',
+            'amount': '500.00', 'method': 'cash'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(self.get_report())
+
+        OwnerDataVersion.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+        self.assertFalse(self.get_report())  # the writer's sticky window
+        cache.clear()  # the pin and the cached report
+        self.assertTrue(self.get_report())
+
+
+def png_upload(width=2000, height=1000, name='house.png'):
+    buffer = BytesIO()
+    Image.new('RGBA', (width, height), (200, 100, 50, 255)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+def rotated_jpeg_upload(name='phone.jpg'):
+    """A 400x200 JPEG with EXIF saying it must be turned to 200x400"""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+    exif[0x010F] = 'PhoneMaker'
+    buffer = BytesIO()
+    Image.new('RGB', (400, 200), (10, 120, 200)).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class PropertyImageTests(TestCase):
+    """Content-addressed property images and their resized variants"""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.settings_override = override_settings(MEDIA_ROOT=media, IMAGE_PROCESSING={'WORKERS': 0})
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.owner = User.objects.create_user('owner', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.storage = property_image_storage()
+        self.variants = derivative_storage()
+
+    def create_property(self, image):
+        return Property.objects.create(
+            owner=self.owner, name='Sunrise', address='Main St', price=1000, description='-', image=image
+        )
+
+    def open_stored(self, storage, name):
+        with storage.open(name) as file:
+            image = Image.open(file)
+            image.load()
+        return image
+
+    def assertVariantsExist(self, name, exist=True):
+        for variant in derivative_names(name):
+            self.assertEqual(self.variants.exists(variant), exist, variant)
+
+    def test_upload_creates_variants_and_lists_their_urls(self):
+        response = self.client.post('/api/properties/', {
+            'name': 'Sunrise', 'address': 'Main St', 'price': '1000.00', 'description': '-',
+            'image': png_upload()
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        prop = Property.objects.get()
+        self.assertVariantsExist(prop.image.name)
+        thumbnail = self.open_stored(self.variants, derivative_name(prop.image.name, 320, 'webp'))
+        self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (320, 160)))
+        jpeg = self.open_stored(self.variants, derivative_name(prop.image.name, 160, 'jpeg'))
+        self.assertEqual(jpeg.format, 'JPEG')
+
+        listed = self.client.get('/api/properties/').json()['results'][0]['image_variants']
+        self.assertIn(f'/api/properties/{prop.pk}/image/320.webp?v=', listed['webp']['320'])
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.create_property(png_upload(name='hamster.png'))
+        second = self.create_property(png_upload(name='hamster.png'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^property_images/[0-9a-f]{64}\.png$')
+        self.assertEqual(self.storage.listdir('property_images')[1], [os.path.basename(first.image.name)])
+
+    def test_processing_applies_orientation_and_strips_exif(self):
+        prop = self.create_property(rotated_jpeg_upload())
+        stored = self.open_stored(self.storage, prop.image.name)
+        self.assertEqual(stored.size, (200, 400))
+        self.assertFalse(stored.getexif())
+        self.assertEqual(self.open_stored(self.variants, derivative_name(prop.image.name, 160, 'webp')).size, (160, 320))
+
+    def test_worker_pool_processes_off_request(self):
+        with override_settings(IMAGE_PROCESSING={'WORKERS': 1}):
+            prop = self.create_property(rotated_jpeg_upload())
+            wait_for_pending(timeout=120)
+        self.assertFalse(self.open_stored(self.storage, prop.image.name).getexif())
+        self.assertVariantsExist(prop.image.name)
+
+    @override_settings(IMAGE_DERIVATIVES={'EAGER': False})
+    def test_variant_is_generated_on_first_request(self):
+        prop = self.create_property(png_upload(width=200, height=100))
+        name = derivative_name(prop.image.name, 640, 'jpeg')
+        self.assertFalse(self.variants.exists(name))
+
+        response = self.client.get(f'/api/properties/{prop.pk}/image/640.jpeg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(image.size, (200, 100))  # never upscaled
+        self.assertTrue(self.variants.exists(name))
+
+        self.assertEqual(self.client.get(f'/api/properties/{prop.pk}/image/333.jpeg').status_code, 404)
+
+    @override_settings(IMAGE_DERIVATIVES={'EAGER': False})
+    def test_backfill_creates_missing_variants(self):
+        prop = self.create_property(png_upload())
+        out = StringIO()
+        call_command('backfill_image_derivatives', stdout=out)
+        self.assertIn('1 images, 8 variants created, 0 failed', out.getvalue())
+        self.assertVariantsExist(prop.image.name)
+
+    def test_replacing_the_image_deletes_old_variants(self):
+        prop = self.create_property(png_upload())
+        old = prop.image.name
+        prop.image = png_upload(width=1000, name='new.png')
+        prop.save()
+        self.assertVariantsExist(old, exist=False)
+        self.assertVariantsExist(prop.image.name)
+
+    def test_rehash_merges_legacy_duplicates(self):
+        content = png_upload().read()
+        default = FileSystemStorage()
+        for name in ('property_images/hamster.png', 'property_images/hamster_fysh6gk.png'):
+            default.save(name, ContentFile(content))
+            prop = self.create_property(None)
+            Property.objects.filter(pk=prop.pk).update(image=name)
+
+        out = StringIO()
+        call_command('rehash_property_images', stdout=out)
+        self.assertIn('2 files moved to 1 content-hash names', out.getvalue())
+        names = set(Property.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(self.storage.listdir('property_images')[1], [os.path.basename(names.pop())])
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework import routers
 from .views import PropertyViewSet, RoomViewSet
-from .views import send_due_rent_view, housewise_overview, monthly_insights
+from .views import send_due_rent_view, housewise_overview, monthly_insights, report_cache_stats, property_image_variant
+from . import async_views
 
 router = routers.DefaultRouter()
 router.register(r'properties', PropertyViewSet, basename='property')
@@ -10,7 +11,11 @@ router.register(r'rooms', RoomViewSet, basename='room')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('properties/<int:pk>/image/<int:width>.<slug:fmt>', property_image_variant, name='property-image-variant'),
     path('send-due-rent/', send_due_rent_view, name='send-due-rent'),
     path('housewise-overview/', housewise_overview, name='housewise-overview'),
     path('monthly-insights/', monthly_insights, name='monthly-insights'),
+    path('report-cache-stats/', report_cache_stats, name='report-cache-stats'),
+    path('async/housewise-overview/', async_views.housewise_overview, name='async-housewise-overview'),
+    path('async/monthly-insights/', async_views.monthly_insights, name='async-monthly-insights'),
 ]
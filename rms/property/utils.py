@@ -1,9 +1,13 @@
-from django.core.mail import send_mail
+import logging
+import smtplib
+
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
 
-def send_due_rent_email(to_email, tenant_name, room_no, rent_due_date, rent_amount):
-    subject = f"Rent Due Reminder for Room {room_no}"
-    message = f"""
+logger = logging.getLogger(__name__)
+
+DUE_RENT_SUBJECT = "Rent Due Reminder for Room {room_no}"
+DUE_RENT_BODY = """
     Dear {tenant_name},
 
     This is a friendly reminder that your rent of ${rent_amount} for room {room_no} is due on {rent_due_date}.
@@ -13,10 +17,61 @@ def send_due_rent_email(to_email, tenant_name, room_no, rent_due_date, rent_amou
     Thank you,
     Property Management Team
     """
-    send_mail(
-        subject,
-        message,
+
+
+def build_due_rent_email(to_email, tenant_name, room_no, rent_due_date, rent_amount):
+    """Build (without sending) the due-rent reminder for one tenant"""
+    context = {
+        'tenant_name': tenant_name,
+        'room_no': room_no,
+        'rent_due_date': rent_due_date,
+        'rent_amount': rent_amount,
+    }
+    return EmailMessage(
+        DUE_RENT_SUBJECT.format(**context),
+        DUE_RENT_BODY.format(**context),
         settings.DEFAULT_FROM_EMAIL,
         [to_email],
-        fail_silently=False
     )
+
+
+def connection_lost(exc):
+    # SMTPException subclasses OSError; only socket errors and disconnects
+    # leave the connection unusable.
+    return isinstance(exc, smtplib.SMTPServerDisconnected) or not isinstance(exc, smtplib.SMTPException)
+
+
+def send_emails(messages):
+    """
+    Send `messages` over one connection, opened once and reused for all of
+    them; it is only reopened after the server drops it. A failing message
+    does not abort the run; returns a list of (message, error) pairs where
+    error is None on success.
+    """
+    results = []
+    connection = get_connection(fail_silently=False)
+    is_open = False
+    try:
+        for index, message in enumerate(messages):
+            if not is_open:
+                try:
+                    connection.open()
+                except (smtplib.SMTPException, OSError) as exc:
+                    logger.warning("Could not open email connection: %s", exc)
+                    results.extend((message, exc) for message in messages[index:])
+                    break
+                is_open = True
+            try:
+                connection.send_messages([message])
+            except (smtplib.SMTPException, OSError) as exc:
+                logger.warning("Failed to send email to %s: %s", message.to, exc)
+                results.append((message, exc))
+                if connection_lost(exc):
+                    connection.close()
+                    is_open = False
+            else:
+                results.append((message, None))
+    finally:
+        if is_open:
+            connection.close()
+    return results
@@ -0,0 +1,59 @@
+"""
+Per-owner data versions.
+
+Every write that can change what an owner's read endpoints return bumps
+the owner's OwnerDataVersion with a single UPDATE. Rows are created
+lazily on first read; until then there is no ETag a client could hold,
+so a write with no row to bump is simply a no-op.
+"""
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from rms.transactions import write_atomic
+from .models import OwnerDataVersion
+
+
+def bump_versions(**lookup):
+    """Bump the versions of the owners matching `lookup` (an OwnerDataVersion filter)"""
+    return OwnerDataVersion.objects.filter(**lookup).update(
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+
+
+def bump_owners(owner_ids):
+    owner_ids = set(owner_ids) - {None}
+    if owner_ids:
+        bump_versions(owner_id__in=owner_ids)
+
+
+def bump_for_properties(property_ids):
+    """Bump the owners of `property_ids`"""
+    property_ids = set(property_ids) - {None}
+    if property_ids:
+        bump_versions(owner__properties__pk__in=property_ids)
+
+
+def bump_for_rooms(room_ids):
+    """Bump the owners of the properties `room_ids` belong to"""
+    room_ids = set(room_ids) - {None}
+    if room_ids:
+        bump_versions(owner__properties__rooms__pk__in=room_ids)
+
+
+def bump_all():
+    """Bump every owner, after writes that bypass signals (bulk imports)"""
+    return bump_versions()
+
+
+def owner_version(owner):
+    """The owner's OwnerDataVersion, created on first use"""
+    try:
+        return OwnerDataVersion.objects.get(owner=owner)
+    except OwnerDataVersion.DoesNotExist:
+        try:
+            with write_atomic():
+                return OwnerDataVersion.objects.create(owner=owner)
+        except IntegrityError:
+            return OwnerDataVersion.objects.get(owner=owner)
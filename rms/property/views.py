@@ -1,13 +1,22 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, status
 from .models import Property, Room, Tenant, Payment
 from .serializers import PropertySerializer, RoomSerializer
 from rest_framework.decorators import api_view, permission_classes
 # from rest_framework.permissions import IsAdminUser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from .notifications import send_due_rent_emails
-from django.db.models import Sum
+from .notifications import enqueue_due_rent_emails
+from django.db.models import Exists, OuterRef, Prefetch
+from .rollups import month_start, month_bounds, owner_month_totals
 from django.utils import timezone
+from rms.conditional import conditional_on_owner_version
+from rms.reportcache import cached_owner_report, metrics as report_cache_metrics
+from rms.dbrouter import reads_from_replica
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+from PIL import Image
+from .images import FORMATS, derivative_name, derivative_storage, ensure_derivatives, image_setting
 
 # Create your views here.
 
@@ -16,8 +25,11 @@ class PropertyViewSet(viewsets.ModelViewSet):
     serializer_class = PropertySerializer
     permission_classes = [IsAuthenticated]
     
-    # def get_queryset(self):
-    #     return Property.objects.filter(owner=self.request.user)
+    def get_queryset(self):
+        rooms = Room.objects.select_related('tenant').order_by('pk')
+        return Property.objects.filter(owner=self.request.user).prefetch_related(
+            Prefetch('rooms', queryset=rooms)
+        ).order_by('pk')
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -27,77 +39,68 @@ class RoomViewSet(viewsets.ModelViewSet):
     serializer_class = RoomSerializer
     permission_classes = [IsAuthenticated]
     
+    def get_queryset(self):
+        return Room.objects.filter(property__owner=self.request.user).select_related(
+            'property', 'tenant'
+        ).order_by('pk')
+    
     def perform_create(self, serializer):
         serializer.save()
         
 @api_view(['GET'])
 @permission_classes([IsAuthenticated]) 
 def send_due_rent_view(request):
-    send_due_rent_emails()
+    queued = enqueue_due_rent_emails()
     return Response({
         "status": True,
-        "message": "Due rent emails have been sent."
-    })
+        "message": "Due rent emails have been queued.",
+        "queued": queued
+    }, status=status.HTTP_202_ACCEPTED)
+
+def property_overview(prop):
+    """housewise_overview row for a property annotated by with_rent_totals()"""
+    return {
+        "property": prop.name,
+        "total_rent_due": prop.total_rent_due(),
+        "total_collected": prop.total_rent_collected(),
+        "pending": prop.total_rent_pending()
+    }
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_on_owner_version
+@cached_owner_report
+@reads_from_replica
 def housewise_overview(request):
     """ total rent collected and pending for each property """
-    overview = []
-    properties = Property.objects.filter(owner=request.user)
+    properties = Property.objects.filter(owner=request.user).with_rent_totals().order_by('pk')
     
-    for prop in properties:
-        overview.append({
-            "property": prop.name,
-            "total_rent_due": prop.total_rent_due(),
-            "total_collected": prop.total_rent_collected(),
-            "pending": prop.total_rent_pending()
-        })
+    overview = [property_overview(prop) for prop in properties]
     
     return Response(overview)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def monthly_insights(request):
-    """
-    Get current month's collection status with real-time updates
-    """
-    now = timezone.now()
-    current_month = now.month
-    current_year = now.year
-    
-    properties = Property.objects.filter(owner=request.user)
-    
-    total_expected = 0
-    for prop in properties:
-        occupied_rooms = prop.rooms.filter(is_occupied=True)
-        total_expected += sum(room.rent_amount for room in occupied_rooms)
-    
-    total_collected = Payment.objects.filter(
-        property__owner=request.user,
-        payment_date__month=current_month,
-        payment_date__year=current_year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    total_pending = total_expected - total_collected
-    overall_collection_percentage = (total_collected / total_expected * 100) if total_expected > 0 else 0
-    
-    total_payments_count = Payment.objects.filter(
-        property__owner=request.user,
-        payment_date__month=current_month,
-        payment_date__year=current_year
-    ).count()
-    
-    tenants_with_pending = Tenant.objects.filter(
-        room__property__owner=request.user,
+def pending_rent_tenants(owner, now):
+    """Active tenants of `owner` whose rent is due and who have not paid this month"""
+    month_begin, month_end = month_bounds(now)
+    paid_this_month = Payment.objects.filter(
+        tenant=OuterRef('pk'),
+        payment_date__gte=month_begin,
+        payment_date__lt=month_end
+    )
+    return Tenant.objects.filter(
+        ~Exists(paid_this_month),
+        room__property__owner=owner,
         is_active=True,
         rent_due_date__lte=now.date()
-    ).exclude(
-        payments__payment_date__month=current_month,
-        payments__payment_date__year=current_year
-    ).count()
+    )
+
+def monthly_insights_data(now, totals, tenants_with_pending):
+    total_expected = totals['expected_rent']
+    total_collected = totals['total_collected']
+    total_pending = total_expected - total_collected
+    overall_collection_percentage = (total_collected / total_expected * 100) if total_expected > 0 else 0
     
-    response_data = {
+    return {
         "month": now.strftime("%B %Y"),
         "last_updated": now.isoformat(),
         "summary": {
@@ -105,9 +108,51 @@ def monthly_insights(request):
             "total_collected": float(total_collected),
             "total_pending": float(total_pending),
             "collection_percentage": round(overall_collection_percentage, 2),
-            "total_payments_received": total_payments_count,
+            "total_payments_received": totals['payment_count'],
             "tenants_with_pending_rent": tenants_with_pending
         }
     }
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on_owner_version
+@cached_owner_report
+@reads_from_replica
+def monthly_insights(request):
+    """
+    Get current month's collection status with real-time updates
+    """
+    now = timezone.now()
+    totals = owner_month_totals(request.user, month_start(now))
+    tenants_with_pending = pending_rent_tenants(request.user, now).count()
     
-    return Response(response_data)
+    return Response(monthly_insights_data(now, totals, tenants_with_pending))
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def report_cache_stats(request):
+    """Hit/miss counters of the reporting cache in this process"""
+    return Response(report_cache_metrics.snapshot())
+
+@require_safe
+def property_image_variant(request, pk, width, fmt):
+    """
+    A resized variant of a property's image (see property.images),
+    generated on first request. Public, like the original media files.
+    """
+    if width not in image_setting('WIDTHS') or fmt not in image_setting('FORMATS'):
+        raise Http404("Unknown image variant")
+    prop = get_object_or_404(Property.objects.only('image'), pk=pk)
+    if not prop.image:
+        raise Http404("Property has no image")
+
+    storage = derivative_storage()
+    name = derivative_name(prop.image.name, width, fmt)
+    if not storage.exists(name):
+        try:
+            ensure_derivatives(prop.image, [(width, fmt)])
+        except (OSError, ValueError, Image.DecompressionBombError):
+            raise Http404("Image could not be read")
+    response = FileResponse(storage.open(name, 'rb'), content_type=FORMATS[fmt][2])
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,69 @@
+"""
+Support for the async (ASGI) variants of the reporting views.
+
+DRF views are synchronous, so the async variants are plain Django async
+views. async_report_view gives them what @api_view, IsAuthenticated and
+conditional_on_owner_version give the sync views: authentication with the
+configured DRF authentication classes, ETag/Last-Modified from the owner's
+data version, and rendering with DRF's JSONRenderer so the body matches
+the sync endpoint.
+
+Views decorated with it return the response data, or an HttpResponse for
+errors. Served by an ASGI server (rms.asgi) a worker holds many slow
+requests on its event loop instead of a thread each; under WSGI Django
+runs them in a per-request event loop, which still works.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseBase
+from django.utils.cache import get_conditional_response
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .conditional import owner_validators, set_validators
+
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def authenticate(request):
+    """User authenticated by the DRF authentication classes, or None"""
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    user = drf_request.user
+    return user if user.is_authenticated else None
+
+
+def async_report_view(view):
+    """Decorator for async function views serving owner-scoped reports (GET only)"""
+    @wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            response = json_response({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+            response['Allow'] = 'GET, HEAD'
+            return response
+
+        try:
+            user = await sync_to_async(authenticate)(request)
+        except exceptions.APIException as exc:
+            return json_response({"detail": exc.detail}, status=exc.status_code)
+        if user is None:
+            return json_response({"detail": "Authentication credentials were not provided."}, status=401)
+        request.user = user
+
+        from property.versions import owner_version
+        version = request.owner_data_version = await sync_to_async(owner_version)(user)
+        etag, last_modified = owner_validators(request, version)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            result = await view(request, *args, **kwargs)
+            response = result if isinstance(result, HttpResponseBase) else json_response(result)
+        return set_validators(response, etag, last_modified)
+
+    return wrapped
@@ -0,0 +1,152 @@
+"""
+Helpers shared by the `benchmark_*` management commands.
+
+Benchmarks never touch the configured database: they run against a fresh
+test database that is created before seeding and destroyed afterwards.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+
+@contextmanager
+def isolated_database(verbosity=0, name=None):
+    """
+    Run the block against a throwaway test database, with the test
+    environment (locmem email, 'testserver' allowed host) set up. `name`
+    puts a SQLite test database in that file instead of in memory, for
+    benchmarks whose threads need real file locking.
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings.get('NAME')
+    if name:
+        test_settings['NAME'] = name
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        test_settings['NAME'] = old_test_name
+        teardown_test_environment()
+
+
+def timed(func, repeat=20):
+    """Call `func` `repeat` times and return latency stats in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'min': samples[0],
+        'median': statistics.median(samples),
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'max': samples[-1],
+    }
+
+
+class QueryCounter:
+    """
+    Counts queries run inside the block. Unlike CaptureQueriesContext it
+    is not reset by request_started, so it works around test client calls.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+
+def format_stats(label, stats):
+    return (
+        f"{label:<40} median {stats['median']:8.2f} ms  p95 {stats['p95']:8.2f} ms  "
+        f"min {stats['min']:8.2f} ms"
+    )
+
+
+FIRST_NAMES = ['Ram', 'Sita', 'Hari', 'Gita', 'Shyam', 'Maya', 'Bikash', 'Anita', 'Suman', 'Rita']
+LAST_NAMES = ['Sharma', 'Thapa', 'Gurung', 'Shrestha', 'Karki', 'Rai', 'Magar', 'Tamang']
+
+
+def seed_portfolio(owner, properties=100, rooms_per_property=20, payments=10000,
+                   batch_size=5000, stdout=None, seed=42):
+    """
+    Bulk-create properties, occupied rooms with tenants and `payments`
+    payments spread over the last two years. Signals are not fired, so
+    derived data (rollups, balances, search index) must be rebuilt afterwards.
+    Returns the list of tenants.
+    """
+    from property.models import Property, Room
+    from tenant.models import Tenant, Payment
+
+    rng = random.Random(seed)
+    today = timezone.now().date()
+
+    with transaction.atomic():
+        props = Property.objects.bulk_create([
+            Property(
+                owner=owner, name=f"{rng.choice(LAST_NAMES)} Residency {i}",
+                address=f"Ward {i % 32}, Kathmandu", price=Decimal('100000.00'), description='-'
+            )
+            for i in range(properties)
+        ], batch_size=batch_size)
+        rooms = Room.objects.bulk_create([
+            Room(property=prop, room_no=str(100 + j), rent_amount=Decimal(rng.randrange(5000, 25000, 500)),
+                 is_occupied=True)
+            for prop in props for j in range(rooms_per_property)
+        ], batch_size=batch_size)
+        tenants = Tenant.objects.bulk_create([
+            Tenant(
+                room=room, tenant_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}",
+                phone_no=f"98{n:08d}", email=f"tenant{n}@example.com",
+                rent_due_date=today - timedelta(days=rng.randrange(-15, 15))
+            )
+            for n, room in enumerate(rooms)
+        ], batch_size=batch_size)
+
+    room_by_id = {room.pk: room for room in rooms}
+    created = 0
+    while created < payments:
+        count = min(batch_size, payments - created)
+        batch = []
+        for _ in range(count):
+            tenant = tenants[rng.randrange(len(tenants))]
+            room = room_by_id[tenant.room_id]
+            batch.append(Payment(
+                tenant=tenant, room=room, property_id=room.property_id, amount=room.rent_amount,
+                method=rng.choice(['cash', 'online']), status=rng.choice(['paid', 'paid', 'pending'])
+            ))
+        with transaction.atomic():
+            Payment.objects.bulk_create(batch, batch_size=batch_size)
+        created += count
+        if stdout:
+            stdout.write(f"  seeded {created}/{payments} payments")
+
+    # payment_date is auto_now_add, so spread the dates after inserting.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE tenant_payment SET payment_date = "
+            "strftime('%%Y-%%m-%%d %%H:%%M:%%f', 'now', '-' || (id * 7919 %% 730) || ' days')",
+            []
+        )
+    return tenants
@@ -0,0 +1,63 @@
+"""
+Conditional GET for owner-scoped read endpoints.
+
+The ETag and Last-Modified of a response are derived from the requesting
+owner's data version (property.versions), which is bumped on every write
+to their properties, rooms, tenants or payments. A matching
+If-None-Match / If-Modified-Since is answered with 304 before the view
+runs, so an unchanged poll costs a single primary-key lookup.
+"""
+from datetime import datetime, time
+from functools import wraps
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def owner_version_etag(request, version):
+    # Several endpoints also depend on today's date (overdue flags, the
+    # current month), so the date is part of the validator.
+    return quote_etag(f"{request.user.pk}-{version.version}-{timezone.localdate().isoformat()}")
+
+
+def owner_version_last_modified(version):
+    today = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    return max(version.updated_at, today)
+
+
+def owner_validators(request, version):
+    """(ETag, Last-Modified timestamp) of the requesting owner's data"""
+    etag = owner_version_etag(request, version)
+    last_modified = int(owner_version_last_modified(version).timestamp())
+    return etag, last_modified
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def conditional_on_owner_version(view):
+    """
+    Decorator for function views under @api_view. Authentication and
+    permission checks run first, so the validators are per owner.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        from property.versions import owner_version
+        version = request.owner_data_version = owner_version(request.user)
+        etag, last_modified = owner_validators(request, version)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    return wrapped
@@ -0,0 +1,176 @@
+"""
+Routing of reporting reads to read replicas of `default`.
+
+DATABASE_REPLICAS lists the aliases in DATABASES that replicate the
+primary. Reads go to the primary unless the code runs inside
+replica_reads(), which the reporting views and exports enter through the
+@reads_from_replica decorator; writes always go to the primary.
+
+Reads stay on the primary once the current request has written anything:
+PrimaryPinningMiddleware pins unsafe methods up front, and the router
+pins the request on its first write. The middleware then keeps the
+writing user on the primary for REPLICA_STICKY_SECONDS, and owner-scoped
+reports stay there for as long after the owner's data version was last
+bumped (by anyone), so a report requested right after a payment is
+logged neither misses it nor gets cached under the new version while the
+replicas catch up.
+
+The routing state lives in an asgiref Local, which follows a request
+across sync_to_async and asyncio tasks.
+"""
+import random
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+_state = Local()
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+def pin_primary():
+    _state.pinned = True
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def reset():
+    _state.pinned = False
+    _state.replica = False
+
+
+@contextmanager
+def replica_reads():
+    """Send reads to a replica unless the request is pinned to the primary"""
+    previous = getattr(_state, 'replica', False)
+    _state.replica = True
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary, e.g. to compute values that will be written"""
+    previous = getattr(_state, 'replica', False)
+    _state.replica = False
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def user_pin_key(user):
+    return f"db-primary-pin:{user.pk}"
+
+
+def pin_user(user):
+    if sticky_seconds():
+        cache.set(user_pin_key(user), 1, sticky_seconds())
+
+
+def user_pinned(user):
+    return user.is_authenticated and cache.get(user_pin_key(user)) is not None
+
+
+def recently_written(request):
+    """Whether the request's data may not have reached the replicas yet"""
+    version = getattr(request, 'owner_data_version', None)
+    if version is not None and (timezone.now() - version.updated_at).total_seconds() < sticky_seconds():
+        return True
+    return user_pinned(request.user)
+
+
+def reads_from_replica(view):
+    """
+    Run a (sync or async) view inside replica_reads(). Stack it below the
+    authentication and conditional GET decorators so request.user and
+    request.owner_data_version are known.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            if await sync_to_async(recently_written)(request):
+                return await view(request, *args, **kwargs)
+            with replica_reads():
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if recently_written(request):
+                return view(request, *args, **kwargs)
+            with replica_reads():
+                return view(request, *args, **kwargs)
+    return wrapped
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'replica', False) and not is_pinned():
+            replicas = replica_aliases()
+            if replicas:
+                return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every database holds the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication (or sync_replicas).
+        return db not in replica_aliases()
+
+
+class PrimaryPinningMiddleware:
+    """Resets the routing state per request and records sticky windows"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.start(request)
+        response = self.get_response(request)
+        self.finish(request)
+        return response
+
+    async def __acall__(self, request):
+        self.start(request)
+        response = await self.get_response(request)
+        await sync_to_async(self.finish)(request)
+        return response
+
+    def start(self, request):
+        reset()
+        if request.method not in SAFE_METHODS:
+            pin_primary()
+
+    def finish(self, request):
+        user = getattr(request, 'user', None)
+        if is_pinned() and user is not None and user.is_authenticated:
+            pin_user(user)
@@ -0,0 +1,185 @@
+"""
+Bulk import support for the django-import-export resources.
+
+Resources built on BulkImportMixin write with bulk_create/bulk_update in
+batches, load existing rows for a whole dataset with one query, and
+resolve foreign keys given by natural keys (property name, room number,
+tenant email) from a per-dataset cache instead of a lookup per row.
+Signals do not fire for bulk writes, so after a real (non dry-run)
+import the derived data of the rows it wrote is refreshed in one pass.
+"""
+import copy
+import io
+from collections import defaultdict
+
+from django.core.management import call_command
+from import_export.instance_loaders import CachedInstanceLoader
+from import_export.widgets import ForeignKeyWidget
+
+_AMBIGUOUS = object()
+
+
+class CachedForeignKeyWidget(ForeignKeyWidget):
+    """
+    ForeignKeyWidget whose lookups are answered from a cache filled by
+    `load()` with a single query for all values of the dataset.
+    """
+
+    def __init__(self, model, field='pk', **kwargs):
+        super().__init__(model, field=field, **kwargs)
+        self.cache = {}
+
+    def get_load_queryset(self):
+        return self.model.objects.all()
+
+    def cache_key(self, value, row):
+        return str(value).strip()
+
+    def instance_key(self, instance):
+        return str(getattr(instance, self.field))
+
+    def load(self, dataset, column_name):
+        """Resolve every value of `column_name` in `dataset` at once"""
+        self.cache = {}
+        values = {str(value).strip() for value in dataset[column_name] if value not in (None, '')}
+        if not values:
+            return
+        lookup = 'pk__in' if self.field == 'pk' else f'{self.field}__in'
+        for instance in self.get_load_queryset().filter(**{lookup: values}):
+            key = self.instance_key(instance)
+            self.cache[key] = _AMBIGUOUS if key in self.cache else instance
+
+    def clean(self, value, row=None, **kwargs):
+        if value in (None, ''):
+            return None
+        instance = self.cache.get(self.cache_key(value, row))
+        if instance is None:
+            raise ValueError(f"{self.model._meta.verbose_name.title()} '{value}' does not exist.")
+        if instance is _AMBIGUOUS:
+            raise ValueError(f"'{value}' matches more than one {self.model._meta.verbose_name}.")
+        return instance
+
+
+class RoomWidget(CachedForeignKeyWidget):
+    """
+    Resolves a room number within the property named in `property_column`
+    of the same row. Without a property name the room number must be unique.
+    """
+
+    def __init__(self, property_column='property', **kwargs):
+        from property.models import Room
+        super().__init__(Room, field='room_no', **kwargs)
+        self.property_column = property_column
+
+    def get_load_queryset(self):
+        return super().get_load_queryset().select_related('property')
+
+    def cache_key(self, value, row):
+        property_name = (row or {}).get(self.property_column)
+        return (str(property_name).strip() if property_name else None, str(value).strip())
+
+    def load(self, dataset, column_name):
+        self.cache = {}
+        values = {str(value).strip() for value in dataset[column_name] if value not in (None, '')}
+        if not values:
+            return
+        by_number = defaultdict(list)
+        for room in self.get_load_queryset().filter(room_no__in=values):
+            self.cache[(room.property.name, room.room_no)] = (
+                _AMBIGUOUS if (room.property.name, room.room_no) in self.cache else room
+            )
+            by_number[room.room_no].append(room)
+        for room_no, rooms in by_number.items():
+            self.cache[(None, room_no)] = rooms[0] if len(rooms) == 1 else _AMBIGUOUS
+
+
+def refresh_derived_data(instances=None):
+    """
+    Refresh data normally maintained by model signals. With `instances`,
+    the objects an import wrote plus copies of updated ones as they were
+    before, only what those touch is refreshed; without, everything is
+    rebuilt.
+    """
+    from property.models import Property, Room
+    from property.rollups import (
+        rebuild_monthly_summaries, refresh_expected_rent, refresh_for_payments, refresh_for_properties
+    )
+    from property.versions import bump_all, bump_for_properties, bump_for_rooms, bump_owners
+    from search.backends import get_backend
+    from search.documents import documents_for_ids
+    from tenant.balances import repair_balances
+    from tenant.models import Payment, Tenant
+    from tenant.resolvers import resolution_cache
+
+    if instances is None:
+        resolution_cache.clear()
+        rebuild_monthly_summaries()
+        repair_balances()
+        bump_all()
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        return
+
+    written = defaultdict(list)
+    for instance in instances:
+        written[type(instance)].append(instance)
+    payments, tenants = written[Payment], written[Tenant]
+    properties, rooms = written[Property], written[Room]
+
+    if properties or rooms or tenants:
+        resolution_cache.clear()
+    if payments:
+        refresh_for_payments(payments)
+        repair_balances(pks={('tenant', payment.tenant_id) for payment in payments}
+                        | {('property', payment.property_id) for payment in payments})
+    if properties:
+        refresh_for_properties({property_obj.pk for property_obj in properties})
+    for property_id in {room.property_id for room in rooms}:
+        refresh_expected_rent(property_id)
+
+    bump_owners({property_obj.owner_id for property_obj in properties})
+    bump_for_properties({payment.property_id for payment in payments} | {room.property_id for room in rooms})
+    bump_for_rooms({tenant.room_id for tenant in tenants})
+    if properties or rooms or tenants:
+        get_backend().index(documents_for_ids(
+            {property_obj.pk for property_obj in properties},
+            {room.pk for room in rooms},
+            {tenant.pk for tenant in tenants},
+        ))
+
+
+class BulkImportMixin:
+    """
+    Mixin for ModelResource subclasses. After a real import without
+    errors, derived data of the rows it wrote is refreshed; set
+    `refresh_derived = False` to call refresh_derived_data() yourself.
+    """
+    refresh_derived = True
+
+    def before_import(self, dataset, **kwargs):
+        super().before_import(dataset, **kwargs)
+        self.written_instances = []
+        for field in self.get_import_fields():
+            if isinstance(field.widget, CachedForeignKeyWidget) and field.column_name in dataset.headers:
+                field.widget.load(dataset, field.column_name)
+
+    def import_instance(self, instance, row, **kwargs):
+        if instance.pk is not None:
+            # The row as it was, so whatever it moves away from is refreshed too.
+            self.written_instances.append(copy.copy(instance))
+        super().import_instance(instance, row, **kwargs)
+
+    def after_save_instance(self, instance, row, **kwargs):
+        super().after_save_instance(instance, row, **kwargs)
+        self.written_instances.append(instance)
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        if self.refresh_derived and not self._is_dry_run(kwargs) and not result.has_errors():
+            refresh_derived_data(self.written_instances)
+
+
+class BulkImportMeta:
+    """Meta options shared by the bulk import resources"""
+    use_bulk = True
+    batch_size = 1000
+    instance_loader_class = CachedInstanceLoader
@@ -0,0 +1,19 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+
+Pages are addressed by an opaque cursor encoding the last seen ordering
+value, so the database seeks straight to the next page through an index
+instead of counting rows or skipping an OFFSET. Deep pages cost the same
+as the first one.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    ordering = 'pk'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class PaymentKeysetPagination(KeysetPagination):
+    ordering = ('-payment_date', '-id')
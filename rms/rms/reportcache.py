@@ -0,0 +1,198 @@
+"""
+Server-side cache for owner-scoped reporting views.
+
+Entries are keyed by view, owner, the owner's data version (see
+property.versions) and the query parameters, so a write invalidates every
+cached report of that owner simply by bumping the version; stale entries
+are never read again and age out with the timeout.
+
+Only one worker recomputes a missing entry: it takes a short-lived lock
+with cache.add() while the others wait for the result. Hit/miss counts
+are kept per process and exposed by the report-cache-stats endpoint.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponseBase
+from django.utils import timezone
+from rest_framework.response import Response
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCK_TIMEOUT': 30,
+    'LOCK_WAIT': 5,
+    'POLL_INTERVAL': 0.05,
+}
+
+
+def report_cache_setting(name):
+    return getattr(settings, 'REPORT_CACHE', {}).get(name, DEFAULTS[name])
+
+
+class ReportCacheMetrics:
+    """Thread-safe per-process counters"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+    def snapshot(self):
+        with self.lock:
+            counts = dict(self.counts)
+        lookups = counts.get('hits', 0) + counts.get('misses', 0)
+        counts['hit_ratio'] = round(counts.get('hits', 0) / lookups, 4) if lookups else None
+        return counts
+
+
+metrics = ReportCacheMetrics()
+
+
+def report_cache_key(view_name, request, version):
+    query = getattr(request, 'query_params', request.GET)
+    params = urlencode(sorted(query.lists()), doseq=True)
+    digest = hashlib.sha1(params.encode()).hexdigest()[:16]
+    # updated_at keeps keys unique if a version row is ever recreated.
+    return (
+        f"report:{view_name}:{request.user.pk}:{version.version}:"
+        f"{version.updated_at.timestamp()}:{timezone.localdate().isoformat()}:{digest}"
+    )
+
+
+def cached_owner_report(view):
+    """
+    Decorator for function views under @api_view. Stack it below
+    conditional_on_owner_version, which has already loaded the version.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        version = getattr(request, 'owner_data_version', None)
+        if version is None:
+            from property.versions import owner_version
+            version = owner_version(request.user)
+        cache = caches[report_cache_setting('ALIAS')]
+        key = report_cache_key(view.__name__, request, version)
+
+        data = cache.get(key)
+        if data is not None:
+            metrics.incr('hits')
+            return cached_response(data, 'HIT')
+
+        lock_key = f"{key}:lock"
+        if not cache.add(lock_key, 1, report_cache_setting('LOCK_TIMEOUT')):
+            metrics.incr('waits')
+            data = wait_for(cache, key)
+            if data is not None:
+                metrics.incr('hits')
+                return cached_response(data, 'HIT')
+            # The worker holding the lock is too slow or died; compute
+            # without it rather than failing the request.
+            metrics.incr('lock_timeouts')
+            return compute(view, request, args, kwargs, cache, key)
+        try:
+            return compute(view, request, args, kwargs, cache, key)
+        finally:
+            cache.delete(lock_key)
+
+    return wrapped
+
+
+def async_cached_owner_report(view):
+    """
+    cached_owner_report for the async views in rms.asyncviews. Entries are
+    shared with the sync view of the same name, which returns the same data.
+    """
+    @wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        cache = caches[report_cache_setting('ALIAS')]
+        key = report_cache_key(view.__name__, request, request.owner_data_version)
+
+        data = await cache.aget(key)
+        if data is not None:
+            metrics.incr('hits')
+            return data
+
+        lock_key = f"{key}:lock"
+        if not await cache.aadd(lock_key, 1, report_cache_setting('LOCK_TIMEOUT')):
+            metrics.incr('waits')
+            data = await async_wait_for(cache, key)
+            if data is not None:
+                metrics.incr('hits')
+                return data
+            metrics.incr('lock_timeouts')
+            return await async_compute(view, request, args, kwargs, cache, key)
+        try:
+            return await async_compute(view, request, args, kwargs, cache, key)
+        finally:
+            await cache.adelete(lock_key)
+
+    return wrapped
+
+
+def compute(view, request, args, kwargs, cache, key):
+    metrics.incr('misses')
+    started = time.perf_counter()
+    response = view(request, *args, **kwargs)
+    if response.status_code == 200 and isinstance(response, Response):
+        cache.set(key, response.data, report_cache_setting('TIMEOUT'))
+        metrics.incr('stores')
+    metrics.incr('compute_ms', int((time.perf_counter() - started) * 1000))
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def wait_for(cache, key):
+    deadline = time.monotonic() + report_cache_setting('LOCK_WAIT')
+    interval = report_cache_setting('POLL_INTERVAL')
+    while time.monotonic() < deadline:
+        time.sleep(interval)
+        data = cache.get(key)
+        if data is not None:
+            return data
+    return None
+
+
+async def async_compute(view, request, args, kwargs, cache, key):
+    metrics.incr('misses')
+    started = time.perf_counter()
+    result = await view(request, *args, **kwargs)
+    if not isinstance(result, HttpResponseBase):
+        await cache.aset(key, result, report_cache_setting('TIMEOUT'))
+        metrics.incr('stores')
+    metrics.incr('compute_ms', int((time.perf_counter() - started) * 1000))
+    return result
+
+
+async def async_wait_for(cache, key):
+    deadline = time.monotonic() + report_cache_setting('LOCK_WAIT')
+    interval = report_cache_setting('POLL_INTERVAL')
+    while time.monotonic() < deadline:
+        await asyncio.sleep(interval)
+        data = await cache.aget(key)
+        if data is not None:
+            return data
+    return None
+
+
+def cached_response(data, state):
+    response = Response(data)
+    response['X-Cache'] = state
+    return response
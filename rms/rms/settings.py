@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -55,7 +56,8 @@ INSTALLED_APPS = [
     'drf_yasg',
     'accounts',
     'property',
-    'tenant'
+    'tenant',
+    'search'
 ]
 
 AUTH_USER_MODEL = 'accounts.User'
@@ -65,6 +67,7 @@ SILENCED_SYSTEM_CHECKS = ["security.W019"]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'rms.dbrouter.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     # 'django.middleware.csrf.CsrfViewMiddleware',
@@ -103,6 +106,51 @@ DATABASES = {
     }
 }
 
+# Read replicas of `default` for reports and exports (rms.dbrouter). Each
+# comma-separated file in DATABASE_REPLICA_FILES becomes a SQLite replica;
+# `manage.py sync_replicas` copies the primary into them for local testing.
+DATABASE_REPLICAS = []
+for index, name in enumerate(filter(None, os.getenv("DATABASE_REPLICA_FILES", "").split(","))):
+    alias = f'replica{index + 1}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / name.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['rms.dbrouter.PrimaryReplicaRouter']
+
+# SQLite tuning for production (DATABASE_PROFILE=production). WAL lets
+# reports read while a payment is written, busy_timeout makes a blocked
+# writer wait instead of failing with "database is locked", and
+# connections persist across requests. Transactions stay DEFERRED; the
+# application's write transactions begin IMMEDIATE through
+# rms.transactions.write_atomic.
+SQLITE_PRODUCTION_PROFILE = {
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA busy_timeout=20000;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA mmap_size=268435456;'
+            'PRAGMA cache_size=-65536;'
+            'PRAGMA temp_store=MEMORY'
+        ),
+    },
+}
+
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "development")
+if DATABASE_PROFILE == 'production':
+    for database in DATABASES.values():
+        database.update(copy.deepcopy(SQLITE_PRODUCTION_PROFILE))
+
+# Seconds reads stay on the primary after a user's write or a bump of the
+# owner's data version, covering replication lag.
+REPLICA_STICKY_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -127,8 +175,36 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'rms.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+}
+
+# In-process cache used by log_payment to resolve property/room/tenant names
+PAYMENT_RESOLVER_CACHE = {
+    'MAX_SIZE': 4096,
+    'TTL': 60,
+}
+
+# Serve payment lists (list_payments, tenant_payment_history) through the
+# values()-based PaymentRowSerializer instead of PaymentSerializer. Single
+# requests can opt in with ?fast=1 (or out with ?fast=0).
+FAST_PAYMENT_LISTS = os.getenv("FAST_PAYMENT_LISTS") == "True"
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache of owner reporting views (rms.reportcache); keys carry the owner's
+# data version, so entries are invalidated by writes rather than timeouts.
+REPORT_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCK_TIMEOUT': 30,
+    'LOCK_WAIT': 5,
 }
 
 SIMPLE_JWT = {
@@ -136,6 +212,19 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+
+# User cache of accounts.authentication.CachedJWTAuthentication. Entries
+# live for at most TIMEOUT seconds. The cache is only used when ALIAS
+# names a cache shared by all workers (not locmem), so deactivations and
+# password changes apply everywhere; REQUIRE_SHARED_CACHE = False allows
+# a process-local cache for single-process deployments.
+JWT_USER_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+    'REQUIRE_SHARED_CACHE': True,
+    'BLACKLIST_MAX_SIZE': 10000,
+    'BLACKLIST_RELOAD': 60,
+}
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -164,6 +253,32 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# Property images are stored by content hash (property.storage); their
+# resized variants live in the default storage.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'property_images': {'BACKEND': 'property.storage.ContentHashStorage'},
+}
+
+# Resized variants of Property.image (property.images), served by
+# /api/properties/<pk>/image/<width>.<format>.
+IMAGE_DERIVATIVES = {
+    'WIDTHS': [160, 320, 640, 1280],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'EAGER': True,
+    'DIRECTORY': 'derivatives',
+}
+
+# Worker processes that strip metadata from uploaded images and render
+# their variants outside the request (property.processing); 0 = inline.
+IMAGE_PROCESSING = {
+    'WORKERS': 2,
+    'MAX_PENDING': 100,
+    'ORIGINAL_QUALITY': 90,
+}
+
 customColorPalette = [
         {
             'color': 'hsl(4, 90%, 58%)',
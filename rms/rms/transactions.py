@@ -0,0 +1,43 @@
+"""
+Write transactions for SQLite.
+
+SQLite starts a transaction DEFERRED: it reads under a shared snapshot and
+only asks for the write lock at its first write. If another connection
+committed in between, that upgrade fails at once with "database is
+locked"; busy_timeout does not help, since waiting cannot make the
+snapshot current again. Beginning with BEGIN IMMEDIATE takes the write
+lock up front, where a busy writer is simply waited for.
+
+Django's sqlite3 backend can only set the mode per connection
+(OPTIONS['transaction_mode']), which would also make read-only atomic
+blocks (admin change forms, for instance) queue behind writers. The
+application's write transactions use write_atomic() instead, and every
+other transaction keeps SQLite's DEFERRED default.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def write_atomic(using=None, savepoint=True):
+    """
+    transaction.atomic() that begins with BEGIN IMMEDIATE on SQLite when it
+    opens the outermost transaction. Nested blocks are plain savepoints.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using, savepoint=savepoint):
+            yield
+        return
+
+    # Connecting reads transaction_mode from the settings, so connect first.
+    connection.ensure_connection()
+    mode = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using, savepoint=savepoint):
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
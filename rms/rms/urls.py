@@ -44,6 +44,7 @@ urlpatterns = [
     path('api-auth/', include('rest_framework.urls')),
     path('api/', include('property.urls')),
     path('api/', include('tenant.urls')),
+    path('api/', include('search.urls')),
     path('api/accounts/', include('accounts.urls')),
     path('swagger.<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
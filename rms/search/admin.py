@@ -0,0 +1,14 @@
+from .backends import get_backend
+
+
+class IndexedSearchMixin:
+    """
+    Admin mixin answering the changelist search box from the search index
+    instead of LIKE '%term%' scans over `search_fields`.
+    """
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(get_backend().match_q('pk', search_term, self.search_kind)), False
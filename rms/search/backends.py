@@ -0,0 +1,195 @@
+"""
+Pluggable search backends.
+
+The backend is chosen with the SEARCH_BACKEND setting (a dotted path). By
+default SQLite databases use the FTS5 index created by this app's
+migration and other databases fall back to plain ORM lookups.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .documents import KINDS, KIND_TENANT, KIND_PROPERTY, KIND_ROOM
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchResult:
+    __slots__ = ('kind', 'object_id', 'title', 'body', 'rank')
+
+    def __init__(self, kind, object_id, title, body, rank):
+        self.kind = kind
+        self.object_id = object_id
+        self.title = title
+        self.body = body
+        self.rank = rank
+
+    def as_dict(self):
+        return {
+            "type": self.kind,
+            "id": self.object_id,
+            "title": self.title,
+            "detail": self.body,
+            "rank": self.rank,
+        }
+
+
+class BaseSearchBackend:
+
+    def index(self, documents):
+        """Add or replace `documents` in the index"""
+        raise NotImplementedError
+
+    def remove(self, kind, object_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query, kinds=None, owner_id=None, limit=50):
+        """Ranked SearchResults whose tokens start with the query's tokens"""
+        raise NotImplementedError
+
+    def ids(self, query, kind, owner_id=None, limit=None):
+        """Primary keys of `kind` objects matching `query`, best match first"""
+        return [result.object_id for result in self.search(query, [kind], owner_id, limit)]
+
+    def match_q(self, field, query, kind, owner_id=None):
+        """Q restricting `field` to the primary keys of matching `kind` objects"""
+        return Q(**{f'{field}__in': self.ids(query, kind, owner_id)})
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    FTS5 index in the `search_index` virtual table. The rowid packs the
+    object id and kind so updates and deletes are rowid lookups.
+    """
+    table = 'search_index'
+    kind_codes = {KIND_PROPERTY: 1, KIND_ROOM: 2, KIND_TENANT: 3}
+    # bm25 weights per column: kind, object_id, owner_id, title, body
+    weights = (0.0, 0.0, 0.0, 5.0, 1.0)
+
+    def rowid(self, kind, object_id):
+        return object_id * 4 + self.kind_codes[kind]
+
+    def match_expression(self, query):
+        tokens = TOKEN_RE.findall(query)
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def index(self, documents):
+        rows = [
+            (self.rowid(doc.kind, doc.object_id), doc.kind, doc.object_id, doc.owner_id, doc.title, doc.body)
+            for doc in documents
+        ]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, kind, object_id, owner_id, title, body) '
+                f'VALUES (%s, %s, %s, %s, %s, %s)',
+                rows
+            )
+
+    def remove(self, kind, object_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [self.rowid(kind, object_id)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def match_q(self, field, query, kind, owner_id=None):
+        # Keep the match inside the database as a subquery rather than
+        # materialising a potentially long list of ids.
+        sql = f'SELECT object_id FROM {self.table} WHERE {self.table} MATCH %s AND kind = %s'
+        params = [self.match_expression(query) or '""', kind]
+        if owner_id is not None:
+            sql += ' AND owner_id = %s'
+            params.append(owner_id)
+        return Q(**{f'{field}__in': RawSQL(sql, params)})
+
+    def search(self, query, kinds=None, owner_id=None, limit=50):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        sql = (
+            f'SELECT kind, object_id, title, body, bm25({self.table}, {", ".join(map(str, self.weights))}) AS rank '
+            f'FROM {self.table} WHERE {self.table} MATCH %s'
+        )
+        params = [expression]
+        if kinds:
+            sql += f' AND kind IN ({", ".join(["%s"] * len(kinds))})'
+            params.extend(kinds)
+        if owner_id is not None:
+            sql += ' AND owner_id = %s'
+            params.append(owner_id)
+        sql += ' ORDER BY rank'
+        if limit:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [SearchResult(*row) for row in cursor.fetchall()]
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Fallback that queries the models directly with case-insensitive word
+    prefix matching. Keeps nothing to index; results are unranked.
+    """
+    lookups = {
+        KIND_TENANT: (['tenant_name', 'phone_no', 'email', 'room__room_no', 'room__property__name'],
+                      'room__property__owner_id'),
+        KIND_PROPERTY: (['name', 'address'], 'owner_id'),
+        KIND_ROOM: (['room_no', 'property__name'], 'property__owner_id'),
+    }
+
+    def index(self, documents):
+        pass
+
+    def remove(self, kind, object_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def matching(self, query, kind, owner_id=None):
+        fields, owner_field = self.lookups[kind]
+        queryset = KINDS[kind].objects.all()
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return queryset.none()
+        for token in tokens:
+            condition = Q()
+            for field in fields:
+                # A prefix of any word, as the FTS index matches.
+                condition |= Q(**{f'{field}__istartswith': token}) | Q(**{f'{field}__icontains': f' {token}'})
+            queryset = queryset.filter(condition)
+        if owner_id is not None:
+            queryset = queryset.filter(**{owner_field: owner_id})
+        return queryset
+
+    def match_q(self, field, query, kind, owner_id=None):
+        return Q(**{f'{field}__in': self.matching(query, kind, owner_id).values('pk')})
+
+    def search(self, query, kinds=None, owner_id=None, limit=50):
+        results = []
+        for kind in kinds or KINDS:
+            queryset = self.matching(query, kind, owner_id)
+            for obj in queryset.order_by('pk')[:limit]:
+                results.append(SearchResult(kind, obj.pk, str(obj), '', 0.0))
+        return results[:limit] if limit else results
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path is None:
+        return SQLiteFTSBackend() if connection.vendor == 'sqlite' else DatabaseSearchBackend()
+    return import_string(path)()
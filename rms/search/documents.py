@@ -0,0 +1,92 @@
+"""
+What gets indexed for each searchable model.
+
+Every document has a kind, the object's primary key, the owning user (so
+results can be scoped) and two text fields: `title`, which ranks higher,
+and `body`.
+"""
+from collections import namedtuple
+
+from django.db.models import Q
+
+from property.models import Property, Room
+from tenant.models import Tenant
+
+Document = namedtuple('Document', ['kind', 'object_id', 'owner_id', 'title', 'body'])
+
+KIND_TENANT = 'tenant'
+KIND_PROPERTY = 'property'
+KIND_ROOM = 'room'
+
+KINDS = {
+    KIND_TENANT: Tenant,
+    KIND_PROPERTY: Property,
+    KIND_ROOM: Room,
+}
+
+
+def tenant_document(tenant):
+    room = tenant.room
+    return Document(
+        KIND_TENANT, tenant.pk, room.property.owner_id, tenant.tenant_name,
+        ' '.join([tenant.phone_no, tenant.email, room.room_no, room.property.name])
+    )
+
+
+def property_document(property_obj):
+    return Document(
+        KIND_PROPERTY, property_obj.pk, property_obj.owner_id, property_obj.name, property_obj.address
+    )
+
+
+def room_document(room):
+    return Document(
+        KIND_ROOM, room.pk, room.property.owner_id, room.room_no, room.property.name
+    )
+
+
+def documents_for(instance):
+    """Documents to (re)index after `instance` changed, including dependents"""
+    if isinstance(instance, Tenant):
+        return [tenant_document(instance)]
+    if isinstance(instance, Room):
+        documents = [room_document(instance)]
+        tenant = Tenant.objects.filter(room=instance).select_related('room__property').first()
+        if tenant:
+            documents.append(tenant_document(tenant))
+        return documents
+    if isinstance(instance, Property):
+        rooms = Room.objects.filter(property=instance).select_related('property')
+        tenants = Tenant.objects.filter(room__property=instance).select_related('room__property')
+        return (
+            [property_document(instance)]
+            + [room_document(room) for room in rooms]
+            + [tenant_document(tenant) for tenant in tenants]
+        )
+    return []
+
+
+def documents_for_ids(property_ids=(), room_ids=(), tenant_ids=()):
+    """
+    Documents of the given objects and their dependents, as documents_for()
+    gives them, with three queries however many objects there are.
+    """
+    property_ids, room_ids, tenant_ids = set(property_ids), set(room_ids), set(tenant_ids)
+    documents = [property_document(property_obj) for property_obj in Property.objects.filter(pk__in=property_ids)]
+    rooms = Room.objects.filter(Q(pk__in=room_ids) | Q(property__in=property_ids)).select_related('property')
+    documents += [room_document(room) for room in rooms]
+    tenants = Tenant.objects.filter(
+        Q(pk__in=tenant_ids) | Q(room__in=room_ids) | Q(room__property__in=property_ids)
+    ).select_related('room__property')
+    documents += [tenant_document(tenant) for tenant in tenants]
+    return documents
+
+
+def all_documents(chunk_size=2000):
+    """Every document, streamed for a full rebuild"""
+    for property_obj in Property.objects.iterator(chunk_size=chunk_size):
+        yield property_document(property_obj)
+    for room in Room.objects.select_related('property').iterator(chunk_size=chunk_size):
+        yield room_document(room)
+    for tenant in Tenant.objects.select_related('room__property').iterator(chunk_size=chunk_size):
+        yield tenant_document(tenant)
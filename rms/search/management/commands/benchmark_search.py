@@ -0,0 +1,50 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from accounts.models import User
+from rms.benchmarks import isolated_database, seed_portfolio, timed, format_stats
+from search.backends import SQLiteFTSBackend
+from search.documents import KIND_TENANT, KIND_PROPERTY
+from tenant.models import Payment
+
+
+class Command(BaseCommand):
+    help = "Compare LIKE scans with the search index on a seeded test database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=1_000_000)
+        parser.add_argument('--properties', type=int, default=500)
+        parser.add_argument('--rooms', type=int, default=20, help="Rooms per property")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            owner = User.objects.create_user('benchmark', password='benchmark')
+            self.stdout.write("Seeding...")
+            tenants = seed_portfolio(
+                owner, properties=options['properties'], rooms_per_property=options['rooms'],
+                payments=options['payments'], stdout=self.stdout
+            )
+            call_command('rebuild_search_index', stdout=self.stdout)
+
+            backend = SQLiteFTSBackend()
+            tenant_term = tenants[len(tenants) // 2].tenant_name.split()[-1]
+            property_term = 'Thapa'
+            base = Payment.objects.select_related('tenant', 'room', 'property').order_by('-payment_date', '-id')
+
+            cases = [
+                (f"tenant LIKE '%{tenant_term}%'",
+                 lambda: list(base.filter(tenant__tenant_name__icontains=tenant_term)[:50])),
+                (f"tenant FTS '{tenant_term}*'",
+                 lambda: list(base.filter(backend.match_q('tenant_id', tenant_term, KIND_TENANT))[:50])),
+                (f"property LIKE '%{property_term}%'",
+                 lambda: list(base.filter(property__name__icontains=property_term)[:50])),
+                (f"property FTS '{property_term}*'",
+                 lambda: list(base.filter(backend.match_q('property_id', property_term, KIND_PROPERTY))[:50])),
+                ("search endpoint query 'ram sha'",
+                 lambda: backend.search('ram sha', owner_id=owner.pk, limit=20)),
+            ]
+            self.stdout.write(f"\n{options['payments']} payments, {len(tenants)} tenants")
+            for label, func in cases:
+                self.stdout.write(format_stats(label, timed(func, options['repeat'])))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from rms.transactions import write_atomic
+from search.backends import get_backend
+from search.documents import all_documents
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index for tenants, properties and rooms"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        chunk_size = options['chunk_size']
+        count = 0
+        with write_atomic():
+            backend.clear()
+            chunk = []
+            for document in all_documents(chunk_size):
+                chunk.append(document)
+                if len(chunk) >= chunk_size:
+                    backend.index(chunk)
+                    count += len(chunk)
+                    chunk = []
+            backend.index(chunk)
+            count += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents."))
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from property.models import Property, Room
+from tenant.models import Tenant
+from .backends import get_backend
+from .documents import documents_for, KIND_TENANT, KIND_PROPERTY, KIND_ROOM
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Property)
+def index_instance(sender, instance, **kwargs):
+    get_backend().index(documents_for(instance))
+
+
+@receiver(post_delete, sender=Tenant)
+def unindex_tenant(sender, instance, **kwargs):
+    get_backend().remove(KIND_TENANT, instance.pk)
+
+
+@receiver(post_delete, sender=Room)
+def unindex_room(sender, instance, **kwargs):
+    get_backend().remove(KIND_ROOM, instance.pk)
+
+
+@receiver(post_delete, sender=Property)
+def unindex_property(sender, instance, **kwargs):
+    get_backend().remove(KIND_PROPERTY, instance.pk)
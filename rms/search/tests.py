@@ -0,0 +1,164 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from property.models import Property, Room
+from tenant.models import Tenant, Payment
+from .backends import DatabaseSearchBackend, SQLiteFTSBackend, get_backend
+from .documents import KIND_TENANT, KIND_PROPERTY, KIND_ROOM
+
+
+class SearchFixtureMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.other_owner = User.objects.create_user('other', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise Residency', address='Lakeside Rd', price=1000, description='-'
+        )
+        cls.room = Room.objects.create(property=cls.property, room_no='101', rent_amount=500, is_occupied=True)
+        cls.tenant = Tenant.objects.create(
+            room=cls.room, tenant_name='Ram Thapa', phone_no='98000', email='rthapa@example.com',
+            rent_due_date=timezone.now().date()
+        )
+        cls.other_property = Property.objects.create(
+            owner=cls.other_owner, name='Sunset Villa', address='Hill Rd', price=1000, description='-'
+        )
+        cls.other_room = Room.objects.create(
+            property=cls.other_property, room_no='201', rent_amount=500, is_occupied=True
+        )
+        cls.other_tenant = Tenant.objects.create(
+            room=cls.other_room, tenant_name='Ram Karki', phone_no='98001', email='rkarki@example.com',
+            rent_due_date=timezone.now().date()
+        )
+        cls.payment = Payment.objects.create(
+            tenant=cls.tenant, room=cls.room, property=cls.property, amount=500, method='cash'
+        )
+        cls.other_payment = Payment.objects.create(
+            tenant=cls.other_tenant, room=cls.other_room, property=cls.other_property, amount=500, method='cash'
+        )
+
+    def found(self, query, kinds=None, owner=None):
+        owner_id = owner.pk if owner else None
+        return {(result.kind, result.object_id) for result in self.backend.search(query, kinds, owner_id)}
+
+    def matched_payments(self, query, owner=None):
+        condition = self.backend.match_q('tenant_id', query, KIND_TENANT, owner.pk if owner else None)
+        return set(Payment.objects.filter(condition).values_list('pk', flat=True))
+
+    def test_prefix_search_is_scoped_to_owner(self):
+        self.assertEqual(
+            self.found('ram', [KIND_TENANT]),
+            {(KIND_TENANT, self.tenant.pk), (KIND_TENANT, self.other_tenant.pk)}
+        )
+        self.assertEqual(self.found('ram', [KIND_TENANT], self.owner), {(KIND_TENANT, self.tenant.pk)})
+        self.assertEqual(self.found('sunset', owner=self.owner), set())
+        self.assertEqual(self.found('ram tha'), {(KIND_TENANT, self.tenant.pk)})
+
+    def test_match_q_restricts_payments(self):
+        self.assertEqual(self.matched_payments('ram'), {self.payment.pk, self.other_payment.pk})
+        self.assertEqual(self.matched_payments('karki'), {self.other_payment.pk})
+        self.assertEqual(self.matched_payments('ram', self.other_owner), {self.other_payment.pk})
+        self.assertEqual(self.matched_payments('nobody'), set())
+
+
+class SQLiteFTSBackendTests(SearchFixtureMixin, TestCase):
+    backend = SQLiteFTSBackend()
+
+    def test_default_backend_on_sqlite(self):
+        self.assertIsInstance(get_backend(), SQLiteFTSBackend)
+
+    def test_title_matches_rank_first(self):
+        # "Sunrise" is the property's title and part of its room's and
+        # tenant's bodies.
+        results = self.backend.search('sunrise', owner_id=self.owner.pk)
+        self.assertEqual(
+            {(result.kind, result.object_id) for result in results},
+            {(KIND_PROPERTY, self.property.pk), (KIND_ROOM, self.room.pk), (KIND_TENANT, self.tenant.pk)}
+        )
+        self.assertEqual((results[0].kind, results[0].object_id), (KIND_PROPERTY, self.property.pk))
+        ranks = [result.rank for result in results]
+        self.assertEqual(ranks, sorted(ranks))
+
+    def test_match_q_is_a_subquery(self):
+        queryset = Payment.objects.filter(self.backend.match_q('tenant_id', 'ram', KIND_TENANT, self.owner.pk))
+        sql = str(queryset.query)
+        self.assertIn('IN (SELECT object_id FROM search_index WHERE search_index MATCH', sql)
+        self.assertEqual(list(queryset), [self.payment])
+
+    def test_index_follows_writes(self):
+        self.tenant.tenant_name = 'Hari Thapa'
+        self.tenant.save()
+        self.assertEqual(self.found('ram', [KIND_TENANT], self.owner), set())
+        self.assertEqual(self.found('hari', [KIND_TENANT], self.owner), {(KIND_TENANT, self.tenant.pk)})
+
+        # Renaming a property reindexes the rooms and tenants that mention it.
+        self.property.name = 'Moonlight Towers'
+        self.property.save()
+        self.assertEqual(self.found('moonlight', owner=self.owner), {
+            (KIND_PROPERTY, self.property.pk), (KIND_ROOM, self.room.pk), (KIND_TENANT, self.tenant.pk)
+        })
+        self.assertEqual(self.found('sunrise'), set())
+
+        self.tenant.delete()
+        self.assertEqual(self.found('hari'), set())
+
+    def test_moving_a_property_changes_its_owner_scope(self):
+        self.property.owner = self.other_owner
+        self.property.save()
+        self.assertEqual(self.found('ram', [KIND_TENANT], self.owner), set())
+        self.assertEqual(
+            self.found('ram', [KIND_TENANT], self.other_owner),
+            {(KIND_TENANT, self.tenant.pk), (KIND_TENANT, self.other_tenant.pk)}
+        )
+
+    def test_rebuild_search_index(self):
+        self.backend.clear()
+        self.assertEqual(self.found('ram'), set())
+        out = StringIO()
+        call_command('rebuild_search_index', '--chunk-size', '2', stdout=out)
+        self.assertIn("Indexed 6 documents.", out.getvalue())
+        self.assertEqual(
+            self.found('ram', [KIND_TENANT]),
+            {(KIND_TENANT, self.tenant.pk), (KIND_TENANT, self.other_tenant.pk)}
+        )
+        self.assertEqual(self.found('201', [KIND_ROOM], self.other_owner), {(KIND_ROOM, self.other_room.pk)})
+
+    def test_search_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.get('/api/search/', {'q': 'ram'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['type'], row['id']) for row in response.data['results']], [
+            (KIND_TENANT, self.tenant.pk)
+        ])
+        response = client.get('/api/search/', {'q': 'sunset'})
+        self.assertEqual(response.data['results'], [])
+        response = client.get('/api/search/', {'q': 'sun', 'type': 'room'})
+        self.assertEqual([(row['type'], row['id']) for row in response.data['results']], [
+            (KIND_ROOM, self.room.pk)
+        ])
+        self.assertEqual(client.get('/api/search/').status_code, 400)
+        self.assertEqual(client.get('/api/search/', {'q': 'ram', 'type': 'payment'}).status_code, 400)
+
+
+class DatabaseSearchBackendTests(SearchFixtureMixin, TestCase):
+    backend = DatabaseSearchBackend()
+
+    def test_selected_by_setting(self):
+        get_backend.cache_clear()
+        try:
+            with override_settings(SEARCH_BACKEND='search.backends.DatabaseSearchBackend'):
+                self.assertIsInstance(get_backend(), DatabaseSearchBackend)
+        finally:
+            get_backend.cache_clear()
+
+    def test_reads_current_rows(self):
+        Tenant.objects.filter(pk=self.tenant.pk).update(tenant_name='Hari Thapa')
+        self.assertEqual(self.found('hari', owner=self.owner), {(KIND_TENANT, self.tenant.pk)})
+        self.assertEqual(self.found('sunrise', [KIND_ROOM], self.owner), {(KIND_ROOM, self.room.pk)})
@@ -0,0 +1,39 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+
+from .backends import get_backend
+from .documents import KINDS
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request):
+    """
+    Ranked prefix search over the owner's tenants, properties and rooms.
+    Query params: q (required), type (tenant, property or room), limit.
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    kind = request.query_params.get('type')
+    if kind and kind not in KINDS:
+        return Response(
+            {"error": f"type must be one of {', '.join(KINDS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        limit = min(int(request.query_params.get('limit', 20)), 100)
+    except ValueError:
+        limit = 20
+
+    results = get_backend().search(
+        query, kinds=[kind] if kind else None, owner_id=request.user.id, limit=limit
+    )
+    return Response({
+        "query": query,
+        "results": [result.as_dict() for result in results]
+    })
@@ -1,25 +1,50 @@
 from django.contrib import admin
 from .models import Tenant, Payment
 from import_export.admin import ImportExportModelAdmin
-from import_export import resources
+from import_export import resources, fields
+from property.models import Property
+from rms.imports import BulkImportMixin, BulkImportMeta, CachedForeignKeyWidget, RoomWidget
+from search.admin import IndexedSearchMixin
+from search.documents import KIND_TENANT
 
 # Register your models here.
 
 # admin.site.register(Tenant)
 
-class TenantResource(resources.ModelResource):
-    class Meta:
+class TenantResource(BulkImportMixin, resources.ModelResource):
+    property = fields.Field(attribute='room__property__name', column_name='property', readonly=True)
+    room = fields.Field(attribute='room', column_name='room', widget=RoomWidget(property_column='property'))
+
+    class Meta(BulkImportMeta):
         model = Tenant
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('room__property')
         
-class PaymentResource(resources.ModelResource):
-    class Meta:
+class PaymentResource(BulkImportMixin, resources.ModelResource):
+    tenant = fields.Field(attribute='tenant', column_name='tenant', widget=CachedForeignKeyWidget(Tenant, 'email'))
+    room = fields.Field(attribute='room', column_name='room', widget=RoomWidget(property_column='property'))
+    property = fields.Field(
+        attribute='property', column_name='property', widget=CachedForeignKeyWidget(Property, 'name')
+    )
+
+    class Meta(BulkImportMeta):
         model = Payment
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('tenant', 'room', 'property')
+
 @admin.register(Tenant)
-class TenantAdmin(ImportExportModelAdmin):
+class TenantAdmin(IndexedSearchMixin, ImportExportModelAdmin):
     resource_class = TenantResource
+    search_kind = KIND_TENANT
     list_display = ('tenant_name', 'room', 'phone_no', 'rent_due_date', 'is_active')
     list_filter = ('is_active',)
-    search_fields = ('tenant_name', 'phone_no')
+    search_fields = ('tenant_name', 'phone_no', 'email')
 
-admin.site.register(Payment)
+@admin.register(Payment)
+class PaymentAdmin(ImportExportModelAdmin):
+    resource_class = PaymentResource
+    list_display = ('tenant', 'property', 'room', 'amount', 'method', 'status', 'payment_date')
+    list_filter = ('status', 'method')
+    list_select_related = ('tenant', 'property', 'room__property')
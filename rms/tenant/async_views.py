@@ -0,0 +1,58 @@
+"""
+Async variants of the tenant reporting views, served under /api/async/.
+They return the same data as the views in tenant.views; independent
+queries are awaited together.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from rest_framework.request import Request
+
+from rms.asyncviews import async_report_view, json_response
+from rms.dbrouter import reads_from_replica
+from rms.pagination import KeysetPagination
+from rms.reportcache import async_cached_owner_report
+from .views import (
+    PAYMENT_STATUS_FILTERS, payment_status_aggregates, payment_status_data, payment_status_listing,
+    payment_status_tenants, room_status_data, room_status_listing, room_status_rooms,
+)
+
+
+@async_report_view
+@async_cached_owner_report
+@reads_from_replica
+async def tenant_payment_status(request):
+    """Async variant of tenant.views.tenant_payment_status"""
+    status_filter = request.GET.get('status')
+    if status_filter not in PAYMENT_STATUS_FILTERS:
+        return json_response({"error": "status must be 'paid' or 'pending'"}, status=400)
+    
+    now = timezone.now()
+    tenants = payment_status_tenants(request.user, now)
+    
+    async def listing():
+        return [tenant async for tenant in payment_status_listing(tenants, status_filter)]
+    
+    summary, listed = await asyncio.gather(
+        tenants.aaggregate(**payment_status_aggregates()),
+        listing(),
+    )
+    return payment_status_data(now, summary, listed)
+
+
+@async_report_view
+@async_cached_owner_report
+@reads_from_replica
+async def room_status(request):
+    """Async variant of tenant.views.room_status"""
+    rooms = room_status_rooms(request.user, request.GET)
+    if rooms is None:
+        return json_response({"error": "property must be a property id"}, status=400)
+    
+    paginator = KeysetPagination()
+    summary, page = await asyncio.gather(
+        sync_to_async(rooms.occupancy_summary)(),
+        sync_to_async(paginator.paginate_queryset)(room_status_listing(rooms, request.GET), Request(request)),
+    )
+    return room_status_data(summary, paginator, page)
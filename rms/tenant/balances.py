@@ -0,0 +1,159 @@
+"""
+Maintenance of the running payment totals stored on Tenant and Property
+(paid_total, pending_total, payment_count, last_payment_date).
+
+Payment writes adjust the totals of the tenant and property they belong to
+with F() expressions, so concurrent writers never lose an update and reads
+do not scan the payment history. Ordinary saves of a Tenant or Property
+leave these columns out (see tenant.models.without_balance_fields), so a
+stale instance cannot overwrite them. Writes that bypass signals (bulk_create,
+QuerySet.update, raw SQL) are reconciled with repair_balances().
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, DateTimeField, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from rms.transactions import write_atomic
+
+from .models import BALANCE_FIELDS, Tenant, Payment
+
+STATUS_FIELDS = {
+    'paid': 'paid_total',
+    'pending': 'pending_total',
+}
+
+ZERO = Decimal('0.00')
+
+
+def _targets():
+    """(model, Payment foreign key) pairs that carry running totals"""
+    from property.models import Property
+    return [(Tenant, 'tenant'), (Property, 'property')]
+
+
+def _latest_payment_date(fk):
+    return Subquery(
+        Payment.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk).annotate(
+            latest=Max('payment_date')
+        ).values('latest'),
+        output_field=DateTimeField()
+    )
+
+
+def adjust_balances(tenant_id, property_id, amounts, count, latest=None):
+    """
+    Add `amounts` ({status: Decimal}) and `count` payments to a tenant's
+    and a property's totals. `latest` is the newest added payment date;
+    when payments are removed (negative count) the last payment date is
+    recomputed from what remains.
+    """
+    for model, fk in _targets():
+        pk = tenant_id if fk == 'tenant' else property_id
+        updates = {'payment_count': F('payment_count') + count}
+        for payment_status, amount in amounts.items():
+            field = STATUS_FIELDS.get(payment_status)
+            if field and amount:
+                updates[field] = F(field) + amount
+        if count < 0:
+            updates['last_payment_date'] = _latest_payment_date(fk)
+        elif latest is not None:
+            latest_value = Value(latest, output_field=DateTimeField())
+            updates['last_payment_date'] = Greatest(
+                Coalesce(F('last_payment_date'), latest_value), latest_value
+            )
+        model.objects.filter(pk=pk).update(**updates)
+
+
+def add_payment(payment, sign=1):
+    """Apply one payment (sign=1) or take it back out (sign=-1)"""
+    adjust_balances(
+        payment.tenant_id,
+        payment.property_id,
+        {payment.status: sign * Decimal(str(payment.amount))},
+        sign,
+        payment.payment_date
+    )
+
+
+def remove_payment(payment):
+    add_payment(payment, sign=-1)
+
+
+def add_payments(payments):
+    """Apply payments written without signals (bulk_create) grouped per tenant and property"""
+    groups = defaultdict(lambda: {'amounts': defaultdict(Decimal), 'count': 0, 'latest': None})
+    for payment in payments:
+        group = groups[(payment.tenant_id, payment.property_id)]
+        group['amounts'][payment.status] += Decimal(str(payment.amount))
+        group['count'] += 1
+        if group['latest'] is None or payment.payment_date > group['latest']:
+            group['latest'] = payment.payment_date
+    for (tenant_id, property_id), group in groups.items():
+        adjust_balances(tenant_id, property_id, group['amounts'], group['count'], group['latest'])
+
+
+def computed_balances(model):
+    """Queryset of `model` annotated with its totals recomputed from payments"""
+    return model.objects.order_by('pk').annotate(
+        actual_paid_total=Coalesce(Sum('payments__amount', filter=Q(payments__status='paid')), Value(ZERO)),
+        actual_pending_total=Coalesce(Sum('payments__amount', filter=Q(payments__status='pending')), Value(ZERO)),
+        actual_payment_count=Count('payments'),
+        actual_last_payment_date=Max('payments__payment_date'),
+    )
+
+
+def verify_balances():
+    """
+    Compare stored totals with the payment table. Returns a list of
+    (model name, pk, field, stored, actual) mismatches.
+    """
+    mismatches = []
+    for model, _ in _targets():
+        rows = computed_balances(model).values(
+            'pk', *BALANCE_FIELDS, *[f'actual_{field}' for field in BALANCE_FIELDS]
+        )
+        for row in rows.iterator(chunk_size=2000):
+            for field in BALANCE_FIELDS:
+                stored, actual = row[field], row[f'actual_{field}']
+                if isinstance(actual, Decimal):
+                    stored, actual = stored.quantize(ZERO), actual.quantize(ZERO)
+                if stored != actual:
+                    mismatches.append((model._meta.model_name, row['pk'], field, stored, actual))
+    return mismatches
+
+
+def repair_balances(pks=None):
+    """
+    Overwrite stored totals with values recomputed from payments, for every
+    tenant and property or only those whose (model name, pk) is in `pks`.
+    Returns the number of rows rewritten.
+    """
+    repaired = 0
+    with write_atomic():
+        for model, fk in _targets():
+            queryset = model.objects.all()
+            if pks is not None:
+                selected = [pk for name, pk in pks if name == model._meta.model_name]
+                if not selected:
+                    continue
+                queryset = queryset.filter(pk__in=selected)
+            payments = Payment.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk)
+
+            def total(**filters):
+                return Coalesce(
+                    Subquery(payments.filter(**filters).annotate(total=Sum('amount')).values('total')),
+                    Value(ZERO),
+                    output_field=model._meta.get_field('paid_total')
+                )
+
+            repaired += queryset.update(
+                paid_total=total(status='paid'),
+                pending_total=total(status='pending'),
+                payment_count=Coalesce(
+                    Subquery(payments.annotate(count=Count('id')).values('count')), Value(0)
+                ),
+                last_payment_date=_latest_payment_date(fk),
+            )
+    return repaired
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+from rms.benchmarks import isolated_database, seed_portfolio, timed, format_stats, QueryCounter
+from tenant.resolvers import LookupPaymentResolver, CachedPaymentResolver, resolution_cache
+from tenant.views import create_payment
+
+
+def log_payment_view(resolver_class):
+    """log_payment resolving names with `resolver_class`"""
+    @api_view(['POST'])
+    @permission_classes([IsAuthenticated])
+    def view(request):
+        return create_payment(request, resolver_class())
+    return view
+
+
+class Command(BaseCommand):
+    help = "Compare log_payment latency with per-name lookups and the cached resolver"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=200)
+        parser.add_argument('--rooms', type=int, default=20, help="Rooms per property")
+        parser.add_argument('--payments', type=int, default=100000, help="Payment history to seed")
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            owner = User.objects.create_user('benchmark', password='benchmark')
+            self.stdout.write("Seeding...")
+            tenants = seed_portfolio(
+                owner, properties=options['properties'], rooms_per_property=options['rooms'],
+                payments=options['payments']
+            )
+            # A small working set, as on a front desk logging the same tenants.
+            bodies = [
+                {
+                    'property_name': tenant.room.property.name,
+                    'room_no': tenant.room.room_no,
+                    'tenant_name': tenant.tenant_name,
+                    'amount': str(tenant.room.rent_amount),
+                    'method': 'cash',
+                }
+                for tenant in tenants[:50]
+            ]
+            factory = APIRequestFactory()
+
+            for label, resolver_class in [("lookup resolver", LookupPaymentResolver),
+                                          ("cached resolver", CachedPaymentResolver)]:
+                view = log_payment_view(resolver_class)
+                resolution_cache.clear()
+                counter = iter(range(10 ** 9))
+
+                def post():
+                    body = bodies[next(counter) % len(bodies)]
+                    request = factory.post('/api/log-payment/', body, format='json')
+                    force_authenticate(request, owner)
+                    response = view(request)
+                    assert response.status_code == 201, response.data
+
+                timed(post, len(bodies))  # warm up
+                with QueryCounter() as queries:
+                    post()
+                stats = timed(post, options['requests'])
+                self.stdout.write(format_stats(f"log_payment, {label}", stats))
+                self.stdout.write(f"  {queries.count} queries per request")
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import User
+from rms.benchmarks import isolated_database, seed_portfolio
+from tenant.models import Tenant, Payment
+from tenant.serializers import PaymentSerializer, PaymentRowSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows per second of PaymentSerializer and the PaymentRowSerializer "
+        "fast path for the list_payments and tenant_payment_history queries"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=50)
+        parser.add_argument('--rooms', type=int, default=20, help="Rooms per property")
+        parser.add_argument('--payments', type=int, default=100000, help="Payment history to seed")
+        parser.add_argument('--rows', type=int, default=5000, help="Rows serialized per list_payments run")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            owner = User.objects.create_user('benchmark', password='benchmark')
+            self.stdout.write("Seeding...")
+            seed_portfolio(
+                owner, properties=options['properties'], rooms_per_property=options['rooms'],
+                payments=options['payments']
+            )
+            busiest = Tenant.objects.annotate(count=Count('payments')).order_by('-count').first()
+
+            cases = [
+                ("list_payments", Payment.objects.order_by('-payment_date', '-id')[:options['rows']]),
+                ("tenant_payment_history", busiest.payments.order_by('-payment_date', '-id')),
+            ]
+            for label, queryset in cases:
+                slow = lambda: PaymentSerializer(
+                    queryset.select_related('tenant', 'room', 'property'), many=True
+                ).data
+                fast = lambda: PaymentRowSerializer(PaymentRowSerializer.rows(queryset)).data
+
+                rendered = JSONRenderer().render(slow())
+                if JSONRenderer().render(fast()) != rendered:
+                    raise CommandError(f"{label}: fast path output differs from PaymentSerializer")
+                rows = len(slow())
+                self.stdout.write(f"{label}: {rows} rows, output identical")
+                for name, func in [("PaymentSerializer", slow), ("PaymentRowSerializer", fast)]:
+                    rate = self.rows_per_second(func, rows, options['repeat'])
+                    self.stdout.write(f"  {name:<22} {rate:12,.0f} rows/s")
+
+    def rows_per_second(self, func, rows, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            JSONRenderer().render(func())
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return rows / best
@@ -0,0 +1,155 @@
+import copy
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from rms.benchmarks import isolated_database, seed_portfolio
+from rms.imports import refresh_derived_data
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+PROFILES = {
+    # Django's defaults; journal_mode is persistent in the file, so reset it.
+    'default': {
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE'},
+    },
+    'production': settings.SQLITE_PRODUCTION_PROFILE,
+}
+
+READ_ENDPOINTS = ['/api/monthly-insights/', '/api/housewise-overview/']
+
+
+class Command(BaseCommand):
+    help = (
+        "Run parallel log_payment writers against report readers on a "
+        "file-backed SQLite database, once per database profile"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=20)
+        parser.add_argument('--rooms', type=int, default=20, help="Rooms per property")
+        parser.add_argument('--payments', type=int, default=20000, help="Payment history to seed")
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10, help="Seconds per profile")
+        parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=list(PROFILES))
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            with isolated_database(name=os.path.join(directory, 'benchmark.sqlite3')):
+                owner = User.objects.create_user('benchmark', password='benchmark')
+                self.stdout.write("Seeding...")
+                tenants = seed_portfolio(
+                    owner, properties=options['properties'], rooms_per_property=options['rooms'],
+                    payments=options['payments']
+                )
+                refresh_derived_data()
+                bodies = [
+                    {
+                        'property_name': tenant.room.property.name,
+                        'room_no': tenant.room.room_no,
+                        'tenant_name': tenant.tenant_name,
+                        'amount': str(tenant.room.rent_amount),
+                        'method': 'cash',
+                    }
+                    for tenant in tenants[:200]
+                ]
+                self.stdout.write(
+                    f"{options['writers']} writers, {options['readers']} readers, "
+                    f"{options['duration']:g}s per profile"
+                )
+                original = copy.deepcopy({
+                    key: connection.settings_dict[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')
+                })
+                try:
+                    with override_settings(CACHES=NO_CACHE):
+                        for name in options['profiles']:
+                            self.use_profile(PROFILES[name])
+                            self.stdout.write(f"{name} (journal_mode={self.journal_mode()})")
+                            for line in self.run_load(owner, bodies, options):
+                                self.stdout.write(f"  {line}")
+                finally:
+                    self.use_profile(original)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def use_profile(self, profile):
+        # Worker processes open their connections from this settings dict.
+        connections.close_all()
+        connection.settings_dict.update(copy.deepcopy(profile))
+
+    def journal_mode(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            return cursor.fetchone()[0]
+
+    def run_load(self, owner, bodies, options):
+        # Separate processes, as under a multi-worker server: threads would
+        # serialize on the GIL long before SQLite's locks matter.
+        deadline = time.time() + options['duration']
+        jobs = (
+            [('write', index, owner, bodies, deadline) for index in range(options['writers'])]
+            + [('read', index, owner, bodies, deadline) for index in range(options['readers'])]
+        )
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(len(jobs)) as pool:
+            results = pool.map(run_worker, jobs)
+
+        lines = []
+        for label, kind in [("log_payment", 'write'), ("reports", 'read')]:
+            latencies = sorted(
+                latency for (job_kind, *_), (job_latencies, _) in zip(jobs, results)
+                if job_kind == kind for latency in job_latencies
+            )
+            errors = sum(job_errors for (job_kind, *_), (_, job_errors) in zip(jobs, results) if job_kind == kind)
+            lines.append(self.format_result(label, latencies, errors, options['duration']))
+        return lines
+
+    def format_result(self, label, latencies, errors, duration):
+        if not latencies:
+            return f"{label:<12} no successful requests, {errors} errors"
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return (
+            f"{label:<12} {len(latencies) / duration:8.1f} req/s  "
+            f"median {statistics.median(latencies) * 1000:8.2f} ms  p95 {p95 * 1000:8.2f} ms  "
+            f"{errors} errors"
+        )
+
+
+def run_worker(job):
+    kind, index, owner, bodies, deadline = job
+    client = APIClient()
+    client.force_authenticate(owner)
+    latencies, errors = [], 0
+    try:
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                if kind == 'write':
+                    body = bodies[(index + len(latencies) + errors) % len(bodies)]
+                    ok = client.post('/api/log-payment/', body, format='json').status_code == 201
+                else:
+                    path = READ_ENDPOINTS[(index + len(latencies)) % len(READ_ENDPOINTS)]
+                    ok = client.get(path).status_code == 200
+            except DatabaseError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+    finally:
+        connection.close()
+    return latencies, errors
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tenant.balances import repair_balances, verify_balances
+
+
+class Command(BaseCommand):
+    help = "Verify the stored tenant and property payment totals against raw payments and repair drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Only report mismatches, do not repair",
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Recompute every tenant and property, not only those that drifted",
+        )
+
+    def handle(self, *args, **options):
+        mismatches = verify_balances()
+        for model_name, pk, field, stored, actual in mismatches:
+            self.stdout.write(f"{model_name}={pk} {field}: stored={stored} actual={actual}")
+
+        if options['check']:
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} mismatches found in payment totals.")
+            self.stdout.write(self.style.SUCCESS("Payment totals match raw data."))
+            return
+
+        if options['all']:
+            count = repair_balances()
+        else:
+            count = repair_balances({(model_name, pk) for model_name, pk, *_ in mismatches}) if mismatches else 0
+        self.stdout.write(f"Repaired {count} rows.")
+
+        remaining = verify_balances()
+        if remaining:
+            raise CommandError(f"{len(remaining)} mismatches remain after repair.")
+        self.stdout.write(self.style.SUCCESS("Payment totals match raw data."))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0002_monthlycollectionsummary'),
+        ('tenant', '0002_payment_receipt_number_payment_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['property', 'payment_date'], name='payment_property_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['tenant', 'payment_date'], name='payment_tenant_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['tenant', 'status'], name='payment_tenant_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tenant',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['rent_due_date'], name='tenant_active_due_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0003_notification'),
+        ('tenant', '0003_payment_tenant_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date', 'id'], name='payment_date_id_idx'),
+        ),
+    ]
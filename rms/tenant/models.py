@@ -1,10 +1,60 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from typing import TYPE_CHECKING
 from django.db.models import QuerySet
+from rms.transactions import write_atomic
 
 # Create your models here.
 
+# Running payment totals on Tenant and Property, written only by tenant.balances
+BALANCE_FIELDS = ['paid_total', 'pending_total', 'payment_count', 'last_payment_date']
+
+
+def without_balance_fields(instance, kwargs):
+    """
+    save() kwargs that leave the running totals of an existing row alone.
+    tenant.balances adjusts them in the database with F() expressions, so
+    the copy an instance loaded earlier may be stale and must not be
+    written back. Explicit update_fields are honoured as given.
+    """
+    if instance._state.adding or kwargs.get('force_insert') or kwargs.get('update_fields') is not None:
+        return kwargs
+    return dict(kwargs, update_fields=[
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in BALANCE_FIELDS
+    ])
+
+
+class TenantQuerySet(models.QuerySet):
+
+    def with_payments_between(self, start, end):
+        """
+        Annotate each tenant with the number (`period_payment_count`) and
+        sum (`amount_paid`) of its payments in [start, end), using
+        conditional aggregation so the whole list is one query.
+        """
+        from property.models import money_field
+        in_period = models.Q(payments__payment_date__gte=start, payments__payment_date__lt=end)
+        return self.annotate(
+            period_payment_count=models.Count('payments', filter=in_period),
+            amount_paid=Coalesce(
+                models.Sum('payments__amount', filter=in_period),
+                models.Value(Decimal('0.00')),
+                output_field=money_field()
+            ),
+        )
+
+    def paid(self):
+        """Tenants with a payment in the annotated period"""
+        return self.filter(period_payment_count__gt=0)
+
+    def pending(self):
+        """Tenants without a payment in the annotated period"""
+        return self.filter(period_payment_count=0)
+
+
 class Tenant(models.Model):
     if TYPE_CHECKING:
         id: int
@@ -21,33 +71,63 @@ class Tenant(models.Model):
     id_proof_type = models.CharField(max_length=50, blank=True, null=True)  # e.g., "Passport", "Citizenship"
     id_proof_number = models.CharField(max_length=100, blank=True, null=True)
 
+    # Running payment totals, maintained by tenant.balances
+    paid_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), editable=False)
+    pending_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), editable=False)
+    payment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_payment_date = models.DateTimeField(blank=True, null=True, editable=False)
+
+    objects = TenantQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **without_balance_fields(self, kwargs))
+
     def is_rent_due(self):
         return self.rent_due_date <= timezone.now().date()
     
     def total_paid(self):
-        return self.payments.filter(status='paid').aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
+        return self.paid_total
     
     def outstanding_balance(self):
-        return self.payments.filter(status='pending').aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
+        return self.pending_total
     
     def payment_history_summary(self):
-        """Returns a summary of payment history"""
-        return {
-            'total_paid': self.total_paid(),
-            'outstanding': self.outstanding_balance(),
-            'total_payments': self.payments.count(),
-            'paid_payments': self.payments.filter(status='paid').count(),
-            'pending_payments': self.payments.filter(status='pending').count(),
-            'overdue_payments': self.payments.filter(status='overdue').count(),
-        }
+        """
+        Returns a summary of payment history, computed in one query. A
+        payment counts as overdue when it is unpaid and the tenant's rent
+        due date has passed (see Payment.is_overdue).
+        """
+        from property.models import CENTS, money_field
+        paid = models.Q(status='paid')
+        zero = models.Value(Decimal('0.00'))
+        summary = self.payments.aggregate(
+            total_paid=Coalesce(models.Sum('amount', filter=paid), zero, output_field=money_field()),
+            outstanding=Coalesce(
+                models.Sum('amount', filter=models.Q(status='pending')), zero, output_field=money_field()
+            ),
+            total_payments=models.Count('id'),
+            paid_payments=models.Count('id', filter=paid),
+            pending_payments=models.Count('id', filter=models.Q(status='pending')),
+            overdue_payments=models.Count(
+                'id', filter=~paid & models.Q(tenant__rent_due_date__lt=timezone.now().date())
+            ),
+        )
+        summary['total_paid'] = summary['total_paid'].quantize(CENTS)
+        summary['outstanding'] = summary['outstanding'].quantize(CENTS)
+        return summary
 
     def __str__(self):
         return self.tenant_name
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['rent_due_date'],
+                condition=models.Q(is_active=True),
+                name='tenant_active_due_idx'
+            ),
+        ]
+
 
 class Payment(models.Model):
     if TYPE_CHECKING:
@@ -76,6 +156,24 @@ class Payment(models.Model):
     def __str__(self):
         return f"{self.tenant.tenant_name} - {self.amount} ({self.payment_date.date()})"
     
+    def save(self, *args, **kwargs):
+        # post_save handlers update the stored totals and monthly rollup;
+        # keep them in the same transaction as the payment row.
+        with write_atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with write_atomic():
+            return super().delete(*args, **kwargs)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['property', 'payment_date'], name='payment_property_date_idx'),
+            models.Index(fields=['tenant', 'payment_date'], name='payment_tenant_date_idx'),
+            models.Index(fields=['tenant', 'status'], name='payment_tenant_status_idx'),
+            models.Index(fields=['payment_date', 'id'], name='payment_date_id_idx'),
+        ]
+
     def is_overdue(self):
         """Check if payment is overdue"""
         if self.status == 'paid':
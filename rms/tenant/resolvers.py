@@ -0,0 +1,237 @@
+"""
+Resolution of the (property name, room number, tenant name) triple used by
+the payment logging endpoints into model instances.
+
+Resolvers raise the same ValidationErrors PaymentCreateSerializer has
+always returned, so callers can swap one for another freely.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Subquery
+from rest_framework import serializers
+
+from .models import Tenant
+
+
+def property_missing(property_name):
+    return serializers.ValidationError({
+        "property_name": f"Property '{property_name}' does not exist."
+    })
+
+
+def room_missing(room_no, property_name):
+    return serializers.ValidationError({
+        "room_no": f"Room '{room_no}' does not exist in property '{property_name}'."
+    })
+
+
+def tenant_missing(tenant_name):
+    return serializers.ValidationError({
+        "tenant_name": f"Tenant '{tenant_name}' does not exist."
+    })
+
+
+def tenant_ambiguous(tenant_name):
+    return serializers.ValidationError({
+        "tenant_name": f"Multiple tenants found with name '{tenant_name}'. Please use a more specific identifier."
+    })
+
+
+def tenant_not_in_room(tenant_name, room_no):
+    return serializers.ValidationError({
+        "tenant_name": f"Tenant '{tenant_name}' is not assigned to room '{room_no}'."
+    })
+
+
+class LookupPaymentResolver:
+    """Resolves one payment with a query per name"""
+
+    def resolve(self, property_name, room_no, tenant_name):
+        from property.models import Property, Room
+
+        try:
+            property_obj = Property.objects.get(name=property_name)
+        except Property.DoesNotExist:
+            raise property_missing(property_name)
+
+        try:
+            room = Room.objects.get(room_no=room_no, property=property_obj)
+        except Room.DoesNotExist:
+            raise room_missing(room_no, property_name)
+
+        try:
+            tenant = Tenant.objects.get(tenant_name=tenant_name)
+        except Tenant.DoesNotExist:
+            raise tenant_missing(tenant_name)
+        except Tenant.MultipleObjectsReturned:
+            raise tenant_ambiguous(tenant_name)
+
+        if tenant.room_id != room.id:
+            raise tenant_not_in_room(tenant_name, room_no)
+
+        return property_obj, room, tenant
+
+
+class BatchPaymentResolver:
+    """
+    Resolves many payments at once: all names in `items` are loaded up
+    front with three queries, after which resolve() is a dict lookup.
+    """
+
+    def __init__(self, items):
+        from property.models import Property, Room
+
+        def names(key):
+            return {str(item[key]).strip() for item in items if item.get(key) is not None}
+
+        property_names = names('property_name')
+        room_nos = names('room_no')
+        tenant_names = names('tenant_name')
+
+        self.properties = defaultdict(list)
+        for property_obj in Property.objects.filter(name__in=property_names):
+            self.properties[property_obj.name].append(property_obj)
+
+        self.rooms = {}
+        for room in Room.objects.filter(property__name__in=property_names, room_no__in=room_nos):
+            self.rooms[(room.property_id, room.room_no)] = room
+
+        self.tenants = defaultdict(list)
+        for tenant in Tenant.objects.filter(tenant_name__in=tenant_names):
+            self.tenants[tenant.tenant_name].append(tenant)
+
+    def resolve(self, property_name, room_no, tenant_name):
+        properties = self.properties.get(property_name)
+        if not properties:
+            raise property_missing(property_name)
+        if len(properties) > 1:
+            raise serializers.ValidationError({
+                "property_name": f"Multiple properties found with name '{property_name}'."
+            })
+        property_obj = properties[0]
+
+        room = self.rooms.get((property_obj.id, room_no))
+        if room is None:
+            raise room_missing(room_no, property_name)
+        room.property = property_obj
+
+        tenants = self.tenants.get(tenant_name)
+        if not tenants:
+            raise tenant_missing(tenant_name)
+        if len(tenants) > 1:
+            raise tenant_ambiguous(tenant_name)
+        tenant = tenants[0]
+
+        if tenant.room_id != room.id:
+            raise tenant_not_in_room(tenant_name, room_no)
+        tenant.room = room
+
+        return property_obj, room, tenant
+
+
+class ResolutionCache:
+    """
+    Thread-safe LRU of (property_name, room_no, tenant_name) ->
+    (property_id, room_id, tenant_id). Entries expire after `ttl` seconds
+    so other processes' writes, which cannot clear this process's cache,
+    are picked up within a bounded time.
+
+    tenant.signals clears it on every save or delete of a Property, Room
+    or Tenant. Writes that bypass signals (QuerySet.update, bulk_create,
+    bulk_update, raw SQL) must call clear() themselves when they change
+    names or room assignments; rms.imports.refresh_derived_data does so
+    after bulk imports. Anything else is only picked up once entries
+    expire.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            ids, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return ids
+
+    def set(self, key, ids):
+        with self.lock:
+            self.entries[key] = (ids, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_cache_settings = getattr(settings, 'PAYMENT_RESOLVER_CACHE', {})
+resolution_cache = ResolutionCache(
+    max_size=_cache_settings.get('MAX_SIZE', 1024),
+    ttl=_cache_settings.get('TTL', 60)
+)
+
+
+class CachedPaymentResolver:
+    """
+    Resolves one payment from `resolution_cache`, or on a miss with a
+    single query joining room, property and tenant. Lookups that do not
+    resolve cleanly fall back to LookupPaymentResolver for its errors.
+    Cache hits return unsaved instances carrying just the ids and names,
+    which is all a Payment insert and PaymentSerializer need.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or resolution_cache
+
+    def resolve(self, property_name, room_no, tenant_name):
+        key = (property_name, room_no, tenant_name)
+        ids = self.cache.get(key)
+        if ids is None:
+            ids = self.lookup(property_name, room_no, tenant_name)
+            if ids is None:
+                return LookupPaymentResolver().resolve(property_name, room_no, tenant_name)
+            self.cache.set(key, ids)
+        return self.instances(key, ids)
+
+    def lookup(self, property_name, room_no, tenant_name):
+        from property.models import Room
+
+        same_name = Tenant.objects.filter(tenant_name=tenant_name).order_by().values(
+            'tenant_name'
+        ).annotate(count=Count('pk')).values('count')
+        rows = list(
+            Room.objects.filter(property__name=property_name, room_no=room_no).annotate(
+                same_name=Subquery(same_name)
+            ).values_list('property_id', 'id', 'tenant__id', 'tenant__tenant_name', 'same_name')[:2]
+        )
+        if len(rows) != 1:
+            return None
+        property_id, room_id, tenant_id, room_tenant_name, same_name_count = rows[0]
+        if room_tenant_name != tenant_name or same_name_count != 1:
+            return None
+        return property_id, room_id, tenant_id
+
+    def instances(self, key, ids):
+        from property.models import Property, Room
+
+        property_name, room_no, tenant_name = key
+        property_id, room_id, tenant_id = ids
+        property_obj = Property(id=property_id, name=property_name)
+        room = Room(id=room_id, room_no=room_no, property=property_obj)
+        tenant = Tenant(id=tenant_id, tenant_name=tenant_name, room=room)
+        for instance in (property_obj, room, tenant):
+            instance._state.adding = False
+        return property_obj, room, tenant
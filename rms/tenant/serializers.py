@@ -1,5 +1,13 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Tenant, Payment
+from .resolvers import CachedPaymentResolver
+
+CENTS = Decimal('0.01')
+
 
 class TenantSerializer(serializers.ModelSerializer):
     room_no = serializers.CharField(write_only=True)
@@ -40,6 +48,65 @@ class PaymentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'payment_date']
 
 
+def format_amount(value):
+    """A payment amount as PaymentSerializer renders it: two decimal places"""
+    return '{:f}'.format(value.quantize(CENTS))
+
+
+def format_datetime(value):
+    """
+    A datetime as PaymentSerializer renders it: ISO 8601 in the default
+    time zone, with UTC written as Z.
+    """
+    if settings.USE_TZ and timezone.is_aware(value):
+        value = value.astimezone(timezone.get_default_timezone())
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class PaymentRowSerializer:
+    """
+    Read-only fast path with the same output as
+    PaymentSerializer(many=True). It works on `values()` rows (dicts, so
+    keyset pagination can read its position from them) and converts
+    amounts and dates in one loop, without per-instance field objects or
+    related model instances.
+    """
+    values = [
+        'id', 'tenant_id', 'tenant__tenant_name', 'room_id', 'room__room_no',
+        'property_id', 'property__name', 'amount', 'method', 'payment_date',
+    ]
+
+    @classmethod
+    def rows(cls, queryset):
+        """`queryset` of Payments reduced to the columns the output needs"""
+        return queryset.values(*cls.values)
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    def data(self):
+        data = []
+        append = data.append
+        for row in self.rows:
+            append({
+                'id': row['id'],
+                'tenant': row['tenant_id'],
+                'tenant_name': row['tenant__tenant_name'],
+                'room': row['room_id'],
+                'room_no': row['room__room_no'],
+                'property': row['property_id'],
+                'property_name': row['property__name'],
+                'amount': format_amount(row['amount']),
+                'method': row['method'],
+                'payment_date': format_datetime(row['payment_date']),
+            })
+        return data
+
+
 class PaymentCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating payments using names instead of IDs"""
     tenant_name = serializers.CharField(write_only=True)
@@ -51,37 +118,10 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
         fields = ['tenant_name', 'room_no', 'property_name', 'amount', 'method']
     
     def validate(self, attrs):
-        from property.models import Property, Room
-        
-        try:
-            property_obj = Property.objects.get(name=attrs['property_name'])
-        except Property.DoesNotExist:
-            raise serializers.ValidationError({
-                "property_name": f"Property '{attrs['property_name']}' does not exist."
-            })
-        
-        try:
-            room = Room.objects.get(room_no=attrs['room_no'], property=property_obj)
-        except Room.DoesNotExist:
-            raise serializers.ValidationError({
-                "room_no": f"Room '{attrs['room_no']}' does not exist in property '{attrs['property_name']}'."
-            })
-        
-        try:
-            tenant = Tenant.objects.get(tenant_name=attrs['tenant_name'])
-        except Tenant.DoesNotExist:
-            raise serializers.ValidationError({
-                "tenant_name": f"Tenant '{attrs['tenant_name']}' does not exist."
-            })
-        except Tenant.MultipleObjectsReturned:
-            raise serializers.ValidationError({
-                "tenant_name": f"Multiple tenants found with name '{attrs['tenant_name']}'. Please use a more specific identifier."
-            })
-        
-        if tenant.room != room:
-            raise serializers.ValidationError({
-                "tenant_name": f"Tenant '{attrs['tenant_name']}' is not assigned to room '{attrs['room_no']}'."
-            })
+        resolver = self.context.get('resolver') or CachedPaymentResolver()
+        property_obj, room, tenant = resolver.resolve(
+            attrs['property_name'], attrs['room_no'], attrs['tenant_name']
+        )
         
         attrs['tenant_obj'] = tenant
         attrs['room_obj'] = room
@@ -89,7 +129,9 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
         
         return attrs
     
-    def create(self, validated_data):
+    def build(self, validated_data):
+        """Unsaved Payment for `validated_data`, used by create() and batch inserts"""
+        validated_data = dict(validated_data)
         tenant_obj = validated_data.pop('tenant_obj')
         room_obj = validated_data.pop('room_obj')
         property_obj = validated_data.pop('property_obj')
@@ -97,10 +139,14 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
         validated_data.pop('room_no')
         validated_data.pop('property_name')
         
-        payment = Payment.objects.create(
+        return Payment(
             tenant=tenant_obj,
             room=room_obj,
             property=property_obj,
             **validated_data
         )
+    
+    def create(self, validated_data):
+        payment = self.build(validated_data)
+        payment.save()
         return payment
\ No newline at end of file
@@ -0,0 +1,50 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from property.signals import _deleted_with_property
+from .balances import add_payment, remove_payment
+from .models import Tenant, Payment
+from .resolvers import resolution_cache
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+@receiver(post_save, sender='property.Property')
+@receiver(post_delete, sender='property.Property')
+@receiver(post_save, sender='property.Room')
+@receiver(post_delete, sender='property.Room')
+def clear_resolution_cache(sender, **kwargs):
+    """Any change to names or room assignments may invalidate cached lookups"""
+    resolution_cache.clear()
+
+
+@receiver(pre_save, sender=Payment)
+def remember_previous_payment(sender, instance, **kwargs):
+    """
+    Keep the stored row of a payment being updated, for the post_save
+    handlers here (totals) and in property.signals (rollup buckets, data
+    versions), so an update reads it once.
+    """
+    instance._previous_payment = None
+    if instance.pk:
+        instance._previous_payment = Payment.objects.filter(pk=instance.pk).only(
+            'tenant_id', 'property_id', 'amount', 'status', 'payment_date'
+        ).first()
+
+
+@receiver(post_save, sender=Payment)
+def apply_payment_balance(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_payment', None)
+    if not created and previous is not None:
+        fields = ['tenant_id', 'property_id', 'amount', 'status', 'payment_date']
+        if all(getattr(previous, field) == getattr(instance, field) for field in fields):
+            return
+        remove_payment(previous)
+    add_payment(instance)
+
+
+@receiver(post_delete, sender=Payment)
+def revert_payment_balance(sender, instance, **kwargs):
+    if _deleted_with_property(kwargs):
+        return
+    remove_payment(instance)
@@ -1,3 +1,767 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import AsyncClient, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from property.models import Property, Room
+from property.rollups import month_bounds, verify_monthly_summaries
+from property.versions import owner_version
+from rms.imports import refresh_derived_data
+from rms.reportcache import metrics, report_cache_key
+from .balances import verify_balances
+from .exports import EXPORT_COLUMNS
+from .models import Tenant, Payment
+from .resolvers import CachedPaymentResolver, LookupPaymentResolver, ResolutionCache, resolution_cache
+from .serializers import PaymentCreateSerializer, PaymentSerializer, PaymentRowSerializer
+
+
+class PaymentIndexPlanTests(TestCase):
+    """The hot reporting filters must be answered from the composite indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        cls.room = Room.objects.create(property=cls.property, room_no='101', rent_amount=500, is_occupied=True)
+        cls.tenant = Tenant.objects.create(
+            room=cls.room, tenant_name='Ram', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date()
+        )
+        Payment.objects.create(
+            tenant=cls.tenant, room=cls.room, property=cls.property, amount=Decimal('500.00'), method='cash'
+        )
+        cls.month_begin, cls.month_end = month_bounds(timezone.now())
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_tenant_month_range_uses_tenant_date_index(self):
+        self.assertUsesIndex(
+            Payment.objects.filter(
+                tenant=self.tenant,
+                payment_date__gte=self.month_begin,
+                payment_date__lt=self.month_end
+            ),
+            'payment_tenant_date_idx'
+        )
+
+    def test_property_month_range_uses_property_date_index(self):
+        self.assertUsesIndex(
+            Payment.objects.filter(
+                property=self.property,
+                payment_date__gte=self.month_begin,
+                payment_date__lt=self.month_end
+            ),
+            'payment_property_date_idx'
+        )
+
+    def test_tenant_status_uses_tenant_status_index(self):
+        self.assertUsesIndex(
+            Payment.objects.filter(tenant=self.tenant, status='paid'),
+            'payment_tenant_status_idx'
+        )
+
+    def test_active_due_tenants_use_partial_index(self):
+        self.assertUsesIndex(
+            Tenant.objects.filter(is_active=True, rent_due_date__lte=timezone.now().date()),
+            'tenant_active_due_idx'
+        )
+
+    def test_tenant_payment_status_filters_on_date_range(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/tenant-payment-status/')
+        self.assertEqual(response.status_code, 200)
+        payment_sql = [q['sql'] for q in queries.captured_queries if '"tenant_payment"' in q['sql']]
+        self.assertTrue(payment_sql)
+        for sql in payment_sql:
+            self.assertNotIn('django_datetime_extract', sql)
+
+
+class TenantPaymentStatusTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        cls.tenants = []
+        for number in range(4):
+            room = Room.objects.create(
+                property=cls.property, room_no=str(101 + number), rent_amount=500, is_occupied=True
+            )
+            cls.tenants.append(Tenant.objects.create(
+                room=room, tenant_name=f'Tenant {number}', phone_no='98000',
+                email=f'tenant{number}@example.com', rent_due_date=timezone.now().date()
+            ))
+        for tenant, amount in [(cls.tenants[0], '200.00'), (cls.tenants[0], '300.00'), (cls.tenants[1], '500.00')]:
+            Payment.objects.create(
+                tenant=tenant, room=tenant.room, property=cls.property, amount=Decimal(amount), method='cash'
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_paid_and_pending_lists(self):
+        response = self.client.get('/api/tenant-payment-status/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary'], {'total_tenants': 4, 'paid_count': 2, 'pending_count': 2})
+        paid = {row['tenant_id']: row['amount_paid'] for row in response.data['paid_tenants']}
+        self.assertEqual(paid, {self.tenants[0].id: 500.0, self.tenants[1].id: 500.0})
+        self.assertEqual(
+            {row['tenant_id'] for row in response.data['pending_tenants']},
+            {self.tenants[2].id, self.tenants[3].id}
+        )
+
+    def test_status_filter(self):
+        response = self.client.get('/api/tenant-payment-status/', {'status': 'pending'})
+        self.assertEqual(response.data['paid_tenants'], [])
+        self.assertEqual(len(response.data['pending_tenants']), 2)
+        self.assertEqual(response.data['summary']['total_tenants'], 4)
+        response = self.client.get('/api/tenant-payment-status/', {'status': 'late'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_does_not_grow_with_tenants(self):
+        # The first request creates the owner's data version row.
+        self.client.get('/api/tenant-payment-status/')
+        cache.clear()
+        with self.assertNumQueries(3):
+            self.client.get('/api/tenant-payment-status/')
+
+
+class TenantPaymentHistoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        room = Room.objects.create(property=cls.property, room_no='101', rent_amount=500, is_occupied=True)
+        cls.tenant = Tenant.objects.create(
+            room=room, tenant_name='Ram', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date() - timedelta(days=3)
+        )
+        for amount, payment_status in [('500.00', 'paid'), ('250.00', 'pending'), ('100.00', 'pending')]:
+            Payment.objects.create(
+                tenant=cls.tenant, room=room, property=cls.property, amount=Decimal(amount),
+                method='cash', status=payment_status
+            )
+
+    def test_summary_is_one_query(self):
+        with self.assertNumQueries(1):
+            summary = self.tenant.payment_history_summary()
+        self.assertEqual(summary, {
+            'total_paid': Decimal('500.00'),
+            'outstanding': Decimal('350.00'),
+            'total_payments': 3,
+            'paid_payments': 1,
+            'pending_payments': 2,
+            'overdue_payments': 2,
+        })
+
+    def test_history_is_paginated(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        with self.assertNumQueries(3):
+            response = client.get(f'/api/{self.tenant.pk}/payment-history/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['payment_history']), 2)
+        self.assertEqual(response.data['financial_summary']['payment_history_summary']['total_payments'], 3)
+        response = client.get(response.data['next'])
+        self.assertEqual(len(response.data['payment_history']), 1)
+        self.assertIsNone(response.data['next'])
+
+
+class PaymentBalanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        cls.room = Room.objects.create(property=cls.property, room_no='101', rent_amount=500, is_occupied=True)
+        cls.tenant = Tenant.objects.create(
+            room=cls.room, tenant_name='Ram', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date()
+        )
+
+    def pay(self, amount, payment_status='paid'):
+        return Payment.objects.create(
+            tenant=self.tenant, room=self.room, property=self.property, amount=Decimal(amount),
+            method='cash', status=payment_status
+        )
+
+    def assertBalances(self, paid, pending, count):
+        for obj in (Tenant.objects.get(pk=self.tenant.pk), Property.objects.get(pk=self.property.pk)):
+            self.assertEqual(
+                (obj.paid_total, obj.pending_total, obj.payment_count),
+                (Decimal(paid), Decimal(pending), count)
+            )
+
+    def test_totals_follow_payment_writes(self):
+        first = self.pay('500.00')
+        second = self.pay('120.50', 'pending')
+        self.assertBalances('500.00', '120.50', 2)
+        self.assertEqual(Tenant.objects.get(pk=self.tenant.pk).last_payment_date, second.payment_date)
+
+        second.status = 'paid'
+        second.save()
+        self.assertBalances('620.50', '0.00', 2)
+
+        second.delete()
+        self.assertBalances('500.00', '0.00', 1)
+        self.assertEqual(Tenant.objects.get(pk=self.tenant.pk).last_payment_date, first.payment_date)
+        self.assertEqual(verify_balances(), [])
+
+    def test_update_reads_the_previous_row_once(self):
+        payment = self.pay('120.50', 'pending')
+        payment.status = 'paid'
+        with CaptureQueriesContext(connection) as queries:
+            payment.save()
+        previous_reads = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "tenant_payment" WHERE "tenant_payment"."id" =' in query['sql']
+        ]
+        self.assertEqual(len(previous_reads), 1)
+        self.assertBalances('120.50', '0.00', 1)
+        self.assertEqual(verify_balances(), [])
+
+    def test_saving_a_stale_instance_keeps_totals(self):
+        tenant = Tenant.objects.get(pk=self.tenant.pk)
+        prop = Property.objects.get(pk=self.property.pk)
+        self.pay('100.00')
+
+        tenant.phone_no = '98111'
+        tenant.save()
+        prop.address = 'New Rd'
+        prop.save()
+        self.assertBalances('100.00', '0.00', 1)
+        self.assertEqual(Tenant.objects.get(pk=self.tenant.pk).phone_no, '98111')
+        self.assertEqual(Property.objects.get(pk=self.property.pk).address, 'New Rd')
+        self.assertEqual(verify_balances(), [])
+
+    def test_batch_endpoint_updates_totals(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        item = {'tenant_name': 'Ram', 'room_no': '101', 'property_name': 'Sunrise', 'amount': '100.00', 'method': 'cash'}
+        response = client.post('/api/log-payments/', [item, item], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertBalances('0.00', '200.00', 2)
+        self.assertEqual(verify_balances(), [])
+
+    def test_repair_fixes_drift(self):
+        self.pay('500.00')
+        Payment.objects.update(amount=Decimal('450.00'))
+        self.assertTrue(verify_balances())
+        call_command('repair_balances', stdout=StringIO())
+        self.assertBalances('450.00', '0.00', 1)
+
+
+class PaymentLoggingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        cls.room = Room.objects.create(property=cls.property, room_no='101', rent_amount=500, is_occupied=True)
+        cls.tenant = Tenant.objects.create(
+            room=cls.room, tenant_name='Ram', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date()
+        )
+        cls.body = {'property_name': 'Sunrise', 'room_no': '101', 'tenant_name': 'Ram', 'amount': '500.00', 'method': 'cash'}
+
+    def setUp(self):
+        resolution_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_cached_path_query_budget(self):
+        owner_version(self.owner)
+        self.client.post('/api/log-payment/', self.body, format='json')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/api/log-payment/', self.body, format='json')
+        self.assertEqual(response.status_code, 201)
+        statements = [
+            query['sql'].split()[0] for query in captured.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+        # The payment, its monthly bucket, the owner's data version and the
+        # tenant's and property's running totals.
+        self.assertEqual(statements, ['INSERT', 'UPDATE', 'UPDATE', 'UPDATE', 'UPDATE'])
+        self.assertEqual(verify_monthly_summaries(), [])
+        self.assertEqual(verify_balances(), [])
+
+
+    def log(self, resolver, **changes):
+        serializer = PaymentCreateSerializer(data=dict(self.body, **changes), context={'resolver': resolver})
+        serializer.is_valid(raise_exception=True)
+        data = PaymentSerializer(serializer.save()).data
+        del data['id'], data['payment_date']
+        return data
+
+    def test_cache_hits_serialize_like_lookups(self):
+        expected = self.log(LookupPaymentResolver())
+        self.assertEqual(self.log(CachedPaymentResolver()), expected)
+        with self.assertNumQueries(0):
+            property_obj, room, tenant = CachedPaymentResolver().resolve('Sunrise', '101', 'Ram')
+        self.assertEqual((property_obj.pk, room.pk, tenant.pk), (self.property.pk, self.room.pk, self.tenant.pk))
+        self.assertEqual(self.log(CachedPaymentResolver()), expected)
+        self.assertEqual(verify_balances(), [])
+
+    def test_errors_match_lookup_resolver(self):
+        other_room = Room.objects.create(property=self.property, room_no='102', rent_amount=500)
+        Tenant.objects.create(
+            room=other_room, tenant_name='Sita', phone_no='98001', email='sita@example.com',
+            rent_due_date=timezone.now().date()
+        )
+        for names in [('Nowhere', '101', 'Ram'), ('Sunrise', '999', 'Ram'), ('Sunrise', '101', 'Nobody'),
+                      ('Sunrise', '101', 'Sita')]:
+            errors = []
+            for resolver in (LookupPaymentResolver(), CachedPaymentResolver()):
+                with self.assertRaises(ValidationError) as raised:
+                    resolver.resolve(*names)
+                errors.append(raised.exception.detail)
+            self.assertEqual(errors[0], errors[1])
+            self.assertIsNone(resolution_cache.get(names))
+
+    def test_tenant_writes_drop_cached_names(self):
+        CachedPaymentResolver().resolve('Sunrise', '101', 'Ram')
+        room = Room.objects.create(property=self.property, room_no='102', rent_amount=500)
+        Tenant.objects.create(
+            room=room, tenant_name='Ram', phone_no='98001', email='ram2@example.com',
+            rent_due_date=timezone.now().date()
+        )
+        with self.assertRaises(ValidationError) as raised:
+            CachedPaymentResolver().resolve('Sunrise', '101', 'Ram')
+        self.assertIn('Multiple tenants', str(raised.exception.detail['tenant_name']))
+
+
+class ResolutionCacheTests(TestCase):
+
+    def test_entries_expire_after_ttl(self):
+        cache = ResolutionCache(ttl=60)
+        with mock.patch('tenant.resolvers.time.monotonic', return_value=1000.0):
+            cache.set('key', (1, 2, 3))
+        with mock.patch('tenant.resolvers.time.monotonic', return_value=1059.0):
+            self.assertEqual(cache.get('key'), (1, 2, 3))
+        with mock.patch('tenant.resolvers.time.monotonic', return_value=1061.0):
+            self.assertIsNone(cache.get('key'))
+        self.assertEqual(len(cache.entries), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResolutionCache(max_size=2)
+        cache.set('a', (1, 1, 1))
+        cache.set('b', (2, 2, 2))
+        cache.get('a')
+        cache.set('c', (3, 3, 3))
+        self.assertEqual(list(cache.entries), ['a', 'c'])
+        self.assertIsNone(cache.get('b'))
+        cache.set('a', (4, 4, 4))
+        cache.set('d', (5, 5, 5))
+        self.assertEqual(list(cache.entries), ['a', 'd'])
+        self.assertEqual(cache.get('a'), (4, 4, 4))
+
+    def test_signalled_writes_clear_the_cache(self):
+        owner = User.objects.create_user('owner', password='secret')
+        prop = Property.objects.create(owner=owner, name='Sunrise', address='Main St', price=1000, description='-')
+        room = Room.objects.create(property=prop, room_no='101', rent_amount=500)
+        tenant = Tenant.objects.create(
+            room=room, tenant_name='Ram', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date()
+        )
+        for write in (prop.save, room.save, tenant.save, tenant.delete):
+            resolution_cache.set('key', (1, 2, 3))
+            write()
+            self.assertIsNone(resolution_cache.get('key'))
+
+    def test_bulk_writes_are_cleared_by_refresh_derived_data(self):
+        owner = User.objects.create_user('owner', password='secret')
+        prop = Property.objects.create(owner=owner, name='Sunrise', address='Main St', price=1000, description='-')
+        room = Room.objects.create(property=prop, room_no='101', rent_amount=500)
+        Tenant.objects.create(
+            room=room, tenant_name='Ram', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date()
+        )
+        resolution_cache.clear()
+        CachedPaymentResolver().resolve('Sunrise', '101', 'Ram')
+        # QuerySet.update sends no signals, so the stale entry survives...
+        Tenant.objects.filter(room=room).update(tenant_name='Hari')
+        self.assertIsNotNone(resolution_cache.get(('Sunrise', '101', 'Ram')))
+        # ...until the bulk path refreshes derived data.
+        refresh_derived_data()
+        with self.assertRaises(ValidationError):
+            CachedPaymentResolver().resolve('Sunrise', '101', 'Ram')
+
+
+class RoomStatusTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        cls.owner = User.objects.create_user('owner', password='secret')
+        other = User.objects.create_user('other', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        cls.second = Property.objects.create(
+            owner=cls.owner, name='Sunset', address='Side St', price=1000, description='-'
+        )
+        foreign = Property.objects.create(owner=other, name='Elsewhere', address='-', price=1000, description='-')
+        Room.objects.create(property=foreign, room_no='1', rent_amount=100)
+        Room.objects.create(property=cls.property, room_no='101', rent_amount=500)
+        Room.objects.create(property=cls.second, room_no='201', rent_amount=500)
+        for number, due in [('102', today - timedelta(days=1)), ('103', today + timedelta(days=5))]:
+            room = Room.objects.create(property=cls.property, room_no=number, rent_amount=500, is_occupied=True)
+            Tenant.objects.create(
+                room=room, tenant_name=f'Tenant {number}', phone_no='98000',
+                email=f'{number}@example.com', rent_due_date=due
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_scoped_to_owner(self):
+        self.client.get('/api/room-status/')
+        cache.clear()
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/room-status/')
+        self.assertEqual(response.data['summary'], {'total_rooms': 4, 'occupied': 2, 'overdue': 1, 'vacant': 2})
+        self.assertEqual(len(response.data['vacant_rooms']), 2)
+        self.assertEqual(
+            {(row['room_no'], row['is_rent_overdue']) for row in response.data['occupied_rooms']},
+            {('102', True), ('103', False)}
+        )
+
+    def test_filters(self):
+        response = self.client.get('/api/room-status/', {'property': self.property.pk, 'vacant': 'true'})
+        self.assertEqual([row['room_no'] for row in response.data['vacant_rooms']], ['101'])
+        self.assertEqual(response.data['occupied_rooms'], [])
+        self.assertEqual(response.data['summary']['total_rooms'], 3)
+
+        response = self.client.get('/api/room-status/', {'overdue': '1'})
+        self.assertEqual([row['room_no'] for row in response.data['occupied_rooms']], ['102'])
+        self.assertEqual(response.data['vacant_rooms'], [])
+
+        response = self.client.get('/api/room-status/', {'property': 'Sunrise'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        cls.room = Room.objects.create(property=cls.property, room_no='101', rent_amount=500, is_occupied=True)
+        cls.tenant = Tenant.objects.create(
+            room=cls.room, tenant_name='Ram', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date()
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_unchanged_poll_is_not_modified(self):
+        for url in ['/api/tenant-payment-status/', '/api/room-status/',
+                    '/api/monthly-insights/', '/api/housewise-overview/']:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        url = '/api/tenant-payment-status/'
+        etag = self.client.get(url)['ETag']
+        Payment.objects.create(
+            tenant=self.tenant, room=self.room, property=self.property, amount=Decimal('500.00'), method='cash'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.tenant.phone_no = '98111'
+        self.tenant.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_other_owners_writes_do_not_change_the_etag(self):
+        url = '/api/room-status/'
+        etag = self.client.get(url)['ETag']
+        other = User.objects.create_user('other', password='secret')
+        Property.objects.create(owner=other, name='Elsewhere', address='-', price=1000, description='-')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class ReportCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        cls.room = Room.objects.create(property=cls.property, room_no='101', rent_amount=500, is_occupied=True)
+        cls.tenant = Tenant.objects.create(
+            room=cls.room, tenant_name='Ram', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date()
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_repeated_loads_are_served_from_cache(self):
+        url = '/api/tenant-payment-status/'
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.client.get(url, {'status': 'paid'})['X-Cache'], 'MISS')
+
+    def test_writes_invalidate_cached_reports(self):
+        url = '/api/tenant-payment-status/'
+        self.assertEqual(self.client.get(url).data['summary']['paid_count'], 0)
+        Payment.objects.create(
+            tenant=self.tenant, room=self.room, property=self.property, amount=Decimal('500.00'), method='cash'
+        )
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['summary']['paid_count'], 1)
+
+    def test_waits_for_the_worker_holding_the_lock(self):
+        url = '/api/room-status/'
+        request = Request(APIRequestFactory().get(url))
+        request._user = self.owner
+        key = report_cache_key('room_status', request, owner_version(self.owner))
+        # Another worker holds the lock and publishes its result while we wait.
+        cache.add(f"{key}:lock", 1)
+        metrics.reset()
+        with mock.patch('rms.reportcache.wait_for', side_effect=lambda c, k: {'cached': k == key}):
+            response = self.client.get(url)
+        self.assertEqual(response.data, {'cached': True})
+        self.assertEqual(metrics.snapshot()['waits'], 1)
+
+
+class PaymentRowSerializerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise "Heights"', address='Main St', price=1000, description='-'
+        )
+        cls.room = Room.objects.create(property=cls.property, room_no='101', rent_amount=500, is_occupied=True)
+        cls.tenant = Tenant.objects.create(
+            room=cls.room, tenant_name='Rām Thapa', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date()
+        )
+        for amount in ['500.00', '0.05', '12345678.90', '7']:
+            Payment.objects.create(
+                tenant=cls.tenant, room=cls.room, property=cls.property, amount=Decimal(amount), method='online'
+            )
+        # A whole-second timestamp, which isoformat() renders without microseconds.
+        Payment.objects.filter(amount=Decimal('7')).update(
+            payment_date=timezone.now().replace(microsecond=0) - timedelta(days=40)
+        )
+
+    def test_output_is_byte_identical(self):
+        payments = Payment.objects.order_by('-payment_date', '-id')
+        expected = JSONRenderer().render(PaymentSerializer(payments, many=True).data)
+        actual = JSONRenderer().render(PaymentRowSerializer(PaymentRowSerializer.rows(payments)).data)
+        self.assertEqual(actual, expected)
+
+    def list_payloads(self, client, params, setting):
+        with self.settings(FAST_PAYMENT_LISTS=setting):
+            pages = []
+            response = client.get('/api/payments/', dict(params, page_size=3))
+            while True:
+                pages.extend(response.data['results'])
+                if not response.data['next']:
+                    break
+                response = client.get(response.data['next'])
+            response = client.get(f'/api/{self.tenant.pk}/payment-history/', params)
+            history = response.data['payment_history']
+        return JSONRenderer().render(pages), JSONRenderer().render(history)
+
+    def test_list_endpoints_match_serializer(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        payments = Payment.objects.order_by('-payment_date', '-id')
+        expected = JSONRenderer().render(PaymentSerializer(payments, many=True).data)
+
+        for params, setting in [({}, False), ({'fast': '1'}, False), ({}, True), ({'fast': '0'}, True)]:
+            with self.subTest(params=params, setting=setting):
+                self.assertEqual(self.list_payloads(client, params, setting), (expected, expected))
+
+    def test_fast_path_is_opt_in(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        with mock.patch.object(PaymentRowSerializer, 'rows', wraps=PaymentRowSerializer.rows) as rows:
+            self.list_payloads(client, {}, False)
+            self.list_payloads(client, {'fast': '0'}, True)
+            self.assertEqual(rows.call_count, 0)
+            self.list_payloads(client, {'fast': 'true'}, False)
+            self.assertGreater(rows.call_count, 0)
+
+
+class PaymentExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        other_owner = User.objects.create_user('other', password='secret')
+        cls.payments = []
+        for owner, name in [(cls.owner, 'Sunrise, "East"'), (cls.owner, 'Moonrise'), (other_owner, 'Sunset')]:
+            prop = Property.objects.create(owner=owner, name=name, address='Main St', price=1000, description='-')
+            room = Room.objects.create(property=prop, room_no='101', rent_amount=500, is_occupied=True)
+            tenant = Tenant.objects.create(
+                room=room, tenant_name=f'Tenant of {name}', phone_no='98000',
+                email=f'{prop.pk}@example.com', rent_due_date=timezone.now().date()
+            )
+            for amount, method in [('500', 'cash'), ('12.5', 'online')]:
+                cls.payments.append(Payment.objects.create(
+                    tenant=tenant, room=room, property=prop, amount=Decimal(amount), method=method
+                ))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def export(self, **params):
+        response = self.client.get('/api/payments/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def expected(self, payments):
+        payments = sorted(payments, key=lambda payment: (payment.payment_date, payment.pk), reverse=True)
+        return json.loads(JSONRenderer().render(PaymentSerializer(payments, many=True).data))
+
+    def test_csv_matches_serializer_and_is_scoped_to_owner(self):
+        rows = list(csv.DictReader(io.StringIO(self.export())))
+        self.assertEqual(list(rows[0]), list(EXPORT_COLUMNS))
+        self.assertEqual(rows, [
+            {column: str(value) for column, value in row.items()} for row in self.expected(self.payments[:4])
+        ])
+
+    def test_ndjson_with_filters(self):
+        lines = self.export(export_format='ndjson', property_name='sunrise', method='online').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.expected([self.payments[1]]))
+        self.assertEqual(self.export(export_format='ndjson', property_name='sunset'), '')
+        self.assertEqual(
+            self.client.get('/api/payments/export/', {'export_format': 'xml'}).status_code, 400
+        )
+
+    @mock.patch('tenant.views.EXPORT_CHUNK_SIZE', 2)
+    def test_rows_are_read_while_streaming(self):
+        with mock.patch.object(QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator) as iterator, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/payments/export/')
+            during_view = len(queries.captured_queries)
+            content = iter(response.streaming_content)
+            self.assertEqual(next(content).decode().split(',')[0], 'id')
+            self.assertEqual(len(queries.captured_queries), during_view)
+            self.assertEqual(len(list(content)), 4)
+        self.assertEqual(iterator.call_args.kwargs, {'chunk_size': 2})
+        self.assertEqual(len(queries.captured_queries), during_view + 1)
+
+
+class AsyncReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='secret')
+        cls.property = Property.objects.create(
+            owner=cls.owner, name='Sunrise', address='Main St', price=1000, description='-'
+        )
+        Room.objects.create(property=cls.property, room_no='100', rent_amount=400)
+        cls.room = Room.objects.create(property=cls.property, room_no='101', rent_amount=500, is_occupied=True)
+        cls.tenant = Tenant.objects.create(
+            room=cls.room, tenant_name='Ram', phone_no='98000', email='ram@example.com',
+            rent_due_date=timezone.now().date()
+        )
+        Payment.objects.create(
+            tenant=cls.tenant, room=cls.room, property=cls.property, amount=Decimal('250.00'), method='cash'
+        )
+        cls.token = str(AccessToken.for_user(cls.owner))
+
+    def setUp(self):
+        cache.clear()
+        self.auth = {'Authorization': f'Bearer {self.token}'}
+
+    def strip_timestamps(self, data):
+        data = json.loads(data)
+        if isinstance(data, dict):
+            data.pop('last_updated', None)
+        return data
+
+    async def test_async_views_match_sync_views(self):
+        client = AsyncClient()
+        sync_client = APIClient()
+        sync_client.force_authenticate(self.owner)
+        for path in ['housewise-overview/', 'monthly-insights/', 'tenant-payment-status/',
+                     'tenant-payment-status/?status=paid', 'room-status/?vacant=true']:
+            expected = await sync_to_async(sync_client.get)(f'/api/{path}')
+            await cache.aclear()
+            response = await client.get(f'/api/async/{path}', headers=self.auth)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(self.strip_timestamps(response.content), self.strip_timestamps(expected.content), path)
+
+            response = await client.get(
+                f'/api/async/{path}', headers={**self.auth, 'If-None-Match': response['ETag']}
+            )
+            self.assertEqual(response.status_code, 304, path)
+
+    async def test_requires_authentication(self):
+        response = await AsyncClient().get('/api/async/monthly-insights/')
+        self.assertEqual(response.status_code, 401)
+        response = await AsyncClient().get(
+            '/api/async/monthly-insights/', headers={'Authorization': 'Bearer nonsense'}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_invalid_filters(self):
+        client = AsyncClient()
+        response = await client.get('/api/async/tenant-payment-status/', {'status': 'late'}, headers=self.auth)
+        self.assertEqual(response.status_code, 400)
+        response = await client.get('/api/async/room-status/', {'property': 'Sunrise'}, headers=self.auth)
+        self.assertEqual(response.status_code, 400)
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework import routers
-from .views import TenantViewSet, log_payment, list_payments, tenant_payment_status, tenant_payment_history, room_status
+from . import async_views
+from .views import TenantViewSet, log_payment, log_payments_batch, list_payments, export_payments, tenant_payment_status, tenant_payment_history, room_status
 
 router = routers.DefaultRouter()
 router.register(r'tenants', TenantViewSet, basename='tenant')
@@ -8,8 +9,12 @@ router.register(r'tenants', TenantViewSet, basename='tenant')
 urlpatterns = [
     path('', include(router.urls)),
     path('log-payment/', log_payment, name='log-payment'),
+    path('log-payments/', log_payments_batch, name='log-payments'),
     path('payments/', list_payments, name='list_payments'),
+    path('payments/export/', export_payments, name='export_payments'),
     path('tenant-payment-status/', tenant_payment_status, name='tenant-payment-status'),
     path('<int:pk>/payment-history/', tenant_payment_history, name='tenant_payment_history'),
     path('room-status/', room_status, name='room-status'),
+    path('async/tenant-payment-status/', async_views.tenant_payment_status, name='async-tenant-payment-status'),
+    path('async/room-status/', async_views.room_status, name='async-room-status'),
 ]
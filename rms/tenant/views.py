@@ -3,14 +3,47 @@ from .models import Tenant, Payment
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Sum
+from django.db.models import Count, Q
+from django.conf import settings
 from django.utils import timezone
-from .serializers import TenantSerializer, PaymentSerializer, PaymentCreateSerializer
+from django.http import StreamingHttpResponse
+from .serializers import TenantSerializer, PaymentSerializer, PaymentCreateSerializer, PaymentRowSerializer
+from .exports import EXPORT_COLUMNS, EXPORT_CHUNK_SIZE, EXPORT_FORMATS, stream_csv, stream_ndjson
+from property.rollups import month_bounds, refresh_for_payments
+from .resolvers import BatchPaymentResolver, CachedPaymentResolver
+from .balances import add_payments
+from search.backends import get_backend
+from search.documents import KIND_TENANT, KIND_PROPERTY, KIND_ROOM
+from rms.pagination import KeysetPagination, PaymentKeysetPagination
+from rms.conditional import conditional_on_owner_version
+from rms.reportcache import cached_owner_report
+from rms.dbrouter import reads_from_replica
+from rms.transactions import write_atomic
+from property.versions import bump_for_properties
 # Create your views here.
 
+MAX_PAYMENT_BATCH = 1000
+TRUE_VALUES = {'1', 'true', 'yes'}
+
+
+def paginated_payments(request, payments):
+    """
+    (paginator, serialized page) of `payments`. PaymentRowSerializer is
+    used when the FAST_PAYMENT_LISTS setting is on or the request asks for
+    it with `?fast=1`, and PaymentSerializer otherwise; both produce the
+    same output.
+    """
+    paginator = PaymentKeysetPagination()
+    fast = request.query_params.get('fast', '').lower()
+    if fast in TRUE_VALUES or (not fast and getattr(settings, 'FAST_PAYMENT_LISTS', False)):
+        page = paginator.paginate_queryset(PaymentRowSerializer.rows(payments), request)
+        return paginator, PaymentRowSerializer(page).data
+    page = paginator.paginate_queryset(payments.select_related('tenant', 'room', 'property'), request)
+    return paginator, PaymentSerializer(page, many=True).data
+
         
 class TenantViewSet(viewsets.ModelViewSet):
-    queryset = Tenant.objects.all()
+    queryset = Tenant.objects.select_related('room')
     serializer_class = TenantSerializer
     permission_classes = [IsAuthenticated]
     
@@ -21,17 +54,19 @@ class TenantViewSet(viewsets.ModelViewSet):
 @permission_classes([IsAuthenticated])
 def tenant_payment_history(request, pk):
     """
-    Get comprehensive payment history and financial summary for a specific tenant
+    Get comprehensive payment history and financial summary for a specific tenant.
+    The summary covers every payment; the history itself is paginated,
+    newest first.
     """
     try:
-        tenant = Tenant.objects.get(pk=pk)
+        tenant = Tenant.objects.select_related('room__property').get(pk=pk)
     except Tenant.DoesNotExist:
         return Response(
             {"error": "Tenant not found"}, 
             status=status.HTTP_404_NOT_FOUND
         )
     
-    payments = tenant.payments.all().order_by('-payment_date')
+    paginator, payment_history = paginated_payments(request, tenant.payments.all())
     
     tenant_info = {
         "tenant_id": tenant.id,
@@ -52,48 +87,52 @@ def tenant_payment_history(request, pk):
         "payment_history_summary": tenant.payment_history_summary(), 
     }
     
-    payment_serializer = PaymentSerializer(payments, many=True)
-   
     response_data = {
         "tenant_info": tenant_info,
         "financial_summary": financial_summary,
-        "payment_history": payment_serializer.data,
+        "payment_history": payment_history,
+        "next": paginator.get_next_link(),
+        "previous": paginator.get_previous_link(),
         "generated_at": timezone.now().isoformat()
     }
     
     return Response(response_data)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def tenant_payment_status(request):
-    """
-    Quick view of which tenants have paid and who owes rent for current month
-    """
-    now = timezone.now()
-    current_month = now.month
-    current_year = now.year
-    
-    tenants = Tenant.objects.filter(
-        room__property__owner=request.user,
+PAYMENT_STATUS_FILTERS = (None, '', 'paid', 'pending')
+
+
+def payment_status_tenants(owner, now):
+    """Active tenants of `owner` annotated with this month's payments"""
+    month_begin, month_end = month_bounds(now)
+    return Tenant.objects.filter(
+        room__property__owner=owner,
         is_active=True
-    ).select_related('room', 'room__property')
+    ).with_payments_between(month_begin, month_end)
+
+
+def payment_status_aggregates():
+    return {
+        'total_tenants': Count('id'),
+        'paid_count': Count('id', filter=Q(period_payment_count__gt=0)),
+    }
+
+
+def payment_status_listing(tenants, status_filter):
+    """Tenants to list for `status_filter`, with their room and property"""
+    if status_filter == 'paid':
+        tenants = tenants.paid()
+    elif status_filter == 'pending':
+        tenants = tenants.pending()
+    return tenants.select_related('room', 'room__property')
+
+
+def payment_status_data(now, summary, tenants):
+    summary["pending_count"] = summary["total_tenants"] - summary["paid_count"]
     
     paid_tenants = []
     pending_tenants = []
     
     for tenant in tenants:
-        has_paid = Payment.objects.filter(
-            tenant=tenant,
-            payment_date__month=current_month,
-            payment_date__year=current_year
-        ).exists()
-        
-        amount_paid = Payment.objects.filter(
-            tenant=tenant,
-            payment_date__month=current_month,
-            payment_date__year=current_year
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
         tenant_data = {
             "tenant_id": tenant.id,
             "tenant_name": tenant.tenant_name,
@@ -106,8 +145,8 @@ def tenant_payment_status(request):
             "is_overdue": tenant.is_rent_due()
         }
         
-        if has_paid:
-            tenant_data["amount_paid"] = float(amount_paid)
+        if tenant.period_payment_count:
+            tenant_data["amount_paid"] = float(tenant.amount_paid)
             tenant_data["payment_status"] = "paid"
             paid_tenants.append(tenant_data)
         else:
@@ -115,45 +154,82 @@ def tenant_payment_status(request):
             tenant_data["payment_status"] = "pending"
             pending_tenants.append(tenant_data)
     
-    response_data = {
+    return {
         "month": now.strftime("%B %Y"),
         "last_updated": now.isoformat(),
-        "summary": {
-            "total_tenants": len(tenants),
-            "paid_count": len(paid_tenants),
-            "pending_count": len(pending_tenants)
-        },
+        "summary": summary,
         "paid_tenants": paid_tenants,
         "pending_tenants": pending_tenants
     }
-    
-    return Response(response_data)
 
 
-@api_view(['POST'])
+@api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def log_payment(request):
-    """Log a new payment using tenant name, room number, and property name"""
-    serializer = PaymentCreateSerializer(data=request.data)
+@conditional_on_owner_version
+@cached_owner_report
+@reads_from_replica
+def tenant_payment_status(request):
+    """
+    Quick view of which tenants have paid and who owes rent for current month.
+    `?status=paid` or `?status=pending` returns only that list; the summary
+    always covers every active tenant.
+    """
+    status_filter = request.query_params.get('status')
+    if status_filter not in PAYMENT_STATUS_FILTERS:
+        return Response(
+            {"error": "status must be 'paid' or 'pending'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    now = timezone.now()
+    tenants = payment_status_tenants(request.user, now)
+    summary = tenants.aggregate(**payment_status_aggregates())
+    
+    return Response(payment_status_data(now, summary, payment_status_listing(tenants, status_filter)))
+
+
+def create_payment(request, resolver):
+    """log_payment's body, resolving names with `resolver` (see tenant.resolvers)"""
+    serializer = PaymentCreateSerializer(data=request.data, context={'request': request, 'resolver': resolver})
     serializer.is_valid(raise_exception=True)
     payment = serializer.save()
     
     response_serializer = PaymentSerializer(payment)
     return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
-@api_view(['GET'])
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def list_payments(request):
-    """List all payments with optional filters"""
-    payments = Payment.objects.all().select_related('tenant', 'room', 'property')
-   
+def log_payment(request):
+    """
+    Log a new payment using tenant name, room number, and property name.
+    Once the names are cached (tenant.resolvers) this is one transaction
+    of five statements: the INSERT, then UPDATEs of the monthly rollup, the
+    owner's data version and the tenant's and property's running totals.
+    """
+    return create_payment(request, CachedPaymentResolver())
+
+def filter_payments(request, payments):
+    """
+    Apply the list_payments query filters. `q`, `tenant_name` and
+    `property_name` are prefix-matched through the search index.
+    """
+    search_backend = get_backend()
+    
+    query = request.query_params.get('q')
+    if query:
+        payments = payments.filter(
+            search_backend.match_q('tenant_id', query, KIND_TENANT)
+            | search_backend.match_q('property_id', query, KIND_PROPERTY)
+            | search_backend.match_q('room_id', query, KIND_ROOM)
+        )
+    
     tenant_name = request.query_params.get('tenant_name')
     if tenant_name:
-        payments = payments.filter(tenant__tenant_name__icontains=tenant_name)
+        payments = payments.filter(search_backend.match_q('tenant_id', tenant_name, KIND_TENANT))
     
     property_name = request.query_params.get('property_name')
     if property_name:
-        payments = payments.filter(property__name__icontains=property_name)
+        payments = payments.filter(search_backend.match_q('property_id', property_name, KIND_PROPERTY))
     
     room_no = request.query_params.get('room_no')
     if room_no:
@@ -163,53 +239,190 @@ def list_payments(request):
     if method:
         payments = payments.filter(method=method)
     
-    serializer = PaymentSerializer(payments, many=True)
-    return Response(serializer.data)
+    return payments
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def log_payments_batch(request):
+    """
+    Log many payments in one request. Accepts a list of log_payment bodies,
+    or {"payments": [...], "all_or_nothing": true} to reject the whole
+    batch when any item is invalid. Names are resolved for the whole batch
+    at once and valid payments are inserted together.
+    """
+    items = request.data
+    all_or_nothing = False
+    if isinstance(items, dict):
+        all_or_nothing = bool(items.get('all_or_nothing', False))
+        items = items.get('payments')
+    if not isinstance(items, list) or not items:
+        return Response(
+            {"error": "Expected a non-empty list of payments."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(items) > MAX_PAYMENT_BATCH:
+        return Response(
+            {"error": f"A batch may contain at most {MAX_PAYMENT_BATCH} payments."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    context = {
+        'request': request,
+        'resolver': BatchPaymentResolver([item for item in items if isinstance(item, dict)]),
+    }
+    results = []
+    payments = []
+    for index, item in enumerate(items):
+        serializer = PaymentCreateSerializer(data=item, context=context)
+        if serializer.is_valid():
+            payments.append(serializer.build(serializer.validated_data))
+            results.append({"index": index, "status": "created"})
+        else:
+            results.append({"index": index, "status": "error", "errors": serializer.errors})
+    
+    failed = len(items) - len(payments)
+    if failed and (all_or_nothing or not payments):
+        return Response({
+            "created": 0,
+            "failed": failed,
+            "results": [result for result in results if result["status"] == "error"]
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    with write_atomic():
+        Payment.objects.bulk_create(payments, batch_size=500)
+        refresh_for_payments(payments)
+        add_payments(payments)
+        bump_for_properties(payment.property_id for payment in payments)
+    
+    created = iter(PaymentSerializer(payments, many=True).data)
+    for result in results:
+        if result["status"] == "created":
+            result["payment"] = next(created)
+    
+    return Response({
+        "created": len(payments),
+        "failed": failed,
+        "results": results
+    }, status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def room_status(request):
+def list_payments(request):
+    """List all payments with optional filters (see filter_payments)"""
+    payments = filter_payments(request, Payment.objects.all())
+    paginator, data = paginated_payments(request, payments)
+    return paginator.get_paginated_response(data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@reads_from_replica
+def export_payments(request):
     """
-    Simple monitor showing all vacant and occupied rooms across all properties
-    with tenant information for occupied rooms
+    Stream every payment of the owner's properties matching the
+    list_payments filters as CSV (default) or newline-delimited JSON
+    (`?export_format=ndjson`).
     """
-    from property.models import Property
+    export_format = request.query_params.get('export_format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            {"error": f"export_format must be one of {', '.join(EXPORT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    properties = Property.objects.all().prefetch_related('rooms', 'rooms__tenant')
+    payments = filter_payments(request, Payment.objects.filter(property__owner=request.user))
+    # Rows are read after the view returns, outside @reads_from_replica, so
+    # the database is chosen now.
+    rows = payments.using(payments.db).order_by(
+        '-payment_date', '-id'
+    ).values_list(*EXPORT_COLUMNS.values()).iterator(chunk_size=EXPORT_CHUNK_SIZE)
     
+    stream = stream_csv(rows) if export_format == 'csv' else stream_ndjson(rows)
+    content_type, extension = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="payments.{extension}"'
+    return response
+
+def room_status_rooms(owner, params):
+    """
+    The owner's rooms annotated with occupancy and restricted to the
+    `property` parameter, or None when that parameter is not an id.
+    """
+    from property.models import Room
+    
+    rooms = Room.objects.filter(property__owner=owner).with_occupancy()
+    property_id = params.get('property')
+    if property_id:
+        if not property_id.isdigit():
+            return None
+        rooms = rooms.filter(property_id=property_id)
+    return rooms
+
+
+def room_status_listing(rooms, params):
+    if params.get('vacant', '').lower() in TRUE_VALUES:
+        rooms = rooms.filter(has_tenant=False)
+    if params.get('overdue', '').lower() in TRUE_VALUES:
+        rooms = rooms.filter(rent_overdue=True)
+    return rooms.select_related('property', 'tenant')
+
+
+def room_status_data(summary, paginator, page):
     all_vacant_rooms = []
     all_occupied_rooms = []
     
-    for property_obj in properties:
-        for room in property_obj.rooms.all():
-            
-            if room.is_occupied and hasattr(room, 'tenant'):
-                tenant = room.tenant
-                all_occupied_rooms.append({
-                    "property_name": property_obj.name,
-                    "room_no": room.room_no,
-                    "rent_amount": float(room.rent_amount),
-                    "tenant_name": tenant.tenant_name,
-                    "tenant_phone": tenant.phone_no,
-                    "tenant_email": tenant.email,
-                    "lease_start": tenant.lease_start_date.isoformat() if tenant.lease_start_date else None,
-                    "rent_due_date": tenant.rent_due_date.isoformat(),
-                    "is_active": tenant.is_active,
-                    "is_rent_overdue": tenant.is_rent_due()
-                })
-            else:
-                all_vacant_rooms.append({
-                    "property_name": property_obj.name,
-                    "room_no": room.room_no,
-                    "rent_amount": float(room.rent_amount)
-                })
+    for room in page:
+        property_obj = room.property
+        if room.has_tenant:
+            tenant = room.tenant
+            all_occupied_rooms.append({
+                "property_name": property_obj.name,
+                "room_no": room.room_no,
+                "rent_amount": float(room.rent_amount),
+                "tenant_name": tenant.tenant_name,
+                "tenant_phone": tenant.phone_no,
+                "tenant_email": tenant.email,
+                "lease_start": tenant.lease_start_date.isoformat() if tenant.lease_start_date else None,
+                "rent_due_date": tenant.rent_due_date.isoformat(),
+                "is_active": tenant.is_active,
+                "is_rent_overdue": room.rent_overdue
+            })
+        else:
+            all_vacant_rooms.append({
+                "property_name": property_obj.name,
+                "room_no": room.room_no,
+                "rent_amount": float(room.rent_amount)
+            })
     
-    return Response({
-        "summary": {
-            "total_rooms": len(all_vacant_rooms) + len(all_occupied_rooms),
-            "occupied": len(all_occupied_rooms),
-            "vacant": len(all_vacant_rooms)
-        },
+    return {
+        "summary": summary,
+        "next": paginator.get_next_link(),
+        "previous": paginator.get_previous_link(),
         "vacant_rooms": all_vacant_rooms,
         "occupied_rooms": all_occupied_rooms
-    })
\ No newline at end of file
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on_owner_version
+@cached_owner_report
+@reads_from_replica
+def room_status(request):
+    """
+    Occupancy monitor for the current owner's rooms. Occupancy and overdue
+    rent are computed in SQL. Filters: `property` (id), `vacant=true`,
+    `overdue=true`; the summary reflects the property filter only.
+    """
+    rooms = room_status_rooms(request.user, request.query_params)
+    if rooms is None:
+        return Response(
+            {"error": "property must be a property id"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    summary = rooms.occupancy_summary()
+    
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(room_status_listing(rooms, request.query_params), request)
+    
+    return Response(room_status_data(summary, paginator, page))